@@ -0,0 +1,90 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Response file extraction benchmark
+
+Scans well-formed and adversarial responses (10 MB by default) for file tags, fed in small streamed
+chunks. The adversarial responses have many "<...>" lines with no matching close tag. Use -b to
+compare with the original regular expression scanner on a smaller response - it is quadratic on
+the adversarial responses.
+
+  python3 benchmarks/bench_extract.py [-s MB] [-b KB]
+"""
+
+import argparse
+import re
+import time
+
+from ctxkit.extract import FileExtractor
+
+
+# The original file tag regex
+_R_FILENAME_TAG = re.compile(r'^<([^<>]+)>\n(.*?)\n</\1>', re.DOTALL | re.MULTILINE)
+
+
+def regex_scan(response):
+    file_count = 0
+    search_pos = 0
+    while True:
+        match = _R_FILENAME_TAG.search(response, search_pos)
+        if not match:
+            break
+        file_count += 1
+        search_pos = match.end()
+    return file_count
+
+
+def extractor_scan(response, chunk_size=16):
+    extractor = FileExtractor()
+    file_count = 0
+    for ix in range(0, len(response), chunk_size):
+        file_count += len(extractor.feed(response[ix:ix + chunk_size]))
+    return file_count + len(extractor.close())
+
+
+# Response builders, by name
+def well_formed(size):
+    file_text = '<src/module{ix}.py>\n' + 'def function(argument):\n    return argument\n' * 50 + '</src/module{ix}.py>\n\n'
+    return ''.join(file_text.format(ix=ix) for ix in range(size // len(file_text) + 1))[:size]
+
+
+def unclosed_tags(size):
+    line = '<div class="unclosed">\n'
+    return line * (size // len(line))
+
+
+def unclosed_then_file(size):
+    return unclosed_tags(size - 100) + '<file.py>\nprint()\n</file.py>\n'
+
+
+RESPONSES = {
+    'well-formed': well_formed,
+    'unclosed tags': unclosed_tags,
+    'unclosed, then file': unclosed_then_file
+}
+
+
+def run(name, scanner, response):
+    start = time.perf_counter()
+    file_count = scanner(response)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<36} {len(response) / 1e6:>6.2f} MB {file_count:>6} files {elapsed * 1000:>10.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_extract')
+    parser.add_argument('-s', dest='size_mb', type=float, default=10, help='the response size, in MB')
+    parser.add_argument('-b', dest='baseline_kb', type=float, help='compare with the regex scanner at this response size, in KB')
+    args = parser.parse_args()
+
+    for name, builder in RESPONSES.items():
+        run(f'{name} (extractor)', extractor_scan, builder(int(args.size_mb * 1e6)))
+        if args.baseline_kb:
+            response = builder(int(args.baseline_kb * 1e3))
+            run(f'{name} (extractor)', extractor_scan, response)
+            run(f'{name} (regex)', regex_scan, response)
+
+
+if __name__ == '__main__':
+    main()
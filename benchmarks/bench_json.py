@@ -0,0 +1,53 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+JSON backend benchmark
+
+Measures the per-event decode cost of streamed delta events and the encode cost of a large request
+body for each installed JSON backend (orjson, msgspec, json).
+
+  python3 benchmarks/bench_json.py [-n EVENTS] [-s PROMPT_MB]
+"""
+
+import argparse
+import json
+import time
+
+from ctxkit.api._json import JSON_BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_json')
+    parser.add_argument('-n', dest='events', type=int, default=200000, help='the number of delta events')
+    parser.add_argument('-s', dest='prompt_mb', type=float, default=4, help='the request prompt size, in MB')
+    args = parser.parse_args()
+
+    # Streamed delta event payloads, as dispatched by the SSE and NDJSON parsers
+    events = [
+        json.dumps({'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': f'tok{ix} '}}).encode('utf-8')
+        for ix in range(args.events)
+    ]
+
+    # A large request body
+    prompt_line = 'def function(argument):  # some source code line, café\n'
+    prompt = prompt_line * int(args.prompt_mb * 1e6 / len(prompt_line))
+    request = {'model': 'model-name', 'messages': [{'role': 'user', 'content': prompt}], 'max_tokens': 8000, 'stream': True}
+
+    print(f'{"backend":<10} {"decode ns/event":>16} {"encode ms/request":>18}')
+    for name, (loads, dumps) in JSON_BACKENDS.items():
+        start = time.perf_counter()
+        for event in events:
+            loads(event)
+        decode_ns = (time.perf_counter() - start) / len(events) * 1e9
+
+        start = time.perf_counter()
+        for _ in range(5):
+            dumps(request)
+        encode_ms = (time.perf_counter() - start) / 5 * 1000
+
+        print(f'{name:<10} {decode_ns:>16.0f} {encode_ms:>18.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Ollama NDJSON stream decoder benchmark
+
+Decodes a long local-model generation (100k objects by default), or the streamed responses of a
+cassette recorded with "ctxkit --record", with natural and pathological HTTP chunking.
+
+  python3 benchmarks/bench_ndjson.py [-n OBJECTS] [-r REPEAT] [-c CASSETTE]
+"""
+
+import argparse
+import json
+import time
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api.ollama import _iter_ndjson
+from ctxkit.cassette import ReplayPoolManager, ReplayResponse
+
+
+# Build an Ollama-style chat stream, one chunk per object
+def recorded_stream(object_count):
+    chunks = []
+    for ix in range(object_count):
+        chunk = {
+            'model': 'qwen3:8b',
+            'created_at': '2026-10-19T12:00:00.000000Z',
+            'message': {'role': 'assistant', 'content': f'tok{ix} '},
+            'done': False
+        }
+        chunks.append(json.dumps(chunk).encode('utf-8') + b'\n')
+    chunks.append(json.dumps({'model': 'qwen3:8b', 'message': {'role': 'assistant', 'content': ''}, 'done': True}).encode('utf-8') + b'\n')
+    return chunks
+
+
+# Load the streamed responses of a cassette
+def cassette_streams(path):
+    pool_manager = ReplayPoolManager.load(path)
+    return [list(ReplayResponse(interaction).read_chunked()) for interaction in pool_manager.interactions if 'chunks' in interaction]
+
+
+# Re-chunk the stream at a fixed byte size
+def rechunk(chunks, size):
+    stream = b''.join(chunks)
+    return [stream[ix:ix + size] for ix in range(0, len(stream), size)]
+
+
+def run(name, chunks, repeat):
+    response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    byte_count = sum(len(chunk) for chunk in chunks)
+    best = None
+    for _ in range(repeat):
+        response.read_chunked.return_value = chunks
+        start = time.perf_counter()
+        object_count = sum(1 for _ in _iter_ndjson(response))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(
+        f'{name:<22} {len(chunks):>9} chunks {object_count:>7} objects {best * 1000:>9.1f} ms {object_count / best:>10.0f} obj/s '
+        f'{byte_count / best / 1e6:>8.1f} MB/s'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_ndjson')
+    parser.add_argument('-n', dest='objects', type=int, default=100000, help='the number of streamed objects')
+    parser.add_argument('-r', dest='repeat', type=int, default=3, help='the number of repetitions')
+    parser.add_argument('-c', dest='cassette', metavar='PATH', help='benchmark the streamed responses of a cassette')
+    args = parser.parse_args()
+
+    # Recorded cassette streams?
+    if args.cassette:
+        for ix_stream, chunks in enumerate(cassette_streams(args.cassette)):
+            run(f'cassette #{ix_stream + 1}', chunks, args.repeat)
+            run(f'cassette #{ix_stream + 1}, 1-byte', rechunk(chunks, 1), args.repeat)
+        return
+
+    chunks = recorded_stream(args.objects)
+    run('object-aligned', chunks, args.repeat)
+    run('cloud 4 KB chunks', rechunk(chunks, 4096), args.repeat)
+    run('13-byte chunks', rechunk(chunks, 13), args.repeat)
+    run('1-byte chunks', rechunk(chunks, 1), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+SSE stream parser benchmark
+
+Parses a recorded-style Claude streaming response, or the streamed responses of a cassette recorded
+with "ctxkit --record", with natural and pathological HTTP chunking.
+
+  python3 benchmarks/bench_sse.py [-n EVENTS] [-r REPEAT] [-c CASSETTE]
+"""
+
+import argparse
+import json
+import time
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._sse import iter_sse_events
+from ctxkit.cassette import ReplayPoolManager, ReplayResponse
+
+
+# Build a Claude-style SSE stream of text delta events
+def recorded_stream(event_count):
+    events = [
+        b'event: message_start\ndata: {"type": "message_start", "message": {"id": "msg_01", "usage": {"input_tokens": 1200}}}\n\n'
+    ]
+    for ix in range(event_count):
+        delta = {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': f'token {ix} café '}}
+        events.append(b'event: content_block_delta\ndata: ' + json.dumps(delta).encode('utf-8') + b'\n\n')
+        if ix % 100 == 0:
+            events.append(b'event: ping\ndata: {"type": "ping"}\n\n')
+    events.append(b'event: message_delta\ndata: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}\n\n')
+    events.append(b'event: message_stop\ndata: {"type": "message_stop"}\n\n')
+    return events
+
+
+# Load the streamed responses of a cassette
+def cassette_streams(path):
+    pool_manager = ReplayPoolManager.load(path)
+    return [list(ReplayResponse(interaction).read_chunked()) for interaction in pool_manager.interactions if 'chunks' in interaction]
+
+
+# Re-chunk the stream at a fixed byte size
+def rechunk(events, size):
+    stream = b''.join(events)
+    return [stream[ix:ix + size] for ix in range(0, len(stream), size)]
+
+
+# A single huge event delivered in tiny chunks - quadratic for parsers that re-parse the partial event
+def huge_event(size):
+    data = b'data: ' + json.dumps({'type': 'content_block_delta', 'delta': {'text': 'x' * size}}).encode('utf-8') + b'\n\n'
+    return [data[ix:ix + 16] for ix in range(0, len(data), 16)]
+
+
+def run(name, chunks, repeat):
+    response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    byte_count = sum(len(chunk) for chunk in chunks)
+    best = None
+    for _ in range(repeat):
+        response.read_chunked.return_value = chunks
+        start = time.perf_counter()
+        event_count = sum(1 for _ in iter_sse_events(response))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{name:<24} {len(chunks):>9} chunks {event_count:>7} events {best * 1000:>9.1f} ms {byte_count / best / 1e6:>8.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bench_sse')
+    parser.add_argument('-n', dest='events', type=int, default=20000, help='the number of delta events')
+    parser.add_argument('-r', dest='repeat', type=int, default=3, help='the number of repetitions')
+    parser.add_argument('-c', dest='cassette', metavar='PATH', help='benchmark the streamed responses of a cassette')
+    args = parser.parse_args()
+
+    # Recorded cassette streams?
+    if args.cassette:
+        for ix_stream, chunks in enumerate(cassette_streams(args.cassette)):
+            run(f'cassette #{ix_stream + 1}', chunks, args.repeat)
+            run(f'cassette #{ix_stream + 1}, 1-byte', rechunk(chunks, 1), args.repeat)
+        return
+
+    events = recorded_stream(args.events)
+    run('event-aligned', events, args.repeat)
+    run('64-byte chunks', rechunk(events, 64), args.repeat)
+    run('7-byte chunks', rechunk(events, 7), args.repeat)
+    run('1-byte chunks', rechunk(events, 1), args.repeat)
+    run('1 MB event, 16B chunks', huge_event(1000000), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
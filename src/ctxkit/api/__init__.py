@@ -5,17 +5,29 @@
 ctxkit API utilities
 """
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
 import os
+import queue
 import re
-import shutil
+import sys
+import threading
 
-from .claude import claude_chat, claude_list
-from ..config import is_url
-from ..diff import apply_diff
-from .gemini import gemini_chat, gemini_list
-from .gpt import gpt_chat, gpt_list
-from .grok import grok_chat, grok_list
-from .ollama import ollama_chat, ollama_list
+import urllib3
+
+from ._async import AsyncPoolManager, AsyncResponse
+from ._continue import TruncatedResponseError
+from ._responses import get_response_hash, load_response, save_response
+from .claude import ANTHROPIC_URL, claude_batch, claude_chat, claude_chat_async, claude_list
+from ..extract import FileExtractor, extract_file
+from ..stats import StatsPoolManager, StreamStats
+from ..writer import OutputWriter
+from .gemini import GEMINI_MODELS_URL, gemini_chat, gemini_chat_async, gemini_list
+from .gpt import OPENAI_URL, gpt_batch, gpt_chat, gpt_chat_async, gpt_list
+from .grok import XAI_URL, grok_chat, grok_chat_async, grok_list
+from .ollama import ollama_chat, ollama_chat_async, ollama_list, ollama_preload
 
 
 # API providers
@@ -23,31 +35,67 @@ API_PROVIDERS = {
     'claude': {
         'description': 'Claude (Anthropic) API',
         'chat': claude_chat,
-        'list': claude_list
+        'chat_async': claude_chat_async,
+        'list': claude_list,
+        'url': ANTHROPIC_URL,
+        'batch': claude_batch
         },
     'gemini': {
         'description': 'Gemini (Google) API',
         'chat': gemini_chat,
-        'list': gemini_list
+        'chat_async': gemini_chat_async,
+        'list': gemini_list,
+        'url': GEMINI_MODELS_URL
     },
     'gpt': {
         'description': 'ChatGPT (OpenAI) API',
         'chat': gpt_chat,
-        'list': gpt_list
+        'chat_async': gpt_chat_async,
+        'list': gpt_list,
+        'url': OPENAI_URL,
+        'batch': gpt_batch
     },
     'grok': {
         'description': 'Grok (xAI) API',
         'chat': grok_chat,
-        'list': grok_list
+        'chat_async': grok_chat_async,
+        'list': grok_list,
+        'url': XAI_URL
     },
     'ollama': {
         'description': 'Ollama API',
         'chat': ollama_chat,
-        'list': ollama_list
+        'chat_async': ollama_chat_async,
+        'list': ollama_list,
+        'preload': ollama_preload
     }
 }
 
 
+# The default hedged request thresholds, in milliseconds
+DEFAULT_HEDGE_FIRST_MS = 10000
+DEFAULT_HEDGE_STALL_MS = 5000
+
+
+# The provider-specific API options - (option name, args attribute, provider)
+PROVIDER_OPTIONS = (
+    ('--chain', 'chain', 'gpt'),
+    ('--context-cache', 'context_cache', 'gemini'),
+    ('--keep-alive', 'keep_alive', 'ollama'),
+    ('--preload', 'preload', 'ollama')
+)
+
+
+# Get the error message of a provider-specific option that's not supported by the provider - None if
+# the options are valid
+def get_provider_option_error(args, provider):
+    for option_name, option_attr, option_provider in PROVIDER_OPTIONS:
+        option_value = getattr(args, option_attr)
+        if option_value is not None and option_value is not False and provider != option_provider:
+            return f'{option_name} is only supported by the {option_provider} API'
+    return None
+
+
 DEFAULT_SYSTEM_PREFIX = '''\
 You are a helpful assistant that can read and modify files provided in the prompt.
 '''
@@ -126,65 +174,356 @@ For new files, use /dev/null as the old file:
 # Helper to output the response from stdin to passed to an API
 def output_api_call(args, pool_manager, output, system_prompt, prompt):
     provider, model = args.api
-    api_func = API_PROVIDERS[provider]['chat']
 
-    # Write the response to the output
-    chunks = []
-    for chunk in api_func(pool_manager, model, system_prompt, prompt, args.temp, args.topp, args.maxtok):
-        chunks.append(chunk)
-        output.write(chunk)
-        output.flush()
-    if chunks:
-        output.write('\n')
+    # Collect the API call latency statistics, if requested
+    stats = None
+    if args.stats or args.stats_json:
+        stats = StreamStats(provider, model)
+        pool_manager = StatsPoolManager(pool_manager, stats)
+        stats.start()
+
+    # Continue a stored conversation, if requested
+    conversation = None
+    if args.chain:
+        conversation = {'response_id': None}
+        if os.path.isfile(args.chain):
+            with open(args.chain, 'r', encoding='utf-8') as chain_file:
+                conversation['response_id'] = chain_file.read().strip() or None
+
+    # Scan the response for files as it streams, if requested
+    extractor = FileExtractor() if args.extract else None
+    extracted_files = []
+
+    # Replay the cached response, if any
+    response_key = get_response_key(args, system_prompt, prompt)
+    cached_response = load_response(response_key) if response_key is not None else None
+
+    # Call the API provider, unless the response is cached - race or hedge the API providers, if requested
+    if cached_response is not None:
+        response_chunks = [cached_response]
+    elif args.race:
+        response_chunks = _race_chat(args, pool_manager, system_prompt, prompt, stats)
+    elif args.hedge:
+        response_chunks = _hedge_chat(args, pool_manager, system_prompt, prompt, stats)
+    else:
+        response_chunks = _api_chat(args, pool_manager, provider, model, system_prompt, prompt, stats, conversation)
+
+    # Cache the response, if requested
+    if response_key is not None and cached_response is None:
+        response_chunks = _save_response_chunks(response_chunks, response_key, args.response_cache_size)
 
-    # Extract files, if requested
-    if args.extract:
-        _extract_files(args, ''.join(chunks))
+    # Write the response to the output
+    has_output = False
+    error = None
+    try:
+        with OutputWriter(output) as writer:
+            for chunk in response_chunks:
+                if stats is not None:
+                    stats.chunk(chunk)
+                if extractor is not None:
+                    extracted_files.extend(extractor.feed(chunk))
+                has_output = True
+                writer.write(chunk)
+            if has_output:
+                writer.write('\n')
+    except Exception as exc:
+        error = exc
+        raise
+    finally:
+        if stats is not None:
+            stats.finish(error)
+            stats.output(sys.stderr if args.stats else None, args.stats_json)
+
+    # Save the conversation's response ID
+    if conversation is not None and conversation['response_id']:
+        with open(args.chain, 'w', encoding='utf-8') as chain_file:
+            chain_file.write(f'{conversation["response_id"]}\n')
+
+    # Extract files, if requested - only once the response is complete
+    if extractor is not None:
+        extracted_files.extend(extractor.close())
+        for file_path, content in extracted_files:
+            extract_file(args, file_path, content)
+
+
+# Get the response cache key of an API call - None if the response cache is not used
+def get_response_key(args, system_prompt, prompt):
+    if not args.response_cache:
+        return None
+    provider, model = args.api
+    edit_format = 'diff' if args.diff else 'file'
+    return get_response_hash(provider, model, system_prompt, prompt, args.temp, args.topp, args.maxtok, edit_format)
 
 
-# Helper to extract files from a response
-def _extract_files(args, response):
-    search_pos = 0
-    while True:
-        match = _R_FILENAME_TAG.search(response, search_pos)
-        if not match:
-            break
-        file_path = os.path.normpath(match.group(1))
-        content = match.group(2).strip()
-        search_pos = match.end()
-
-        # Ignore URLs
-        if is_url(file_path):
-            continue
-
-        # Delete?
-        if content == 'ctxkit: delete':
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            continue
-
-        # Backup the existing file
-        if args.backup and os.path.exists(file_path):
-            shutil.copy(file_path, f'{file_path}.bak')
-
-        # Create the file's parent directory
-        file_dir = os.path.dirname(file_path)
-        if file_dir: # pragma: no branch
-            os.makedirs(file_dir, exist_ok=True)
-
-        # Is content a unified diff?
-        if args.diff:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as fh:
-                    old_content = fh.read()
+# Helper to save a response to the response cache once it's complete
+def _save_response_chunks(response_chunks, response_key, max_size):
+    chunks = []
+    for chunk in response_chunks:
+        chunks.append(chunk)
+        yield chunk
+    save_response(response_key, ''.join(chunks), max_size)
+
+
+# Helper to output each API provider's response - the API calls are made concurrently. If there's an
+# output file, each response is written to its own output file. Otherwise, the responses are written to
+# the output in "--api" order, each following a header line.
+def output_api_all(args, pool_manager, output, system_prompt, prompt):
+    def call_api(api):
+        api_args = argparse.Namespace(**vars(args))
+        api_args.api = api
+        try:
+            if args.output:
+                with open(get_all_output_path(args.output, *api), 'w', encoding='utf-8') as api_output:
+                    output_api_call(api_args, pool_manager, api_output, system_prompt, prompt)
+                return (None, None)
+            api_output = io.StringIO()
+            output_api_call(api_args, pool_manager, api_output, system_prompt, prompt)
+            return (api_output.getvalue(), None)
+        except Exception as exc:
+            return (None, exc)
+
+    with ThreadPoolExecutor(max_workers=len(args.apis)) as executor:
+        api_results = list(executor.map(call_api, args.apis))
+
+    # Write the responses and report the errors
+    error_count = 0
+    for ix_api, ((provider, model), (response, error)) in enumerate(zip(args.apis, api_results)):
+        if not args.output:
+            if ix_api != 0:
+                output.write('\n')
+            output.write(f'==> {provider} {model} <==\n')
+            if response:
+                output.write(response)
+        if error is not None:
+            error_count += 1
+            print(f'Error: {provider} {model}: {error}', file=sys.stderr)
+    if error_count:
+        raise urllib3.exceptions.HTTPError(f'{error_count} of {len(args.apis)} API calls failed')
+
+
+# Get the "--all" output file path of an API provider's response - the provider and model are added
+# before the output file path's extension (e.g. "out.grok.grok-4.md")
+def get_all_output_path(output_path, provider, model):
+    output_root, output_ext = os.path.splitext(output_path)
+    model_name = re.sub(r'[^A-Za-z0-9._-]+', '-', model)
+    return f'{output_root}.{provider}.{model_name}{output_ext}'
+
+
+# Helper to call each API provider and yield the response chunks of the first provider to deliver a
+# response chunk (or complete its response). The other API calls are cancelled.
+def _race_chat(args, pool_manager, system_prompt, prompt, stats=None):
+    chunk_queue = queue.Queue()
+    winner = None
+    racer_stats = [StreamStats(provider, model) if stats is not None else None for provider, model in args.apis]
+    racers = [
+        _start_racer(args, pool_manager, chunk_queue, ix_racer, provider, model, system_prompt, prompt, racer_stats[ix_racer])
+        for ix_racer, (provider, model) in enumerate(args.apis)
+    ]
+
+    try:
+        # Wait for the first racer to deliver a response chunk - failed racers drop out of the race
+        errors = []
+        while winner is None:
+            ix_racer, chunk, error = chunk_queue.get()
+            if error is None:
+                winner = ix_racer
+                _cancel_racers(racers, winner)
+                if chunk is not None:
+                    yield chunk
             else:
-                old_content = ''
-            content = apply_diff(old_content, content)
-
-        # Write the file
-        with open(file_path, 'w', encoding='utf-8') as file_:
-            file_.write(content.strip())
-            file_.write('\n')
+                errors.append(error)
+                if len(errors) == len(args.apis):
+                    raise errors[0]
+        if stats is not None:
+            stats.provider, stats.model = args.apis[winner]
+
+        # Yield the winner's response chunks
+        while chunk is not None:
+            ix_racer, chunk, error = chunk_queue.get()
+            if ix_racer == winner:
+                if error is not None:
+                    raise error
+                if chunk is not None:
+                    yield chunk
+        if stats is not None:
+            stats.add_usage(racer_stats[winner].usage)
+    finally:
+        # Cancel the API calls
+        _cancel_racers(racers)
+
+
+# Helper to call the API provider and yield its response chunks, hedged with the "--hedge" backup API
+# provider. If the first response chunk takes longer than "--hedge-first" milliseconds, or the gap
+# between response chunks is longer than "--hedge-stall" milliseconds, the backup provider is called -
+# continuing the partial response, if any - and the first call to deliver its next response chunk (or
+# complete its response) is used. The other API call is cancelled.
+def _hedge_chat(args, pool_manager, system_prompt, prompt, stats=None):
+    chunk_queue = queue.Queue()
+    racer_apis = (tuple(args.api), tuple(args.hedge))
+    racer_stats = [StreamStats(provider, model) if stats is not None else None for provider, model in racer_apis]
+    winner = 0
+    racers = [_start_racer(args, pool_manager, chunk_queue, 0, *racer_apis[0], system_prompt, prompt, racer_stats[0])]
+
+    try:
+        hedged = False
+        response_chunks = []
+        errors = []
+        while True:
+            # Wait for the next response chunk - hedge if it's late
+            timeout = None
+            if not hedged:
+                timeout = (args.hedge_stall if response_chunks else args.hedge_first) / 1000
+            try:
+                ix_racer, chunk, error = chunk_queue.get(timeout=timeout)
+            except queue.Empty:
+                # Call the backup provider - a partial response can only be continued by a provider that
+                # supports continuation
+                hedged = True
+                if not response_chunks or racer_apis[1][0] not in _NO_CONTINUATION_PROVIDERS:
+                    winner = None
+                    racers.append(_start_racer(
+                        args, pool_manager, chunk_queue, 1, *racer_apis[1], system_prompt, prompt, racer_stats[1],
+                        ''.join(response_chunks)
+                    ))
+                continue
+
+            # Hedged? The first call to deliver a response chunk wins - a failed call drops out.
+            if winner is None:
+                if error is not None:
+                    errors.append(error)
+                    if len(errors) == len(racers):
+                        raise errors[0]
+                    continue
+                winner = ix_racer
+                _cancel_racers(racers, winner)
+            if ix_racer != winner:
+                continue
+
+            # Yield the response chunk
+            if error is not None:
+                raise error
+            if chunk is None:
+                break
+            response_chunks.append(chunk)
+            yield chunk
+
+        if stats is not None:
+            stats.provider, stats.model = racer_apis[winner]
+            stats.add_usage(racer_stats[winner].usage)
+    finally:
+        # Cancel the API calls
+        _cancel_racers(racers)
+
+
+# The API providers that do not support continuing a partial response
+_NO_CONTINUATION_PROVIDERS = ('ollama',)
+
+
+# Helper to call an API provider on a thread and queue its (racer index, chunk, error) tuples - a chunk
+# of None marks the end of the response. Returns the racer's pool manager, which cancels the API call.
+def _start_racer(args, pool_manager, chunk_queue, ix_racer, provider, model, system_prompt, prompt, stats, continuation=None):
+    racer_pool_manager = _RacerPoolManager(pool_manager)
+
+    def run_racer():
+        try:
+            api_chat = _api_chat(args, racer_pool_manager, provider, model, system_prompt, prompt, stats, continuation=continuation)
+            with contextlib.closing(api_chat) as chunks:
+                for chunk in chunks:
+                    if racer_pool_manager.cancelled:
+                        return
+                    chunk_queue.put((ix_racer, chunk, None))
+            chunk_queue.put((ix_racer, None, None))
+        except Exception as exc:
+            if not racer_pool_manager.cancelled:
+                chunk_queue.put((ix_racer, None, exc))
+
+    threading.Thread(target=run_racer, daemon=True).start()
+    return racer_pool_manager
+
+
+# Helper to cancel the racers' API calls, except the winner's
+def _cancel_racers(racers, winner=None):
+    for ix_racer, racer_pool_manager in enumerate(racers):
+        if ix_racer != winner:
+            racer_pool_manager.cancel()
+
+
+# urllib3 PoolManager proxy for a racer's API call. Cancelling the API call shuts down its open
+# responses' connections, so a stalled call's thread and connection are released immediately rather
+# than on its next response chunk. Requests made after the cancellation fail.
+class _RacerPoolManager:
+
+    def __init__(self, pool_manager):
+        self.pool_manager = pool_manager
+        self.cancelled = False
+        self._responses = []
+        self._lock = threading.Lock()
+
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
+
+
+    def request(self, *args, **kwargs):
+        if self.cancelled:
+            raise urllib3.exceptions.HTTPError('API call cancelled')
+        response = self.pool_manager.request(*args, **kwargs)
+        with self._lock:
+            self._responses.append(response)
+            cancelled = self.cancelled
+        if cancelled:
+            _shutdown_response(response)
+        return response
+
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            responses = list(self._responses)
+        for response in responses:
+            _shutdown_response(response)
+
+
+# Helper to shut down a response's connection, if it's still open - a response whose connection was
+# released to the pool is not shut down
+def _shutdown_response(response):
+    try:
+        response.shutdown()
+    except (AttributeError, OSError, RuntimeError, ValueError):
+        pass
 
 
-_R_FILENAME_TAG = re.compile(r'^<([^<>]+)>\n(.*?)\n</\1>', re.DOTALL | re.MULTILINE)
+# Helper to call an API provider, continuing responses truncated by the max tokens limit, if requested.
+# If continuation is provided, the partial response is continued.
+def _api_chat(args, pool_manager, provider, model, system_prompt, prompt, stats=None, conversation=None, continuation=None):
+    api_func = API_PROVIDERS[provider]['chat']
+    response_chunks = [continuation] if continuation else []
+    continuations = 0
+    while True:
+        chat_args = {}
+        if response_chunks and (continuations or continuation):
+            chat_args['continuation'] = ''.join(response_chunks)
+        if stats is not None:
+            chat_args['usage'] = {}
+        if args.context_cache:
+            chat_args['context_cache_ttl'] = args.context_cache
+        if args.keep_alive is not None:
+            chat_args['keep_alive'] = args.keep_alive
+        if conversation is not None:
+            # Continuations follow the conversation's response, not the truncated response
+            chat_args['conversation'] = dict(conversation)
+        try:
+            for chunk in api_func(pool_manager, model, system_prompt, prompt, args.temp, args.topp, args.maxtok, **chat_args):
+                response_chunks.append(chunk)
+                yield chunk
+            if conversation is not None:
+                conversation.update(chat_args['conversation'])
+            return
+        except TruncatedResponseError:
+            if continuations >= args.continuations or not response_chunks:
+                raise
+            continuations += 1
+            print(f'\nResponse truncated - continuing ({continuations} of {args.continuations})', file=sys.stderr)
+        finally:
+            if stats is not None:
+                stats.add_usage(chat_args['usage'])
@@ -0,0 +1,250 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Asyncio HTTP client for the async API chat functions
+"""
+
+import asyncio
+import ssl
+import urllib.parse
+
+import urllib3
+
+
+# The read size of response bodies that are not chunked
+_READ_SIZE = 65536
+
+
+class AsyncPoolManager:
+    """
+    Minimal asyncio-streams HTTP/1.1 client - the async counterpart of the urllib3 PoolManager passed
+    to the chat functions. Connections are kept alive and reused - up to maxsize idle connections are
+    kept per host, once a response is read to its end. A pool manager may be shared by any number of
+    concurrent requests on its event loop.
+
+    Requests are not retried, proxies are not supported, and response bodies are not decompressed
+    (no Accept-Encoding header is sent).
+    """
+
+    __slots__ = ('maxsize', '_ssl_context', '_idle')
+
+
+    def __init__(self, maxsize=10, ssl_context=None):
+        self.maxsize = maxsize
+        self._ssl_context = ssl_context
+        self._idle = {}
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.clear()
+
+
+    # Close the idle connections
+    def clear(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+    # Send a request and return its AsyncResponse, once the response status and headers are read
+    async def request(self, method, url, headers=None, body=None):
+        url_parts = urllib.parse.urlsplit(url)
+        is_https = url_parts.scheme == 'https'
+        host = url_parts.hostname
+        port = url_parts.port or (443 if is_https else 80)
+        host_key = (url_parts.scheme, host, port)
+
+        # Encode the request
+        target = url_parts.path or '/'
+        if url_parts.query:
+            target += f'?{url_parts.query}'
+        request_lines = [f'{method} {target} HTTP/1.1', f'Host: {url_parts.netloc}']
+        request_lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        if body is not None:
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            request_lines.append(f'Content-Length: {len(body)}')
+        request_bytes = ('\r\n'.join(request_lines) + '\r\n\r\n').encode('latin-1')
+        if body:
+            request_bytes += body
+
+        # Send the request on an idle connection, if any. An idle connection may have been closed by
+        # the server - if so, the request is sent on a new connection.
+        idle_connections = self._idle.get(host_key)
+        while True:
+            is_reused = bool(idle_connections)
+            if is_reused:
+                reader, writer = idle_connections.pop()
+            else:
+                ssl_context = None
+                if is_https:
+                    if self._ssl_context is None:
+                        self._ssl_context = ssl.create_default_context()
+                    ssl_context = self._ssl_context
+                reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+            try:
+                writer.write(request_bytes)
+                await writer.drain()
+                status, response_headers = await _read_response_head(reader)
+                break
+            except (ConnectionError, urllib3.exceptions.ProtocolError):
+                writer.close()
+                if not is_reused:
+                    raise
+            except BaseException:
+                writer.close()
+                raise
+
+        return AsyncResponse(self, host_key, method, status, response_headers, reader, writer)
+
+
+    # Return a connection to the idle connections, if there's room
+    def _release(self, host_key, reader, writer):
+        idle_connections = self._idle.setdefault(host_key, [])
+        if len(idle_connections) < self.maxsize:
+            idle_connections.append((reader, writer))
+        else:
+            writer.close()
+
+
+class AsyncResponse:
+    """
+    An AsyncPoolManager response. The headers dict's keys are lowercase. The response body is read
+    with the read method or iterated with the read_chunked async generator. A response that's not
+    read to its end must be closed, which closes its connection.
+    """
+
+    __slots__ = ('status', 'headers', '_pool_manager', '_host_key', '_reader', '_writer', '_body_length', '_is_done')
+
+
+    def __init__(self, pool_manager, host_key, method, status, headers, reader, writer):
+        self.status = status
+        self.headers = headers
+        self._pool_manager = pool_manager
+        self._host_key = host_key
+        self._reader = reader
+        self._writer = writer
+
+        # Determine the body's framing - a body length of None is chunked and -1 is read to EOF
+        self._is_done = False
+        if method == 'HEAD' or status in (204, 304):
+            self._body_length = 0
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            self._body_length = None
+        elif 'content-length' in headers:
+            try:
+                self._body_length = int(headers['content-length'])
+            except ValueError as exc:
+                self.close()
+                raise urllib3.exceptions.ProtocolError(f'Invalid Content-Length {headers["content-length"]!r}') from exc
+        else:
+            self._body_length = -1
+
+
+    # Read the entire response body
+    async def read(self):
+        return b''.join([chunk async for chunk in self.read_chunked()])
+
+
+    # Yield the response body's byte chunks as they arrive
+    async def read_chunked(self):
+        if self._is_done:
+            return
+        reader = self._reader
+        try:
+            # Chunked transfer encoding
+            if self._body_length is None:
+                while True:
+                    size_line = await reader.readline()
+                    if not size_line.endswith(b'\n'):
+                        raise asyncio.IncompleteReadError(size_line, None)
+                    try:
+                        size = int(size_line.split(b';', 1)[0], 16)
+                    except ValueError as exc:
+                        raise urllib3.exceptions.ProtocolError(f'Invalid chunk size {size_line!r}') from exc
+                    if size == 0:
+                        # Skip the trailers
+                        while True:
+                            trailer_line = await reader.readline()
+                            if not trailer_line.endswith(b'\n'):
+                                raise asyncio.IncompleteReadError(trailer_line, None)
+                            if not trailer_line.strip():
+                                break
+                        break
+                    chunk = await reader.readexactly(size)
+                    if (await reader.readline()).strip():
+                        raise urllib3.exceptions.ProtocolError('Invalid chunk terminator')
+                    yield chunk
+
+            # Content-Length body
+            elif self._body_length >= 0:
+                remaining = self._body_length
+                while remaining:
+                    chunk = await reader.read(min(remaining, _READ_SIZE))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b'', remaining)
+                    remaining -= len(chunk)
+                    yield chunk
+
+            # Body is read until the connection is closed
+            else:
+                while chunk := await reader.read(_READ_SIZE):
+                    yield chunk
+                self.close()
+                return
+
+        except asyncio.IncompleteReadError as exc:
+            self.close()
+            raise urllib3.exceptions.ProtocolError('Response ended prematurely') from exc
+        except BaseException:
+            self.close()
+            raise
+
+        # The response is done - reuse its connection, if possible
+        self._is_done = True
+        if self.headers.get('connection', '').lower() == 'close':
+            self._writer.close()
+        else:
+            self._pool_manager._release(self._host_key, self._reader, self._writer) # pylint: disable=protected-access
+
+
+    # Close the response - the connection is closed if the response was not read to its end
+    def close(self):
+        if not self._is_done:
+            self._is_done = True
+            self._writer.close()
+
+
+# Helper to read a response's status and headers, skipping any informational (1xx) responses
+async def _read_response_head(reader):
+    while True:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed without a response')
+        status_parts = status_line.split(None, 2)
+        if len(status_parts) < 2 or not status_parts[0].startswith(b'HTTP/') or not status_parts[1].isdigit():
+            raise urllib3.exceptions.ProtocolError(f'Invalid status line {status_line!r}')
+        status = int(status_parts[1])
+
+        # Read the headers
+        headers = {}
+        while True:
+            header_line = await reader.readline()
+            if not header_line.endswith(b'\n'):
+                raise urllib3.exceptions.ProtocolError('Response ended prematurely')
+            header_line = header_line.rstrip(b'\r\n')
+            if not header_line:
+                break
+            name, _, value = header_line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = f'{headers[name]}, {value}' if name in headers else value
+
+        if status >= 200:
+            return status, headers
@@ -0,0 +1,81 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Provider batch API utilities
+
+A batch function accepts a list of batch request dicts - "model", "system_prompt", "prompt",
+"temperature", "top_p", and "max_tokens" - and returns the list of (response text, error message)
+tuples in request order.
+"""
+
+import sys
+import time
+
+import urllib3
+
+from ._json import json_loads
+from ._retry import RETRY_STATUSES
+
+
+# The batch status poll interval, in seconds
+BATCH_POLL_INTERVAL = 30
+
+
+# Get a batch request's custom ID
+def get_custom_id(ix_request):
+    return f'request-{ix_request}'
+
+
+# Raised by the batch API request helpers for a request's error status
+class BatchRequestError(urllib3.exceptions.HTTPError):
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+# Poll a provider batch until it ends - get_batch returns the batch object and is_ended tests it. The
+# batch was submitted, so a poll that fails with a transient status or a connection error (even once
+# its retries are exhausted) is reported and polling continues.
+def poll_batch(get_batch, is_ended, poll_interval=BATCH_POLL_INTERVAL):
+    while True:
+        try:
+            batch = get_batch()
+        except BatchRequestError as exc:
+            if exc.status not in RETRY_STATUSES:
+                raise
+            print(f'Batch status request failed with status {exc.status} - polling again', file=sys.stderr)
+        except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.ProtocolError) as exc:
+            print(f'Batch status request failed with error: {getattr(exc, "reason", None) or exc} - polling again', file=sys.stderr)
+        else:
+            if is_ended(batch):
+                return batch
+        time.sleep(poll_interval)
+
+
+# Report a submitted batch to stderr - the batch ID identifies the batch in the provider's console
+def print_batch_submitted(provider_name, batch_id, request_count):
+    print(f'{provider_name} batch {batch_id} submitted ({request_count} requests)', file=sys.stderr)
+
+
+# Helper to make a JSON API request and return the response JSON
+def request_json(pool_manager, error_prefix, method, url, **kwargs):
+    response = pool_manager.request(method=method, url=url, retries=0, **kwargs)
+    try:
+        if response.status != 200:
+            raise BatchRequestError(f'{error_prefix} failed with status {response.status}', response.status)
+        return response.json()
+    finally:
+        response.close()
+
+
+# Helper to make an API request and return the JSON Lines response's row objects
+def request_json_lines(pool_manager, error_prefix, url, headers):
+    response = pool_manager.request(method='GET', url=url, headers=headers, retries=0)
+    try:
+        if response.status != 200:
+            raise BatchRequestError(f'{error_prefix} failed with status {response.status}', response.status)
+        return [json_loads(line) for line in response.data.splitlines() if line.strip()]
+    finally:
+        response.close()
@@ -0,0 +1,94 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Local cache file utilities
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+
+# Get the local cache directory - None if there is no home directory
+def get_cache_dir():
+    cache_dir = os.getenv('CTXKIT_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    cache_home = os.getenv('XDG_CACHE_HOME')
+    if not cache_home:
+        home_dir = os.getenv('HOME') or os.getenv('USERPROFILE')
+        if not home_dir:
+            return None
+        cache_home = os.path.join(home_dir, '.cache')
+    return os.path.join(cache_home, 'ctxkit')
+
+
+# Determine if the local caches are used for a pool manager's requests - cassettes record and replay
+# the requests in order, so a recording's requests must not depend on the local cache state
+def use_local_cache(pool_manager):
+    return getattr(pool_manager, 'local_cache', True) is not False
+
+
+# Load a local cache index JSON file
+def load_cache_index(index_name):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return {}
+    try:
+        with open(os.path.join(cache_dir, index_name), 'r', encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+
+
+# Update and save a local cache index JSON file. The update is serialized across threads and
+# processes, and the index is written atomically. A cache write failure is not an error - the cache
+# entry is lost.
+def update_cache_index(index_name, update_fn):
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with lock_cache_file(os.path.join(cache_dir, f'{index_name}.lock')):
+            cache_index = load_cache_index(index_name)
+            update_fn(cache_index)
+            index_data = json.dumps(cache_index, indent=2, sort_keys=True).encode('utf-8')
+            write_cache_file(os.path.join(cache_dir, index_name), index_data)
+    except OSError:
+        pass
+
+
+# The in-process local cache lock - fcntl locks serialize the local cache updates across processes
+_CACHE_LOCK = threading.Lock()
+
+
+# Context manager to hold a local cache lock file's exclusive lock. Without fcntl (Windows), updates
+# are only serialized within the process.
+@contextlib.contextmanager
+def lock_cache_file(lock_path):
+    with _CACHE_LOCK, open(lock_path, 'ab') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# Write a local cache file's bytes atomically - the data is written to a unique temporary file in the
+# same directory, which then replaces the file
+def write_cache_file(path, data):
+    cache_fd, path_temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with open(cache_fd, 'wb') as cache_file:
+            cache_file.write(data)
+        os.replace(path_temp, path)
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(path_temp)
@@ -0,0 +1,91 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+API request and response compression
+"""
+
+import gzip
+
+import urllib3
+
+
+# The compressed response encodings accepted by GET requests - urllib3 decodes them
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+# Request bodies smaller than this many bytes are not compressed
+COMPRESS_MIN_SIZE = 1024
+
+
+# The HTTP status codes of a server that rejects a compressed request body
+REJECT_STATUSES = frozenset((400, 415))
+
+
+# urllib3 PoolManager proxy that negotiates compressed responses and compresses request bodies
+class CompressPoolManager:
+    """
+    GET requests (e.g. model lists and URL fetches) accept gzip and deflate compressed responses.
+    Streamed chat responses are not compressed, so their chunks are not delayed. If compress is true,
+    request bodies of at least COMPRESS_MIN_SIZE bytes are gzip compressed. A request whose compressed
+    body is rejected - with a 415 or 400 status - or whose compressed response is undecodable is
+    retried without compression, and the host is not sent compressed requests thereafter. A 400 status
+    that the uncompressed request also gets is an API error, so the host's compression is kept.
+    """
+
+    def __init__(self, pool_manager, compress=False):
+        self.pool_manager = pool_manager
+        self.compress = compress
+        self.uncompressed_hosts = set()
+
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
+
+
+    def request(self, *args, **kwargs):
+        method = args[0] if args else kwargs['method']
+        url = args[1] if len(args) > 1 else kwargs['url']
+        host = urllib3.util.parse_url(url).netloc
+        compressed_kwargs = self._get_compressed_kwargs(method, kwargs) if host not in self.uncompressed_hosts else None
+        if compressed_kwargs is None:
+            return self.pool_manager.request(*args, **kwargs)
+
+        # Make the compressed request - fallback to the uncompressed request if rejected. Error statuses
+        # of GET requests are API errors.
+        try:
+            response = self.pool_manager.request(*args, **compressed_kwargs)
+        except urllib3.exceptions.DecodeError:
+            response = None
+        if response is not None:
+            if method == 'GET' or response.status not in REJECT_STATUSES:
+                return response
+            response.close()
+        uncompressed_response = self.pool_manager.request(*args, **kwargs)
+        if response is None or response.status != 400 or uncompressed_response.status != 400:
+            self.uncompressed_hosts.add(host)
+        return uncompressed_response
+
+
+    # Helper to get the compressed request's keyword arguments - None if the request is not compressed
+    def _get_compressed_kwargs(self, method, kwargs):
+        headers = dict(kwargs.get('headers') or {})
+        header_names = {header_name.lower() for header_name in headers}
+        body = kwargs.get('body')
+
+        # Accept compressed GET responses
+        if method == 'GET':
+            if 'accept-encoding' in header_names:
+                return None
+            headers['Accept-Encoding'] = ACCEPT_ENCODING
+            return {**kwargs, 'headers': headers}
+
+        # Compress the request body?
+        if not self.compress or body is None or 'content-encoding' in header_names:
+            return None
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if len(body) < COMPRESS_MIN_SIZE:
+            return None
+        headers['Content-Encoding'] = 'gzip'
+        return {**kwargs, 'headers': headers, 'body': gzip.compress(body, compresslevel=6, mtime=0)}
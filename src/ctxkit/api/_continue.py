@@ -0,0 +1,47 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Truncated response continuation utilities
+"""
+
+import os
+
+import urllib3
+
+
+# Raised by the chat functions when a response is cut off by the max tokens limit
+class TruncatedResponseError(urllib3.exceptions.HTTPError):
+    pass
+
+
+# The user turn that follows the partial response when continuing a truncated response
+CONTINUE_PROMPT = '''\
+Your response was cut off. Continue it from exactly where it stopped - do not repeat any of the
+response text and do not add any commentary.'''
+
+
+# Helper to create the chat messages that continue a truncated response
+def continue_messages(continuation):
+    return [
+        {'role': 'assistant', 'content': continuation},
+        {'role': 'user', 'content': CONTINUE_PROMPT}
+    ]
+
+
+# Helper to skip the continued response's leading text that repeats the partial response's
+# trailing whitespace (stripped from an assistant prefill)
+class PrefillTrim:
+    __slots__ = ('_skip',)
+
+
+    def __init__(self, skip):
+        self._skip = skip
+
+
+    def trim(self, text):
+        if self._skip:
+            common = len(os.path.commonprefix((self._skip, text)))
+            text = text[common:]
+            self._skip = self._skip[common:] if not text else ''
+        return text
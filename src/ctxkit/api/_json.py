@@ -0,0 +1,63 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Pluggable JSON backend for API request encoding and streamed response decoding.
+
+The fastest installed backend is used - orjson, then msgspec, then the standard library json
+module. Set the CTXKIT_JSON environment variable to "orjson", "msgspec", or "json" to select a
+specific backend.
+"""
+
+import json
+import os
+
+
+# Standard library backend - encoded compactly as UTF-8, the same as urllib3's "json" argument
+def _json_loads(data):
+    return json.loads(data)
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+# The available JSON backends, fastest first - name => (loads, dumps). The loads function accepts
+# bytes, bytearray, or str and raises ValueError on invalid JSON. The dumps function returns bytes.
+JSON_BACKENDS = {}
+
+try:
+    import orjson
+    JSON_BACKENDS['orjson'] = (orjson.loads, orjson.dumps) # pylint: disable=no-member
+except ImportError: # pragma: no cover
+    pass
+
+try:
+    import msgspec
+except ImportError: # pragma: no cover
+    pass
+else: # pragma: no cover
+    _MSGSPEC_DECODER = msgspec.json.Decoder()
+    _MSGSPEC_ENCODER = msgspec.json.Encoder()
+
+    def _msgspec_loads(data):
+        try:
+            return _MSGSPEC_DECODER.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    JSON_BACKENDS['msgspec'] = (_msgspec_loads, _MSGSPEC_ENCODER.encode)
+
+JSON_BACKENDS['json'] = (_json_loads, _json_dumps)
+
+
+# Get a JSON backend's (loads, dumps) functions by name - the fastest available, by default
+def get_json_backend(name=None):
+    if name:
+        if name not in JSON_BACKENDS:
+            raise ValueError(f'Unknown JSON backend "{name}". Available backends are: {", ".join(JSON_BACKENDS)}')
+        return JSON_BACKENDS[name]
+    return next(iter(JSON_BACKENDS.values()))
+
+
+# The selected JSON backend
+json_loads, json_dumps = get_json_backend(os.getenv('CTXKIT_JSON'))
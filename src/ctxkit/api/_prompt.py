@@ -0,0 +1,95 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+API prompt utilities
+
+A prompt is either a string or a list of prompt item (item type, text) tuples.
+"""
+
+import hashlib
+import math
+
+
+# The prompt item types whose text is stable from run to run
+STABLE_ITEM_TYPES = ('file',)
+
+
+# The prompt item types that are split into shards
+SHARD_ITEM_TYPES = ('file',)
+
+
+# The conservative characters-per-token ratio used to estimate token counts (source code tokenizes
+# denser than prose)
+PROMPT_CHARS_PER_TOKEN = 3
+
+
+# Estimate a text's token count
+def get_text_tokens(text):
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+# Get the prompt text
+def get_prompt_text(prompt):
+    if isinstance(prompt, str):
+        return prompt
+    return '\n\n'.join(item_text for _, item_text in prompt)
+
+
+# Split the prompt into its stable prefix text, through the last stable item, and its volatile
+# suffix text - the prefix is empty if there are no stable items
+def split_prompt(prompt):
+    if isinstance(prompt, str):
+        return ('', prompt)
+    ix_split = _get_prefix_length(prompt)
+    return (get_prompt_text(prompt[:ix_split]), get_prompt_text(prompt[ix_split:]))
+
+
+# Split the prompt into its stable prefix item texts and its volatile suffix item texts, for
+# providers that accept a content block per prompt item - empty items are omitted
+def split_prompt_items(prompt):
+    if isinstance(prompt, str):
+        return ([], [prompt] if prompt else [])
+    ix_split = _get_prefix_length(prompt)
+    return (
+        [item_text for _, item_text in prompt[:ix_split] if item_text],
+        [item_text for _, item_text in prompt[ix_split:] if item_text]
+    )
+
+
+# Helper to get the prompt's stable prefix item count
+def _get_prefix_length(prompt):
+    return max((ix_item + 1 for ix_item, (item_type, _) in enumerate(prompt) if item_type in STABLE_ITEM_TYPES), default=0)
+
+
+# Split the prompt into shard prompts whose file items total at most max_tokens estimated tokens,
+# including the prompt's other items, which are in every shard. A file item larger than a shard is its
+# own shard. A string prompt is one shard.
+def split_prompt_shards(prompt, max_tokens):
+    if isinstance(prompt, str):
+        return [prompt]
+    other_tokens = sum(get_text_tokens(item_text) for item_type, item_text in prompt if item_type not in SHARD_ITEM_TYPES)
+    shard_groups = [set()]
+    shard_tokens = other_tokens
+    for ix_item, (item_type, item_text) in enumerate(prompt):
+        if item_type in SHARD_ITEM_TYPES:
+            item_tokens = get_text_tokens(item_text)
+            if shard_groups[-1] and shard_tokens + item_tokens > max_tokens:
+                shard_groups.append(set())
+                shard_tokens = other_tokens
+            shard_groups[-1].add(ix_item)
+            shard_tokens += item_tokens
+    return [
+        [item for ix_item, item in enumerate(prompt) if item[0] not in SHARD_ITEM_TYPES or ix_item in shard_group]
+        for shard_group in shard_groups
+    ]
+
+
+# Get the hex SHA-256 hash of a model's system prompt and stable prompt prefix
+def get_prefix_hash(model, system_prompt, prompt_prefix):
+    prefix_hash = hashlib.sha256()
+    for prefix_part in (model, system_prompt or '', prompt_prefix):
+        prefix_part_bytes = prefix_part.encode('utf-8')
+        prefix_hash.update(len(prefix_part_bytes).to_bytes(8, 'big'))
+        prefix_hash.update(prefix_part_bytes)
+    return prefix_hash.hexdigest()
@@ -0,0 +1,116 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Local API response cache utilities
+
+Each cached response is a zlib-compressed file named by its request hash in the "responses"
+directory of the local cache directory. An entry's modification time is its last use - when the
+cache exceeds its maximum size, the least-recently used entries are removed. Entries are written
+atomically, and writes and evictions are serialized across processes with a lock file. A cache write
+failure is not an error - the cache entry is lost.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import zlib
+
+from ._cache import get_cache_dir, lock_cache_file, write_cache_file
+from ._prompt import get_prompt_text
+
+# The default maximum response cache size, in megabytes
+DEFAULT_RESPONSE_CACHE_SIZE = 100
+
+
+# The response cache directory name, in the local cache directory
+_RESPONSES_DIR_NAME = 'responses'
+
+
+# The response cache entry file extension
+_RESPONSE_EXT = '.zlib'
+
+
+# Get the hex SHA-256 hash of an API request's provider, model, system prompt, prompt, model
+# parameters, and edit format
+def get_response_hash(provider, model, system_prompt, prompt, temperature, top_p, max_tokens, edit_format):
+    request_parts = (
+        provider,
+        model,
+        system_prompt or '',
+        get_prompt_text(prompt),
+        json.dumps([temperature, top_p, max_tokens]),
+        edit_format
+    )
+    response_hash = hashlib.sha256()
+    for request_part in request_parts:
+        request_part_bytes = request_part.encode('utf-8')
+        response_hash.update(len(request_part_bytes).to_bytes(8, 'big'))
+        response_hash.update(request_part_bytes)
+    return response_hash.hexdigest()
+
+
+# Load a cached response - None if not cached
+def load_response(response_hash):
+    responses_dir = _get_responses_dir()
+    if responses_dir is None:
+        return None
+    response_path = os.path.join(responses_dir, f'{response_hash}{_RESPONSE_EXT}')
+    try:
+        with open(response_path, 'rb') as response_file:
+            response = zlib.decompress(response_file.read()).decode('utf-8')
+    except (OSError, zlib.error, UnicodeDecodeError):
+        return None
+
+    # Mark the entry as recently used
+    try:
+        os.utime(response_path)
+    except OSError: # pragma: no cover
+        pass
+    return response
+
+
+# Save a response to the cache, removing the least-recently used entries if the cache exceeds its
+# maximum size, in megabytes. A cache write failure is not an error - the response is not cached.
+def save_response(response_hash, response, max_size):
+    responses_dir = _get_responses_dir()
+    if responses_dir is None:
+        return
+    try:
+        os.makedirs(responses_dir, exist_ok=True)
+        with lock_cache_file(os.path.join(responses_dir, '.lock')):
+            response_path = os.path.join(responses_dir, f'{response_hash}{_RESPONSE_EXT}')
+            write_cache_file(response_path, zlib.compress(response.encode('utf-8')))
+            _evict_responses(responses_dir, max_size)
+    except OSError:
+        pass
+
+
+# Helper to remove the least-recently used response cache entries until the cache fits its maximum
+# size, in megabytes
+def _evict_responses(responses_dir, max_size):
+    entries = []
+    cache_size = 0
+    for dir_entry in os.scandir(responses_dir):
+        if dir_entry.name.endswith(_RESPONSE_EXT):
+            try:
+                entry_stat = dir_entry.stat()
+            except OSError: # pragma: no cover
+                continue
+            entries.append((entry_stat.st_mtime_ns, dir_entry.path, entry_stat.st_size))
+            cache_size += entry_stat.st_size
+    max_size_bytes = max_size * 1024 * 1024
+    if cache_size > max_size_bytes:
+        for _, entry_path, entry_size in sorted(entries):
+            with contextlib.suppress(OSError):
+                os.remove(entry_path)
+            cache_size -= entry_size
+            if cache_size <= max_size_bytes:
+                break
+
+
+# Helper to get the response cache directory - None if there is no local cache directory
+def _get_responses_dir():
+    cache_dir = get_cache_dir()
+    return os.path.join(cache_dir, _RESPONSES_DIR_NAME) if cache_dir is not None else None
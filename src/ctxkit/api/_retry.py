@@ -0,0 +1,123 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+Shared API request retry policy
+"""
+
+import email.utils
+import random
+import sys
+import time
+
+import urllib3
+
+
+# The default maximum retries per request
+DEFAULT_RETRIES = 4
+
+
+# The transient HTTP status codes - rate limited (429), overloaded (529), and unavailable
+RETRY_STATUSES = frozenset((408, 429, 502, 503, 504, 529))
+
+
+# API request retry policy
+class RetryPolicy:
+    """
+    Requests that fail with a transient status or a connection error are retried with jittered
+    exponential backoff, or after the delay specified by the response's "retry-after-ms" or
+    "Retry-After" header. Retries occur before any of the response body is read, so no streamed
+    output has been emitted. The run's retries are limited by the retry budget, shared by all
+    requests.
+    """
+
+    __slots__ = ('max_retries', 'budget', 'backoff_base', 'backoff_max', 'max_delay')
+
+
+    def __init__(self, max_retries=DEFAULT_RETRIES, budget=10, backoff_base=1.0, backoff_max=30.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.budget = budget
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_delay = max_delay
+
+
+    # Get the delay, in seconds, before the retry attempt (zero-based) - None to not retry
+    def get_delay(self, attempt, response=None):
+        if attempt >= self.max_retries or self.budget <= 0:
+            return None
+
+        # Use the response's requested delay, if any
+        delay = _get_retry_after(response) if response is not None else None
+        if delay is not None:
+            return delay if delay <= self.max_delay else None
+
+        # Jittered exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+# urllib3 PoolManager proxy that retries transient request failures
+class RetryPoolManager:
+
+    def __init__(self, pool_manager, policy):
+        self.pool_manager = pool_manager
+        self.policy = policy
+
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
+
+
+    def request(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            # Make the request
+            try:
+                response = self.pool_manager.request(*args, **kwargs)
+            except (urllib3.exceptions.MaxRetryError, urllib3.exceptions.ProtocolError) as exc:
+                delay = self.policy.get_delay(attempt)
+                if delay is None:
+                    raise
+                reason = f'with error: {getattr(exc, "reason", None) or exc}'
+            else:
+                if response.status not in RETRY_STATUSES:
+                    return response
+                delay = self.policy.get_delay(attempt, response)
+                if delay is None:
+                    return response
+                reason = f'with status {response.status}'
+                response.close()
+
+            # Wait and retry
+            attempt += 1
+            self.policy.budget -= 1
+            print(f'API request failed {reason} - retry {attempt} of {self.policy.max_retries} in {delay:.1f} seconds', file=sys.stderr)
+            time.sleep(delay)
+
+
+# Helper to get a response's requested retry delay, in seconds
+def _get_retry_after(response):
+    headers = response.headers
+
+    # Milliseconds (Anthropic and OpenAI)
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms is not None:
+        try:
+            return max(float(retry_after_ms) / 1000, 0)
+        except ValueError:
+            pass
+
+    # Seconds or HTTP date
+    retry_after = headers.get('retry-after')
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+        try:
+            retry_date = email.utils.parsedate_to_datetime(retry_after)
+            return max(retry_date.timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+
+    return None
@@ -5,9 +5,9 @@
 Shared SSE event parser for streaming API responses.
 """
 
-import codecs
-import itertools
-import json
+import urllib3
+
+from ._json import json_loads
 
 
 # Yield SSE events from a urllib3 chunked response
@@ -16,38 +16,149 @@ def iter_sse_events(response):
     Each yielded value is either the literal string '[DONE]' (the sentinel some
     providers send) or a parsed JSON value (typically a dict).
 
-    Handles HTTP chunks that split an event's 'data:' line across boundaries:
-    when a 'data:' line fails to parse as JSON, the partial JSON is held until
-    the next line arrives and concatenated, whether or not that next line
-    carries its own 'data:' prefix.
+    Events are framed per the SSE specification (see SSEParser), so each event's
+    data payload is parsed exactly once, regardless of how the HTTP chunks split
+    it. Events with no data (e.g. keep-alive events) are skipped.
+    """
+    for _, data, _ in iter_sse_messages(response.read_chunked()):
+        if data:
+            yield _decode_event_data(data)
+
+
+# Yield SSE events from an AsyncPoolManager response - the async counterpart of iter_sse_events
+async def aiter_sse_events(response):
+    parser = SSEParser()
+    async for chunk in response.read_chunked():
+        for _, data, _ in parser.feed(chunk):
+            if data:
+                yield _decode_event_data(data)
+    for _, data, _ in parser.close():
+        if data:
+            yield _decode_event_data(data)
+
+
+# Helper to decode an SSE event's data
+def _decode_event_data(data):
+    if data == b'[DONE]':
+        return '[DONE]'
+    try:
+        return json_loads(data)
+    except ValueError as exc:
+        raise urllib3.exceptions.HTTPError(f'Invalid streamed event: {data.decode("utf-8", errors="replace")!r}') from exc
+
+
+# Yield the (event type, data bytes, last event ID) tuples from an iterable of SSE byte chunks
+def iter_sse_messages(chunks):
+    parser = SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
 
-    Uses an incremental UTF-8 decoder so that multi-byte codepoints split
-    across HTTP chunks are reconstructed instead of raising UnicodeDecodeError.
+
+class SSEParser:
     """
-    decoder = codecs.getincrementaldecoder('utf-8')()
-    data_prefix = None
-    for line in itertools.chain.from_iterable(
-        decoder.decode(chunk).splitlines() for chunk in response.read_chunked()
-    ):
-        if data_prefix is not None and not line.startswith('data: '):
-            # Continuation of a partial 'data:' line arriving without its own
-            # 'data:' prefix (i.e. the actual chunk-boundary case)
-            combined = data_prefix + line
-            try:
-                yield json.loads(combined)
-                data_prefix = None
-            except json.JSONDecodeError:
-                data_prefix = combined
-        elif line.startswith('data: '):
-            data = line[6:]
-            if data == '[DONE]':
-                yield '[DONE]'
-            else:
-                # Continuation where the next chunk also begins with 'data:'
-                if data_prefix is not None:
-                    data = data_prefix + data
-                    data_prefix = None
-                try:
-                    yield json.loads(data)
-                except json.JSONDecodeError:
-                    data_prefix = data
+    Incremental, byte-level Server-Sent Events (SSE) stream parser
+
+    Bytes are fed as they arrive from the network, without regard to line or event boundaries. Each
+    call to feed returns the list of events completed by the fed bytes as (event type, data bytes,
+    last event ID) tuples. The event type defaults to "message" and multi-line "data:" fields are
+    joined with newlines, per the specification.
+
+    Lines may end with CRLF, LF, or CR - including a CRLF split across chunks. Bytes that do not
+    complete a line are held, without re-scanning, until a line terminator arrives, so the cost of
+    parsing is linear in the stream size no matter how pathologically it is chunked.
+
+    Unlike a browser EventSource, the final event is dispatched at the end of the stream even if
+    its terminating blank line is missing. The providers verify their own terminator events.
+    """
+
+    __slots__ = ('retry', '_pending', '_skip_lf', '_started', '_event_type', '_data', '_last_event_id')
+
+
+    def __init__(self):
+        self.retry = None
+        self._pending = []
+        self._skip_lf = False
+        self._started = False
+        self._event_type = None
+        self._data = []
+        self._last_event_id = ''
+
+
+    def feed(self, chunk):
+        events = []
+        if not chunk:
+            return events
+
+        # Strip the UTF-8 byte-order mark, if any, from the start of the stream
+        if not self._started:
+            self._started = True
+            if chunk.startswith(b'\xef\xbb\xbf'):
+                chunk = chunk[3:]
+
+        # Skip the LF of a CRLF split across chunks
+        if self._skip_lf:
+            self._skip_lf = False
+            if chunk.startswith(b'\n'):
+                chunk = chunk[1:]
+
+        # No line terminator? Hold the bytes until one arrives.
+        if b'\n' not in chunk and b'\r' not in chunk:
+            if chunk:
+                self._pending.append(chunk)
+            return events
+
+        # Split the complete lines, holding any trailing partial line
+        self._pending.append(chunk)
+        lines = b''.join(self._pending).splitlines(keepends=True)
+        self._pending.clear()
+        last_line = lines[-1]
+        if not last_line.endswith((b'\n', b'\r')):
+            self._pending.append(lines.pop())
+        elif last_line.endswith(b'\r'):
+            self._skip_lf = True
+
+        # Process the lines
+        for line in lines:
+            self._process_line(line.rstrip(b'\r\n'), events)
+        return events
+
+
+    def close(self):
+        events = []
+        if self._pending:
+            self._process_line(b''.join(self._pending), events)
+            self._pending.clear()
+        self._process_line(b'', events)
+        return events
+
+
+    def _process_line(self, line, events):
+        # Blank line - dispatch the event, if any
+        if not line:
+            if self._data:
+                event_type = self._event_type.decode('utf-8', errors='replace') if self._event_type else 'message'
+                data = self._data[0] if len(self._data) == 1 else b'\n'.join(self._data)
+                events.append((event_type, data, self._last_event_id))
+                self._data = []
+            self._event_type = None
+            return
+
+        # Comment line?
+        if line.startswith(b':'):
+            return
+
+        # Parse the field
+        name, _, value = line.partition(b':')
+        if value.startswith(b' '):
+            value = value[1:]
+        if name == b'data':
+            self._data.append(value)
+        elif name == b'event':
+            self._event_type = value
+        elif name == b'id':
+            if b'\0' not in value:
+                self._last_event_id = value.decode('utf-8', errors='replace')
+        elif name == b'retry':
+            if value.isdigit():
+                self.retry = int(value)
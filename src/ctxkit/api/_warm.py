@@ -0,0 +1,23 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+API connection warm-up
+"""
+
+
+# Open a pooled connection to a URL's host, so that a later request reuses the connected (and TLS
+# handshaken) connection. A pooled connection that's still connected is left as is. Errors are
+# ignored - the request reports them.
+def warm_connection(pool_manager, url):
+    connection_pool = pool_manager.connection_from_url(url)
+    connection = connection_pool._get_conn() # pylint: disable=protected-access
+    try:
+        if not connection.is_connected:
+            connection.connect()
+    except Exception:
+        connection.close()
+        connection = None
+
+    # Return the connection to the pool - a failed connection's slot is returned empty, as urllib3 does
+    connection_pool._put_conn(connection) # pylint: disable=protected-access
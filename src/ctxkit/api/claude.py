@@ -9,7 +9,11 @@ import os
 
 import urllib3
 
-from ._sse import iter_sse_events
+from ._batch import get_custom_id, poll_batch, print_batch_submitted, request_json, request_json_lines
+from ._continue import PrefillTrim, TruncatedResponseError
+from ._json import json_dumps
+from ._prompt import get_prompt_text, split_prompt_items
+from ._sse import aiter_sse_events, iter_sse_events
 
 
 # Get the Anthropic API key
@@ -23,22 +27,52 @@ def get_api_key():
 # API endpoint
 ANTHROPIC_URL = 'https://api.anthropic.com/v1/messages'
 ANTHROPIC_MODELS_URL = 'https://api.anthropic.com/v1/models'
+ANTHROPIC_BATCHES_URL = 'https://api.anthropic.com/v1/messages/batches'
 
 
 # Anthropic API requires max_tokens
 ANTHROPIC_MAX_TOKENS = 8000
 
 
-# Call the Claude API and yield the response chunk strings
-def claude_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
-    # Make POST request with streaming
-    api_key = get_api_key()
-    messages = [{'role': 'user', 'content': prompt}]
+# Prompt cache breakpoint
+_CACHE_CONTROL = {'type': 'ephemeral'}
+
+
+# Map of Anthropic usage keys to usage keys
+_USAGE_KEYS = (
+    ('input_tokens', 'input_tokens'),
+    ('cache_read_input_tokens', 'cache_read_tokens'),
+    ('cache_creation_input_tokens', 'cache_write_tokens'),
+    ('output_tokens', 'output_tokens')
+)
+
+
+# Helper to update the usage dict from an Anthropic usage object
+def _update_usage(usage, claude_usage):
+    if claude_usage:
+        for claude_key, usage_key in _USAGE_KEYS:
+            if claude_usage.get(claude_key) is not None:
+                usage[usage_key] = claude_usage[claude_key]
+
+
+# Helper to create the Claude Messages API request
+def _get_claude_json(model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
+    # Stable prompt prefix (e.g. files)? If so, each prompt item is a content block and the system
+    # prompt and the last prefix block are marked as cache breakpoints, so that repeated requests read
+    # them from the prompt cache.
+    prefix_items, suffix_items = split_prompt_items(prompt)
+    if prefix_items:
+        content = [{'type': 'text', 'text': item_text} for item_text in (*prefix_items, *suffix_items)]
+        content[len(prefix_items) - 1]['cache_control'] = _CACHE_CONTROL
+        if system_prompt:
+            system_prompt = [{'type': 'text', 'text': system_prompt, 'cache_control': _CACHE_CONTROL}]
+    else:
+        content = get_prompt_text(prompt)
+
     claude_json = {
         'model': model,
-        'messages': messages,
-        'max_tokens': max_tokens or ANTHROPIC_MAX_TOKENS,
-        'stream': True
+        'messages': [{'role': 'user', 'content': content}],
+        'max_tokens': max_tokens or ANTHROPIC_MAX_TOKENS
     }
     if system_prompt:
         claude_json['system'] = system_prompt
@@ -46,15 +80,45 @@ def claude_chat(pool_manager, model, system_prompt, prompt, temperature=None, to
         claude_json['temperature'] = temperature
     if top_p is not None:
         claude_json['top_p'] = top_p
+    return claude_json
+
+
+# Helper to create the Claude Messages API streaming request and its prefill trim, if any
+def _get_claude_chat_json(model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None):
+    claude_json = _get_claude_json(model, system_prompt, prompt, temperature, top_p, max_tokens)
+    claude_json['stream'] = True
+
+    # Continue a truncated response? Prefill the partial response - the prefill must not end with
+    # whitespace, so the continued response's repeat of it is skipped.
+    prefill_trim = None
+    if continuation:
+        prefill = continuation.rstrip()
+        prefill_trim = PrefillTrim(continuation[len(prefill):])
+        claude_json['messages'].append({'role': 'assistant', 'content': prefill})
+
+    return claude_json, prefill_trim
+
+
+# Helper to get the Claude API request headers
+def _get_chat_headers(api_key):
+    return {
+        'x-api-key': api_key,
+        'anthropic-version': '2023-06-01',
+        'Content-Type': 'application/json'
+    }
+
+
+# Call the Claude API and yield the response chunk strings
+def claude_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None,
+                usage=None):
+    # Make POST request with streaming
+    api_key = get_api_key()
+    claude_json, prefill_trim = _get_claude_chat_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation)
     response = pool_manager.request(
         method='POST',
         url=ANTHROPIC_URL,
-        headers={
-            'x-api-key': api_key,
-            'anthropic-version': '2023-06-01',
-            'Content-Type': 'application/json'
-        },
-        json=claude_json,
+        headers=_get_chat_headers(api_key),
+        body=json_dumps(claude_json),
         preload_content=False,
         retries=0
     )
@@ -63,45 +127,158 @@ def claude_chat(pool_manager, model, system_prompt, prompt, temperature=None, to
             raise urllib3.exceptions.HTTPError(f'Claude API failed with status {response.status}')
 
         # Process the streaming response
-        stop_reason = None
-        saw_terminator = False
+        claude_stream = _ClaudeStream(usage, prefill_trim)
         for event in iter_sse_events(response):
-            if event == '[DONE]':
-                saw_terminator = True
+            yield from claude_stream.process(event)
+            if claude_stream.done:
                 break
+        claude_stream.finish()
 
-            # Check for API errors in the event
-            event_type = event.get('type')
-            if event_type == 'error':
-                error_message = event.get('error', {}).get('message', 'Unknown API error')
-                raise urllib3.exceptions.HTTPError(f'Claude API error: {error_message}')
-
-            # Track stop_reason from message_delta event (carries final stop_reason)
-            if event_type == 'message_delta':
-                new_stop_reason = event.get('delta', {}).get('stop_reason')
-                if new_stop_reason:
-                    stop_reason = new_stop_reason
-
-            # message_stop event is the real Anthropic terminator
-            if event_type == 'message_stop':
-                saw_terminator = True
+    finally:
+        response.close()
+
+
+# Call the Claude API with an AsyncPoolManager and yield the response chunk strings - the async
+# counterpart of claude_chat
+async def claude_chat_async(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None,
+                            continuation=None, usage=None):
+    api_key = get_api_key()
+    claude_json, prefill_trim = _get_claude_chat_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation)
+    response = await pool_manager.request('POST', ANTHROPIC_URL, headers=_get_chat_headers(api_key), body=json_dumps(claude_json))
+    try:
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(f'Claude API failed with status {response.status}')
+
+        # Process the streaming response
+        claude_stream = _ClaudeStream(usage, prefill_trim)
+        async for event in aiter_sse_events(response):
+            for chunk in claude_stream.process(event):
+                yield chunk
+            if claude_stream.done:
                 break
+        claude_stream.finish()
+
+    finally:
+        response.close()
+
+
+# The Claude Messages API response stream's state - the streamed events are processed in order and
+# finish is called at the end of the stream
+class _ClaudeStream:
+    __slots__ = ('done', '_usage', '_prefill_trim', '_stop_reason')
+
+
+    def __init__(self, usage, prefill_trim):
+        self.done = False
+        self._usage = usage
+        self._prefill_trim = prefill_trim
+        self._stop_reason = None
+
+
+    # Yield a streamed event's response chunk strings - done is set by the terminator event
+    def process(self, event):
+        if event == '[DONE]':
+            self.done = True
+            return
+
+        # Check for API errors in the event
+        event_type = event.get('type')
+        if event_type == 'error':
+            error_message = event.get('error', {}).get('message', 'Unknown API error')
+            raise urllib3.exceptions.HTTPError(f'Claude API error: {error_message}')
+
+        # Track the token usage - message_start has the input usage and message_delta the
+        # cumulative output usage
+        if self._usage is not None:
+            if event_type == 'message_start':
+                _update_usage(self._usage, event.get('message', {}).get('usage'))
+            elif event_type == 'message_delta':
+                _update_usage(self._usage, event.get('usage'))
 
-            # Yield content from content_block_delta
-            if event_type == 'content_block_delta' and 'delta' in event:
-                delta = event['delta']
-                if 'text' in delta:
-                    yield delta['text']
+        # Track stop_reason from message_delta event (carries final stop_reason)
+        if event_type == 'message_delta':
+            new_stop_reason = event.get('delta', {}).get('stop_reason')
+            if new_stop_reason:
+                self._stop_reason = new_stop_reason
 
-        # Detect silent truncation: bad stop_reason, or dropped connection without
-        # any completion signal. A known-good stop_reason is itself a clean terminator.
+        # message_stop event is the real Anthropic terminator
+        if event_type == 'message_stop':
+            self.done = True
+            return
+
+        # Yield content from content_block_delta
+        if event_type == 'content_block_delta' and 'delta' in event:
+            delta = event['delta']
+            if 'text' in delta:
+                text = delta['text'] if self._prefill_trim is None else self._prefill_trim.trim(delta['text'])
+                if text:
+                    yield text
+
+
+    # Detect silent truncation: bad stop_reason, or dropped connection without any completion
+    # signal. A known-good stop_reason is itself a clean terminator.
+    def finish(self):
+        stop_reason = self._stop_reason
+        if stop_reason == 'max_tokens':
+            raise TruncatedResponseError(f'Claude API response truncated (stop_reason: {stop_reason})')
         if stop_reason is not None and stop_reason not in ('end_turn', 'stop_sequence'):
             raise urllib3.exceptions.HTTPError(f'Claude API response truncated (stop_reason: {stop_reason})')
-        if stop_reason is None and not saw_terminator:
+        if stop_reason is None and not self.done:
             raise urllib3.exceptions.HTTPError('Claude API stream ended unexpectedly without terminator')
 
-    finally:
-        response.close()
+
+# Run the batch requests with the Claude Message Batches API and return the list of (response text,
+# error message) tuples
+def claude_batch(pool_manager, requests):
+    headers = _get_chat_headers(get_api_key())
+
+    # Create the message batch
+    batch_json = {
+        'requests': [
+            {
+                'custom_id': get_custom_id(ix_request),
+                'params': _get_claude_json(
+                    request['model'], request['system_prompt'], request['prompt'],
+                    request['temperature'], request['top_p'], request['max_tokens']
+                )
+            }
+            for ix_request, request in enumerate(requests)
+        ]
+    }
+    batch = request_json(
+        pool_manager, 'Claude batch API', 'POST', ANTHROPIC_BATCHES_URL, headers=headers, body=json_dumps(batch_json)
+    )
+    batch_id = batch['id']
+    print_batch_submitted('Claude', batch_id, len(requests))
+
+    # Wait for the batch to end and get its results
+    batch = poll_batch(
+        lambda: request_json(pool_manager, 'Claude batch API', 'GET', f'{ANTHROPIC_BATCHES_URL}/{batch_id}', headers=headers),
+        lambda batch: batch.get('processing_status') == 'ended'
+    )
+    batch_results = request_json_lines(pool_manager, 'Claude batch API', batch['results_url'], headers)
+    results = {batch_result.get('custom_id'): batch_result.get('result') or {} for batch_result in batch_results}
+    return [_get_batch_result(results.get(get_custom_id(ix_request))) for ix_request in range(len(requests))]
+
+
+# Helper to get a Claude batch request result's (response text, error message) tuple
+def _get_batch_result(result):
+    if result is None:
+        return (None, 'Claude batch request result not found')
+    result_type = result.get('type')
+    if result_type == 'errored':
+        error = result.get('error') or {}
+        error_message = (error.get('error') or error).get('message', 'Unknown API error')
+        return (None, f'Claude API error: {error_message}')
+    if result_type != 'succeeded':
+        return (None, f'Claude batch request {result_type}')
+
+    # Get the message's text
+    message = result.get('message') or {}
+    stop_reason = message.get('stop_reason')
+    if stop_reason not in ('end_turn', 'stop_sequence'):
+        return (None, f'Claude API response truncated (stop_reason: {stop_reason})')
+    return (''.join(block['text'] for block in message.get('content', []) if block.get('type') == 'text'), None)
 
 
 # List available Claude models
@@ -110,11 +287,7 @@ def claude_list(pool_manager):
     response = pool_manager.request(
         method='GET',
         url=ANTHROPIC_MODELS_URL,
-        headers={
-            'x-api-key': api_key,
-            'anthropic-version': '2023-06-01',
-            'Content-Type': 'application/json'
-        },
+        headers=_get_chat_headers(api_key),
         retries=0
     )
     try:
@@ -7,10 +7,16 @@ Google Gemini API utilities
 
 import json
 import os
+import sys
+import time
 
 import urllib3
 
-from ._sse import iter_sse_events
+from ._cache import load_cache_index, update_cache_index, use_local_cache
+from ._continue import CONTINUE_PROMPT, TruncatedResponseError
+from ._json import json_dumps
+from ._prompt import get_prefix_hash, get_prompt_text, split_prompt, split_prompt_items
+from ._sse import aiter_sse_events, iter_sse_events
 
 
 # Get the Google API key
@@ -24,6 +30,19 @@ def get_api_key():
 # API endpoint
 GEMINI_URL_TEMPLATE = 'https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent'
 GEMINI_MODELS_URL = 'https://generativelanguage.googleapis.com/v1beta/models'
+GEMINI_CACHE_URL = 'https://generativelanguage.googleapis.com/v1beta/cachedContents'
+
+
+# Cached contents within this many seconds of expiry are not reused
+GEMINI_CACHE_EXPIRY_MARGIN = 60
+
+
+# The local cached content index - prefix hash to {"name", "expires"}
+_CACHE_INDEX_NAME = 'gemini-cache.json'
+
+
+# The HTTP status codes of a request whose cached content expired or was deleted
+_CACHED_CONTENT_MISSING_STATUSES = (403, 404)
 
 
 # Helper function to format Gemini API errors
@@ -44,13 +63,26 @@ def _format_gemini_error(base_message, error_data=None):
     return error_message
 
 
-# Call the Gemini API and yield the response chunk strings
-def gemini_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
-    # Make POST request with streaming
-    api_key = get_api_key()
-    contents = [{'role': 'user', 'parts': [{'text': prompt}]}]
+# Helper to update the usage dict from a Gemini usage metadata object
+def _update_usage(usage, usage_metadata):
+    if usage_metadata.get('promptTokenCount') is not None:
+        usage['input_tokens'] = usage_metadata['promptTokenCount']
+    if usage_metadata.get('cachedContentTokenCount') is not None:
+        usage['cache_read_tokens'] = usage_metadata['cachedContentTokenCount']
+    if usage_metadata.get('candidatesTokenCount') is not None:
+        usage['output_tokens'] = usage_metadata['candidatesTokenCount']
+
+
+# Helper to create the Gemini streaming request. If there's a stable prompt prefix (e.g. files), each
+# prompt item is a content part.
+def _get_gemini_json(system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None):
+    prefix_items, suffix_items = split_prompt_items(prompt)
+    if prefix_items:
+        prompt_parts = [{'text': item_text} for item_text in (*prefix_items, *suffix_items)]
+    else:
+        prompt_parts = [{'text': get_prompt_text(prompt)}]
     gemini_json = {
-        'contents': contents
+        'contents': [{'role': 'user', 'parts': prompt_parts}, *_get_continue_contents(continuation)]
     }
     if system_prompt:
         gemini_json['systemInstruction'] = {'parts': [{'text': system_prompt}]}
@@ -63,58 +95,219 @@ def gemini_chat(pool_manager, model, system_prompt, prompt, temperature=None, to
         generation_config['maxOutputTokens'] = max_tokens
     if generation_config:
         gemini_json['generationConfig'] = generation_config
+    return gemini_json
+
+
+# Helper to get the contents that continue a truncated response
+def _get_continue_contents(continuation):
+    if not continuation:
+        return []
+    return [
+        {'role': 'model', 'parts': [{'text': continuation}]},
+        {'role': 'user', 'parts': [{'text': CONTINUE_PROMPT}]}
+    ]
+
+
+# Helper to get the error message of a failed Gemini API response
+def _get_status_error(status, data):
+    error_data = None
+    try:
+        error_data = json.loads(data.decode('utf-8'))
+    except Exception:
+        pass
+    return _format_gemini_error(f'Gemini API failed with status {status}', error_data)
+
+
+# Call the Gemini API and yield the response chunk strings
+def gemini_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None,
+                usage=None, context_cache_ttl=None):
+    # Make POST request with streaming
+    api_key = get_api_key()
+    gemini_json = _get_gemini_json(system_prompt, prompt, temperature, top_p, max_tokens, continuation)
+
+    # Use an explicit context cache of the stable prompt prefix (e.g. files)? The cache contains the
+    # system instruction and the prefix, so the request sends only the volatile suffix.
+    prefix_items, suffix_items = split_prompt_items(prompt)
+    cache_key = None
+    cached_json = None
+    if context_cache_ttl and prefix_items and suffix_items:
+        prompt_prefix, _ = split_prompt(prompt)
+        cache_key = get_prefix_hash(model, system_prompt, prompt_prefix)
+        cached_content = _get_cached_content(
+            pool_manager, api_key, model, system_prompt, prefix_items, cache_key, context_cache_ttl, use_local_cache(pool_manager)
+        )
+        if cached_content is not None:
+            cached_json = {key: value for key, value in gemini_json.items() if key != 'systemInstruction'}
+            suffix_parts = [{'text': item_text} for item_text in suffix_items]
+            cached_json['contents'] = [{'role': 'user', 'parts': suffix_parts}, *_get_continue_contents(continuation)]
+            cached_json['cachedContent'] = cached_content
 
     url = GEMINI_URL_TEMPLATE.format(model=model)
-    response = pool_manager.request(
+    response = None
+    if cached_json is not None:
+        response = _gemini_stream_request(pool_manager, f'{url}?key={api_key}&alt=sse', cached_json)
+
+        # The cached content expired or was deleted? If so, forget it and make the full request. Other
+        # errors are not retried uncached.
+        if response.status in _CACHED_CONTENT_MISSING_STATUSES:
+            response.close()
+            response = None
+            if use_local_cache(pool_manager):
+                update_cache_index(_CACHE_INDEX_NAME, lambda cache_index: cache_index.pop(cache_key, None))
+    if response is None:
+        response = _gemini_stream_request(pool_manager, f'{url}?key={api_key}&alt=sse', gemini_json)
+    try:
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, response.data))
+
+        # Process the streaming response
+        gemini_stream = _GeminiStream(usage)
+        for event in iter_sse_events(response):
+            yield from gemini_stream.process(event)
+        gemini_stream.finish()
+
+    finally:
+        response.close()
+
+
+# Call the Gemini API with an AsyncPoolManager and yield the response chunk strings - the async
+# counterpart of gemini_chat. Explicit context caching is not supported.
+async def gemini_chat_async(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None,
+                            continuation=None, usage=None):
+    api_key = get_api_key()
+    gemini_json = _get_gemini_json(system_prompt, prompt, temperature, top_p, max_tokens, continuation)
+    url = GEMINI_URL_TEMPLATE.format(model=model)
+    response = await pool_manager.request(
+        'POST', f'{url}?key={api_key}&alt=sse', headers={'Content-Type': 'application/json'}, body=json_dumps(gemini_json)
+    )
+    try:
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, await response.read()))
+
+        # Process the streaming response
+        gemini_stream = _GeminiStream(usage)
+        async for event in aiter_sse_events(response):
+            for chunk in gemini_stream.process(event):
+                yield chunk
+        gemini_stream.finish()
+
+    finally:
+        response.close()
+
+
+# The Gemini response stream's state - the streamed events are processed in order and finish is
+# called at the end of the stream (Gemini does not send '[DONE]')
+class _GeminiStream:
+    __slots__ = ('_usage', '_finish_reason')
+
+
+    def __init__(self, usage):
+        self._usage = usage
+        self._finish_reason = None
+
+
+    # Yield a streamed event's response chunk strings
+    def process(self, event):
+        # Check for errors in the stream
+        if 'error' in event:
+            error_message = _format_gemini_error('Gemini API streaming error', event)
+            raise urllib3.exceptions.HTTPError(error_message)
+
+        # Track the token usage - each chunk carries the cumulative usage
+        if self._usage is not None and event.get('usageMetadata'):
+            _update_usage(self._usage, event['usageMetadata'])
+
+        # Yield the chunk content; the final chunk also carries finishReason
+        candidates = event.get('candidates', [])
+        if candidates:
+            candidate = candidates[0]
+            if candidate.get('finishReason'):
+                self._finish_reason = candidate['finishReason']
+            content = candidate.get('content', {})
+            parts = content.get('parts', [])
+            for part in parts:
+                text = part.get('text')
+                if text:
+                    yield text
+
+
+    # Detect silent truncation: bad finishReason, or dropped connection (no finishReason ever set)
+    def finish(self):
+        finish_reason = self._finish_reason
+        if finish_reason == 'MAX_TOKENS':
+            raise TruncatedResponseError(f'Gemini API response truncated (finishReason: {finish_reason})')
+        if finish_reason is not None and finish_reason != 'STOP':
+            raise urllib3.exceptions.HTTPError(f'Gemini API response truncated (finishReason: {finish_reason})')
+        if finish_reason is None:
+            raise urllib3.exceptions.HTTPError('Gemini API stream ended unexpectedly without finishReason')
+
+
+# Helper to make a streaming Gemini request
+def _gemini_stream_request(pool_manager, url, gemini_json):
+    return pool_manager.request(
         method='POST',
-        url=f'{url}?key={api_key}&alt=sse',
+        url=url,
         headers={
             'Content-Type': 'application/json'
         },
-        json=gemini_json,
+        body=json_dumps(gemini_json),
         preload_content=False,
         retries=0
     )
+
+
+# Helper to get the name of the cached content resource for a prompt prefix, creating it if necessary.
+# Without the local cache index, the cached content is always created.
+def _get_cached_content(pool_manager, api_key, model, system_prompt, prefix_items, cache_key, cache_ttl, local_cache=True):
+    # Reuse the unexpired cached content
+    now = time.time()
+    if local_cache:
+        cache_entry = load_cache_index(_CACHE_INDEX_NAME).get(cache_key)
+        if cache_entry is not None and cache_entry['expires'] - now > GEMINI_CACHE_EXPIRY_MARGIN:
+            return cache_entry['name']
+
+    # Create the cached content
+    cache_json = {
+        'model': f'models/{model}',
+        'contents': [{'role': 'user', 'parts': [{'text': item_text} for item_text in prefix_items]}],
+        'ttl': f'{cache_ttl}s'
+    }
+    if system_prompt:
+        cache_json['systemInstruction'] = {'parts': [{'text': system_prompt}]}
+    response = pool_manager.request(
+        method='POST',
+        url=f'{GEMINI_CACHE_URL}?key={api_key}',
+        headers={
+            'Content-Type': 'application/json'
+        },
+        body=json_dumps(cache_json),
+        retries=0
+    )
     try:
+        # Failure to create the cached content (e.g. the prefix is too small to cache) is not an error
         if response.status != 200:
             error_data = None
             try:
                 error_data = json.loads(response.data.decode('utf-8'))
             except Exception:
                 pass
-            error_message = _format_gemini_error(f'Gemini API failed with status {response.status}', error_data)
-            raise urllib3.exceptions.HTTPError(error_message)
-
-        # Process the streaming response (Gemini does not send '[DONE]')
-        finish_reason = None
-        for event in iter_sse_events(response):
-            # Check for errors in the stream
-            if 'error' in event:
-                error_message = _format_gemini_error('Gemini API streaming error', event)
-                raise urllib3.exceptions.HTTPError(error_message)
-
-            # Yield the chunk content; the final chunk also carries finishReason
-            candidates = event.get('candidates', [])
-            if candidates:
-                candidate = candidates[0]
-                if candidate.get('finishReason'):
-                    finish_reason = candidate['finishReason']
-                content = candidate.get('content', {})
-                parts = content.get('parts', [])
-                for part in parts:
-                    text = part.get('text')
-                    if text:
-                        yield text
-
-        # Detect silent truncation: bad finishReason, or dropped connection (no finishReason ever set)
-        if finish_reason is not None and finish_reason != 'STOP':
-            raise urllib3.exceptions.HTTPError(f'Gemini API response truncated (finishReason: {finish_reason})')
-        if finish_reason is None:
-            raise urllib3.exceptions.HTTPError('Gemini API stream ended unexpectedly without finishReason')
-
+            error_message = _format_gemini_error(f'Gemini context cache creation failed with status {response.status}', error_data)
+            print(error_message, file=sys.stderr)
+            return None
+        cache_name = response.json()['name']
     finally:
         response.close()
 
+    # Add the cached content to the index, removing the expired entries
+    if local_cache:
+        def update_index(cache_index):
+            for expired_key in [key for key, entry in cache_index.items() if entry['expires'] <= now]:
+                del cache_index[expired_key]
+            cache_index[cache_key] = {'name': cache_name, 'expires': now + cache_ttl}
+        update_cache_index(_CACHE_INDEX_NAME, update_index)
+
+    return cache_name
+
 
 # List available Gemini models
 def gemini_list(pool_manager):
@@ -10,7 +10,11 @@ import os
 
 import urllib3
 
-from ._sse import iter_sse_events
+from ._batch import get_custom_id, poll_batch, print_batch_submitted, request_json, request_json_lines
+from ._continue import TruncatedResponseError, continue_messages
+from ._json import json_dumps
+from ._prompt import get_prefix_hash, get_prompt_text, split_prompt, split_prompt_items
+from ._sse import aiter_sse_events, iter_sse_events
 
 
 # Get the OpenAI API key
@@ -24,6 +28,12 @@ def get_api_key():
 # API endpoint
 OPENAI_URL = 'https://api.openai.com/v1/responses'
 OPENAI_MODELS_URL = 'https://api.openai.com/v1/models'
+OPENAI_FILES_URL = 'https://api.openai.com/v1/files'
+OPENAI_BATCHES_URL = 'https://api.openai.com/v1/batches'
+
+
+# The OpenAI batch statuses of an ended batch
+_BATCH_ENDED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
 
 
 # Helper function to format OpenAI API errors
@@ -44,15 +54,35 @@ def _format_openai_error(base_message, error_data=None):
     return error_message
 
 
-# Call the OpenAI Responses API and yield the response chunk strings
-def gpt_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
-    # Make POST request with streaming
-    api_key = get_api_key()
+# Helper to update the usage dict from an OpenAI usage object
+def _update_usage(usage, openai_usage):
+    if openai_usage:
+        if openai_usage.get('input_tokens') is not None:
+            usage['input_tokens'] = openai_usage['input_tokens']
+        cached_tokens = (openai_usage.get('input_tokens_details') or {}).get('cached_tokens')
+        if cached_tokens is not None:
+            usage['cache_read_tokens'] = cached_tokens
+        if openai_usage.get('output_tokens') is not None:
+            usage['output_tokens'] = openai_usage['output_tokens']
+
+
+# Helper to create the OpenAI Responses API request
+def _get_gpt_json(model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
     gpt_json = {
-        'model': model,
-        'input': prompt,
-        'stream': True
+        'model': model
     }
+
+    # Stable prompt prefix (e.g. files)? If so, each prompt item is an input content item and the
+    # prompt cache key is the prefix's hash, so that repeated requests are routed to the same prompt
+    # cache.
+    prefix_items, suffix_items = split_prompt_items(prompt)
+    if prefix_items:
+        content = [{'type': 'input_text', 'text': item_text} for item_text in (*prefix_items, *suffix_items)]
+        gpt_json['input'] = [{'role': 'user', 'content': content}]
+        prompt_prefix, _ = split_prompt(prompt)
+        gpt_json['prompt_cache_key'] = get_prefix_hash(model, system_prompt, prompt_prefix)[:32]
+    else:
+        gpt_json['input'] = get_prompt_text(prompt)
     if system_prompt:
         gpt_json['instructions'] = system_prompt
     if temperature is not None:
@@ -61,67 +91,232 @@ def gpt_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p
         gpt_json['top_p'] = top_p
     if max_tokens is not None:
         gpt_json['max_output_tokens'] = max_tokens
+    return gpt_json
+
+
+# Helper to create the OpenAI Responses API streaming request
+def _get_gpt_chat_json(model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None,
+                       conversation=None):
+    gpt_json = _get_gpt_json(model, system_prompt, prompt, temperature, top_p, max_tokens)
+    gpt_json['stream'] = True
+    if continuation:
+        if isinstance(gpt_json['input'], str):
+            gpt_json['input'] = [{'role': 'user', 'content': gpt_json['input']}]
+        gpt_json['input'].extend(continue_messages(continuation))
+
+    # Continue a stored conversation?
+    if conversation is not None and conversation.get('response_id'):
+        gpt_json['previous_response_id'] = conversation['response_id']
+    return gpt_json
+
+
+# Helper to get the OpenAI Responses API request headers
+def _get_chat_headers(api_key):
+    return {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+
+
+# Helper to get the error message of a failed OpenAI API response
+def _get_status_error(status, data):
+    error_data = None
+    try:
+        error_data = json.loads(data.decode('utf-8'))
+    except Exception:
+        pass
+    return _format_openai_error(f'OpenAI API failed with status {status}', error_data)
+
+
+# Call the OpenAI Responses API and yield the response chunk strings
+def gpt_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None,
+             usage=None, conversation=None):
+    # Make POST request with streaming
+    api_key = get_api_key()
+    gpt_json = _get_gpt_chat_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation, conversation)
     response = pool_manager.request(
         method='POST',
         url=OPENAI_URL,
-        headers={
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        },
-        json=gpt_json,
+        headers=_get_chat_headers(api_key),
+        body=json_dumps(gpt_json),
         preload_content=False,
         retries=0
     )
     try:
         if response.status != 200:
-            error_data = None
-            try:
-                error_data = json.loads(response.data.decode('utf-8'))
-            except Exception:
-                pass
-            error_message = _format_openai_error(f'OpenAI API failed with status {response.status}', error_data)
-            raise urllib3.exceptions.HTTPError(error_message)
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, response.data))
 
         # Process the streaming response
-        saw_terminator = False
+        gpt_stream = _GPTStream(usage, conversation)
         for event in iter_sse_events(response):
-            if event == '[DONE]':
-                saw_terminator = True
+            yield from gpt_stream.process(event)
+            if gpt_stream.done:
                 break
+        gpt_stream.finish()
 
-            # Check for errors in the stream
-            if 'error' in event:
-                error_message = _format_openai_error('OpenAI API streaming error', event)
-                raise urllib3.exceptions.HTTPError(error_message)
-
-            event_type = event.get('type')
-
-            # response.failed/incomplete signal truncation; response.completed is the clean terminator
-            if event_type == 'response.failed':
-                reason = event.get('response', {}).get('error', {}).get('message', 'unknown error')
-                raise urllib3.exceptions.HTTPError(f'OpenAI API response failed: {reason}')
-            if event_type == 'response.incomplete':
-                reason = event.get('response', {}).get('incomplete_details', {}).get('reason', 'unknown')
-                raise urllib3.exceptions.HTTPError(f'OpenAI API response truncated (reason: {reason})')
-            if event_type == 'response.completed':
-                saw_terminator = True
-                break
+    finally:
+        response.close()
 
-            # Yield output text deltas
-            # Expect event like: {"type": "response.output_text.delta", "delta": "text..."}
-            if event_type == 'response.output_text.delta':
-                delta_text = event.get('delta')
-                if delta_text:
-                    yield delta_text
 
-        # Detect silent truncation: dropped connection (no terminator)
-        if not saw_terminator:
-            raise urllib3.exceptions.HTTPError('OpenAI API stream ended unexpectedly without terminator')
+# Call the OpenAI Responses API with an AsyncPoolManager and yield the response chunk strings - the
+# async counterpart of gpt_chat
+async def gpt_chat_async(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None,
+                         continuation=None, usage=None, conversation=None):
+    api_key = get_api_key()
+    gpt_json = _get_gpt_chat_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation, conversation)
+    response = await pool_manager.request('POST', OPENAI_URL, headers=_get_chat_headers(api_key), body=json_dumps(gpt_json))
+    try:
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, await response.read()))
+
+        # Process the streaming response
+        gpt_stream = _GPTStream(usage, conversation)
+        async for event in aiter_sse_events(response):
+            for chunk in gpt_stream.process(event):
+                yield chunk
+            if gpt_stream.done:
+                break
+        gpt_stream.finish()
 
     finally:
         response.close()
 
 
+# The OpenAI Responses API response stream's state - the streamed events are processed in order and
+# finish is called at the end of the stream
+class _GPTStream:
+    __slots__ = ('done', '_usage', '_conversation')
+
+
+    def __init__(self, usage, conversation):
+        self.done = False
+        self._usage = usage
+        self._conversation = conversation
+
+
+    # Yield a streamed event's response chunk strings - done is set by the terminator event
+    def process(self, event):
+        if event == '[DONE]':
+            self.done = True
+            return
+
+        # Check for errors in the stream
+        if 'error' in event:
+            error_message = _format_openai_error('OpenAI API streaming error', event)
+            raise urllib3.exceptions.HTTPError(error_message)
+
+        event_type = event.get('type')
+
+        # Track the response ID for conversation continuation
+        if self._conversation is not None and event_type == 'response.created':
+            response_id = event.get('response', {}).get('id')
+            if response_id:
+                self._conversation['response_id'] = response_id
+
+        # Track the token usage - the final response object carries it
+        if self._usage is not None and event_type in ('response.completed', 'response.incomplete'):
+            _update_usage(self._usage, event.get('response', {}).get('usage'))
+
+        # response.failed/incomplete signal truncation; response.completed is the clean terminator
+        if event_type == 'response.failed':
+            reason = event.get('response', {}).get('error', {}).get('message', 'unknown error')
+            raise urllib3.exceptions.HTTPError(f'OpenAI API response failed: {reason}')
+        if event_type == 'response.incomplete':
+            reason = event.get('response', {}).get('incomplete_details', {}).get('reason', 'unknown')
+            error_class = TruncatedResponseError if reason == 'max_output_tokens' else urllib3.exceptions.HTTPError
+            raise error_class(f'OpenAI API response truncated (reason: {reason})')
+        if event_type == 'response.completed':
+            self.done = True
+            return
+
+        # Yield output text deltas
+        # Expect event like: {"type": "response.output_text.delta", "delta": "text..."}
+        if event_type == 'response.output_text.delta':
+            delta_text = event.get('delta')
+            if delta_text:
+                yield delta_text
+
+
+    # Detect silent truncation: dropped connection (no terminator)
+    def finish(self):
+        if not self.done:
+            raise urllib3.exceptions.HTTPError('OpenAI API stream ended unexpectedly without terminator')
+
+
+# Run the batch requests with the OpenAI Batch API and return the list of (response text, error
+# message) tuples
+def gpt_batch(pool_manager, requests):
+    api_key = get_api_key()
+    headers = {'Authorization': f'Bearer {api_key}'}
+    json_headers = {**headers, 'Content-Type': 'application/json'}
+
+    # Upload the batch input file
+    batch_lines = []
+    for ix_request, request in enumerate(requests):
+        gpt_json = _get_gpt_json(
+            request['model'], request['system_prompt'], request['prompt'],
+            request['temperature'], request['top_p'], request['max_tokens']
+        )
+        batch_lines.append(json_dumps({'custom_id': get_custom_id(ix_request), 'method': 'POST', 'url': '/v1/responses', 'body': gpt_json}))
+        batch_lines.append(b'\n')
+    input_file = request_json(
+        pool_manager, 'OpenAI batch API', 'POST', OPENAI_FILES_URL, headers=headers,
+        fields={'purpose': 'batch', 'file': ('batch.jsonl', b''.join(batch_lines), 'application/jsonl')}
+    )
+
+    # Create the batch
+    batch = request_json(
+        pool_manager, 'OpenAI batch API', 'POST', OPENAI_BATCHES_URL, headers=json_headers,
+        body=json_dumps({'input_file_id': input_file['id'], 'endpoint': '/v1/responses', 'completion_window': '24h'})
+    )
+    batch_id = batch['id']
+    print_batch_submitted('OpenAI', batch_id, len(requests))
+
+    # Wait for the batch to end
+    batch = poll_batch(
+        lambda: request_json(pool_manager, 'OpenAI batch API', 'GET', f'{OPENAI_BATCHES_URL}/{batch_id}', headers=json_headers),
+        lambda batch: batch.get('status') in _BATCH_ENDED_STATUSES
+    )
+    if batch['status'] == 'failed':
+        batch_errors = (batch.get('errors') or {}).get('data') or [{}]
+        raise urllib3.exceptions.HTTPError(_format_openai_error('OpenAI batch failed', {'error': batch_errors[0]}))
+
+    # Get the batch results - the output file has the successful requests and the error file the rest
+    results = {}
+    for file_id_key in ('output_file_id', 'error_file_id'):
+        file_id = batch.get(file_id_key)
+        if file_id:
+            batch_results = request_json_lines(pool_manager, 'OpenAI batch API', f'{OPENAI_FILES_URL}/{file_id}/content', headers)
+            results.update((batch_result.get('custom_id'), batch_result) for batch_result in batch_results)
+    return [_get_batch_result(results.get(get_custom_id(ix_request)), batch['status']) for ix_request in range(len(requests))]
+
+
+# Helper to get an OpenAI batch request result's (response text, error message) tuple
+def _get_batch_result(result, batch_status):
+    if result is None:
+        return (None, f'OpenAI batch request not completed (batch status: {batch_status})')
+    if result.get('error'):
+        return (None, _format_openai_error('OpenAI API error', result))
+    result_response = result.get('response') or {}
+    response_body = result_response.get('body') or {}
+    status_code = result_response.get('status_code')
+    if status_code != 200:
+        return (None, _format_openai_error(f'OpenAI API failed with status {status_code}', response_body))
+
+    # Get the response's output text
+    if response_body.get('status') == 'incomplete':
+        reason = (response_body.get('incomplete_details') or {}).get('reason', 'unknown')
+        return (None, f'OpenAI API response truncated (reason: {reason})')
+    if response_body.get('status') != 'completed':
+        return (None, f'OpenAI API response {response_body.get("status")}')
+    output_texts = [
+        content['text']
+        for output in response_body.get('output', []) if output.get('type') == 'message'
+        for content in output.get('content', []) if content.get('type') == 'output_text'
+    ]
+    return (''.join(output_texts), None)
+
+
 # List available GPT models
 def gpt_list(pool_manager):
     api_key = get_api_key()
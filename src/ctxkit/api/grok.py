@@ -10,7 +10,10 @@ import os
 
 import urllib3
 
-from ._sse import iter_sse_events
+from ._continue import TruncatedResponseError, continue_messages
+from ._json import json_dumps
+from ._prompt import get_prompt_text
+from ._sse import aiter_sse_events, iter_sse_events
 
 
 # Get the xAI API key
@@ -44,14 +47,14 @@ def _format_xai_error(base_message, error_data=None):
     return error_message
 
 
-# Call the xAI API and yield the response chunk strings
-def grok_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
-    # Make POST request with streaming
-    api_key = get_api_key()
+# Helper to create the xAI chat completions request
+def _get_grok_json(model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None):
     messages = []
     if system_prompt:
         messages.append({'role': 'system', 'content': system_prompt})
-    messages.append({'role': 'user', 'content': prompt})
+    messages.append({'role': 'user', 'content': get_prompt_text(prompt)})
+    if continuation:
+        messages.extend(continue_messages(continuation))
     xai_json = {
         'model': model,
         'messages': messages,
@@ -63,59 +66,142 @@ def grok_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_
         xai_json['top_p'] = top_p
     if max_tokens is not None:
         xai_json['max_tokens'] = max_tokens
+    return xai_json
+
+
+# Helper to get the xAI chat completions request headers
+def _get_chat_headers(api_key):
+    return {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream'
+    }
+
+
+# Helper to get the error message of a failed xAI API response
+def _get_status_error(status, data):
+    error_data = None
+    try:
+        error_data = json.loads(data.decode('utf-8'))
+    except Exception:
+        pass
+    return _format_xai_error(f'xAI API failed with status {status}', error_data)
+
+
+# Call the xAI API and yield the response chunk strings
+def grok_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, continuation=None,
+              usage=None):
+    # Make POST request with streaming
+    api_key = get_api_key()
+    xai_json = _get_grok_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation)
     response = pool_manager.request(
         method='POST',
         url=XAI_URL,
-        headers={
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json',
-            'Accept': 'text/event-stream'
-        },
-        json=xai_json,
+        headers=_get_chat_headers(api_key),
+        body=json_dumps(xai_json),
         preload_content=False,
         retries=0
     )
     try:
         if response.status != 200:
-            error_data = None
-            try:
-                error_data = json.loads(response.data.decode('utf-8'))
-            except Exception:
-                pass
-            error_message = _format_xai_error(f'xAI API failed with status {response.status}', error_data)
-            raise urllib3.exceptions.HTTPError(error_message)
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, response.data))
 
         # Process the streaming response
-        finish_reason = None
-        saw_done = False
+        grok_stream = _GrokStream(usage)
         for event in iter_sse_events(response):
-            if event == '[DONE]':
-                saw_done = True
+            yield from grok_stream.process(event)
+            if grok_stream.done:
+                break
+        grok_stream.finish()
+
+    finally:
+        response.close()
+
+
+# Call the xAI API with an AsyncPoolManager and yield the response chunk strings - the async
+# counterpart of grok_chat
+async def grok_chat_async(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None,
+                          continuation=None, usage=None):
+    api_key = get_api_key()
+    xai_json = _get_grok_json(model, system_prompt, prompt, temperature, top_p, max_tokens, continuation)
+    response = await pool_manager.request('POST', XAI_URL, headers=_get_chat_headers(api_key), body=json_dumps(xai_json))
+    try:
+        if response.status != 200:
+            raise urllib3.exceptions.HTTPError(_get_status_error(response.status, await response.read()))
+
+        # Process the streaming response
+        grok_stream = _GrokStream(usage)
+        async for event in aiter_sse_events(response):
+            for chunk in grok_stream.process(event):
+                yield chunk
+            if grok_stream.done:
                 break
+        grok_stream.finish()
+
+    finally:
+        response.close()
 
-            # Check for errors in the stream
-            if 'error' in event:
-                error_message = _format_xai_error('xAI API streaming error', event)
-                raise urllib3.exceptions.HTTPError(error_message)
 
-            # Track finish_reason for end-of-stream verification (final chunk carries it)
-            choice = event['choices'][0]
-            if choice.get('finish_reason'):
-                finish_reason = choice['finish_reason']
+# The xAI chat completions response stream's state - the streamed events are processed in order and
+# finish is called at the end of the stream
+class _GrokStream:
+    __slots__ = ('done', '_usage', '_finish_reason')
 
-            # Yield the chunk content
-            content = choice['delta'].get('content')
-            if content:
-                yield content
 
-        # Detect silent truncation: server-signalled non-stop, or dropped connection (no [DONE])
+    def __init__(self, usage):
+        self.done = False
+        self._usage = usage
+        self._finish_reason = None
+
+
+    # Yield a streamed event's response chunk strings - done is set by the terminator event
+    def process(self, event):
+        if event == '[DONE]':
+            self.done = True
+            return
+
+        # Check for errors in the stream
+        if 'error' in event:
+            error_message = _format_xai_error('xAI API streaming error', event)
+            raise urllib3.exceptions.HTTPError(error_message)
+
+        # Track the token usage
+        if self._usage is not None and event.get('usage'):
+            _update_usage(self._usage, event['usage'])
+
+        # Track finish_reason for end-of-stream verification (final chunk carries it)
+        if not event.get('choices'):
+            return
+        choice = event['choices'][0]
+        if choice.get('finish_reason'):
+            self._finish_reason = choice['finish_reason']
+
+        # Yield the chunk content
+        content = choice['delta'].get('content')
+        if content:
+            yield content
+
+
+    # Detect silent truncation: server-signalled non-stop, or dropped connection (no [DONE])
+    def finish(self):
+        finish_reason = self._finish_reason
+        if finish_reason == 'length':
+            raise TruncatedResponseError(f'xAI API response truncated (finish_reason: {finish_reason})')
         if finish_reason is not None and finish_reason != 'stop':
             raise urllib3.exceptions.HTTPError(f'xAI API response truncated (finish_reason: {finish_reason})')
-        if not saw_done:
+        if not self.done:
             raise urllib3.exceptions.HTTPError('xAI API stream ended unexpectedly without [DONE] terminator')
 
-    finally:
-        response.close()
+
+# Helper to update the usage dict from an xAI usage object
+def _update_usage(usage, xai_usage):
+    if xai_usage.get('prompt_tokens') is not None:
+        usage['input_tokens'] = xai_usage['prompt_tokens']
+    cached_tokens = (xai_usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    if cached_tokens is not None:
+        usage['cache_read_tokens'] = cached_tokens
+    if xai_usage.get('completion_tokens') is not None:
+        usage['output_tokens'] = xai_usage['completion_tokens']
 
 
 # List available Grok models
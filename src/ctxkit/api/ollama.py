@@ -1,12 +1,19 @@
 # Licensed under the MIT License
 # https://github.com/craigahobbs/ollama-chat/blob/main/LICENSE
 
-import codecs
-import json
 import os
+import time
 
 import urllib3
 
+from ._cache import load_cache_index, update_cache_index, use_local_cache
+from ._json import json_dumps, json_loads
+from ._prompt import get_prompt_text, get_text_tokens
+
+
+# The JSON request headers
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
 
 # Helper function to get an Ollama API URL
 def _get_ollama_url(path):
@@ -14,60 +21,257 @@ def _get_ollama_url(path):
     return f'{ollama_host}{path}'
 
 
-# Decode a streamed, newline-delimited JSON (NDJSON) response into individual JSON objects. The
-# Ollama API streams one JSON object per line, but HTTP chunk boundaries do not align with those
-# lines - a single chunk may carry multiple objects (common with cloud models) or a partial object
-# split across chunks. Buffer the decoded text and yield each complete JSON object as it arrives.
+# Decode a streamed, newline-delimited JSON (NDJSON) response into individual JSON objects
 def _iter_ndjson(response):
-    decoder = json.JSONDecoder()
-    text_decoder = codecs.getincrementaldecoder('utf-8')()
-    buffer = ''
+    parser = NDJSONParser()
     for data in response.read_chunked():
-        buffer += text_decoder.decode(data)
+        yield from parser.feed(data)
+    yield from parser.close()
+
+
+# Decode a streamed NDJSON AsyncPoolManager response - the async counterpart of _iter_ndjson
+async def _aiter_ndjson(response):
+    parser = NDJSONParser()
+    async for data in response.read_chunked():
+        for value in parser.feed(data):
+            yield value
+    for value in parser.close():
+        yield value
+
+
+class NDJSONParser:
+    """
+    Incremental newline-delimited JSON (NDJSON) stream parser
+
+    The Ollama API streams one JSON object per line, but HTTP chunk boundaries do not align with those
+    lines - a single chunk may carry multiple objects (common with cloud models) or a partial object
+    split across chunks. Bytes are buffered until a newline arrives and each complete line is decoded
+    exactly once. Only the newly-arrived bytes are scanned for newlines, so decoding is linear in the
+    stream size regardless of chunking.
+    """
+
+    __slots__ = ('_buffer',)
+
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+
+    # Yield the JSON values completed by the fed bytes - the values must be consumed before the next feed
+    def feed(self, data):
+        buffer = self._buffer
+
+        # No complete line yet?
+        if b'\n' not in data:
+            buffer += data
+            return
+
+        # Decode each complete line
+        search_start = len(buffer)
+        buffer += data
+        line_start = 0
         while True:
-            buffer = buffer.lstrip()
-            if not buffer:
-                break
-            try:
-                chunk, index = decoder.raw_decode(buffer)
-            except json.JSONDecodeError:
-                # Incomplete object - wait for the next chunk to complete it
+            line_end = buffer.find(b'\n', max(line_start, search_start))
+            if line_end == -1:
                 break
-            buffer = buffer[index:]
-            yield chunk
+            line = buffer[line_start:line_end]
+            line_start = line_end + 1
+            if line and not line.isspace():
+                yield _decode_ndjson_line(line)
+        del buffer[:line_start]
 
-    # The stream ended mid-object - the response was truncated or malformed
-    if buffer.strip():
-        raise urllib3.exceptions.HTTPError(f'Invalid streamed response: {buffer.strip()!r}')
 
+    # Yield the final line's JSON value, if it is not newline-terminated
+    def close(self):
+        buffer = self._buffer
+        if buffer and not buffer.isspace():
+            yield _decode_ndjson_line(buffer)
+        buffer.clear()
 
-# Call the Ollama API and yield the response chunk strings
-def ollama_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None):
-    # Is this a thinking model?
+
+def _decode_ndjson_line(line):
+    try:
+        return json_loads(line)
+    except ValueError as exc:
+        # The stream ended mid-object - the response was truncated or malformed
+        raise urllib3.exceptions.HTTPError(f'Invalid streamed response: {line.decode("utf-8", errors="replace").strip()!r}') from exc
+
+
+# The model capabilities cache - "host model" to {"capabilities", "context_length", "modified_at", "digest", "checked"}
+_MODEL_CACHE_INDEX_NAME = 'ollama-models.json'
+
+
+# Cached model capabilities are revalidated after this many seconds
+OLLAMA_MODEL_CACHE_TTL = 600
+
+
+# Get a model's capabilities and maximum context length. The model information is cached locally
+# and revalidated against the "/api/tags" model digests, so "/api/show" is only called for new or
+# updated models. The cache is not used when recording or replaying a cassette.
+def get_model_info(pool_manager, model):
+    cache_key = f'{_get_ollama_url("")} {model}' if use_local_cache(pool_manager) else None
+    now = time.time()
+
+    # Cached model information? Within the TTL it's used as is - afterward, it's revalidated using the
+    # model's "/api/tags" digest.
+    model_info = load_cache_index(_MODEL_CACHE_INDEX_NAME).get(cache_key) if cache_key is not None else None
+    if model_info is not None:
+        if now - model_info['checked'] < OLLAMA_MODEL_CACHE_TTL:
+            return model_info
+        if _revalidate_model_info(cache_key, model_info, _get_model_tags(pool_manager, model), now):
+            return model_info
+
+    # Get the model information
     url_show = _get_ollama_url('/api/show')
     data_show = {'model': model}
-    response_show = pool_manager.request('POST', url_show, json=data_show, retries=0)
+    response_show = pool_manager.request('POST', url_show, headers=_JSON_HEADERS, body=json_dumps(data_show), retries=0)
     try:
         if response_show.status != 200:
             raise urllib3.exceptions.HTTPError(f'Unknown model "{model}" ({response_show.status})')
         model_show = response_show.json()
     finally:
         response_show.close()
-    is_thinking = 'capabilities' in model_show and 'thinking' in model_show['capabilities']
+    return _update_model_info(cache_key, model_show, now)
 
-    # Start a streaming chat request
-    url_chat = _get_ollama_url('/api/chat')
+
+# Get a model's capabilities and maximum context length with an AsyncPoolManager - the async
+# counterpart of get_model_info
+async def get_model_info_async(pool_manager, model):
+    cache_key = f'{_get_ollama_url("")} {model}'
+    now = time.time()
+
+    # Cached model information?
+    model_info = load_cache_index(_MODEL_CACHE_INDEX_NAME).get(cache_key)
+    if model_info is not None:
+        if now - model_info['checked'] < OLLAMA_MODEL_CACHE_TTL:
+            return model_info
+        response_tags = await pool_manager.request('GET', _get_ollama_url('/api/tags'))
+        try:
+            model_tags = _find_model_tags(json_loads(await response_tags.read()), model) if response_tags.status == 200 else None
+        finally:
+            response_tags.close()
+        if _revalidate_model_info(cache_key, model_info, model_tags, now):
+            return model_info
+
+    # Get the model information
+    url_show = _get_ollama_url('/api/show')
+    response_show = await pool_manager.request('POST', url_show, headers=_JSON_HEADERS, body=json_dumps({'model': model}))
+    try:
+        if response_show.status != 200:
+            raise urllib3.exceptions.HTTPError(f'Unknown model "{model}" ({response_show.status})')
+        model_show = json_loads(await response_show.read())
+    finally:
+        response_show.close()
+    return _update_model_info(cache_key, model_show, now)
+
+
+# Helper to revalidate cached model information using the model's "/api/tags" entry - returns True
+# if the cached model information is current
+def _revalidate_model_info(cache_key, model_info, model_tags, now):
+    if model_tags is not None and (
+        (model_info['digest'] is not None and model_tags.get('digest') == model_info['digest']) or
+        (model_info['digest'] is None and model_tags.get('modified_at') == model_info['modified_at'])
+    ):
+        model_info['digest'] = model_tags.get('digest')
+        model_info['checked'] = now
+        update_cache_index(_MODEL_CACHE_INDEX_NAME, lambda cache_index: cache_index.update({cache_key: model_info}))
+        return True
+    return False
+
+
+# Helper to cache the model information from a model's "/api/show" response - the model information
+# is not cached if the cache key is None
+def _update_model_info(cache_key, model_show, now):
+    model_details = model_show.get('model_info') or {}
+    model_arch = model_details.get('general.architecture')
+    model_info = {
+        'capabilities': model_show.get('capabilities') or [],
+        'context_length': model_details.get(f'{model_arch}.context_length') if model_arch else None,
+        'modified_at': model_show.get('modified_at'),
+        'digest': None,
+        'checked': now
+    }
+    if cache_key is not None:
+        update_cache_index(_MODEL_CACHE_INDEX_NAME, lambda cache_index: cache_index.update({cache_key: model_info}))
+    return model_info
+
+
+# Helper to get a model's "/api/tags" entry - None if not found
+def _get_model_tags(pool_manager, model):
+    url_tags = _get_ollama_url('/api/tags')
+    response_tags = pool_manager.request('GET', url_tags, retries=0)
+    try:
+        if response_tags.status != 200:
+            return None
+        data = response_tags.json()
+    finally:
+        response_tags.close()
+    return _find_model_tags(data, model)
+
+
+# Helper to find a model's entry in the "/api/tags" response - None if not found
+def _find_model_tags(data, model):
+    model_names = (model, f'{model}:latest')
+    return next((model_tags for model_tags in data.get('models', []) if model_tags.get('name') in model_names), None)
+
+
+# The Ollama server's default context length - num_ctx is only set for prompts that need more
+OLLAMA_DEFAULT_NUM_CTX = 4096
+
+
+# The tokens reserved for the response when sizing the context, if max tokens is not specified
+OLLAMA_RESPONSE_TOKENS = 2048
+
+
+# Get the context length (num_ctx) needed for the chat messages - None if the default is sufficient.
+# The context length is rounded up to a power of two so that similar prompts don't reload the model
+# with a new context size.
+def get_num_ctx(model, model_info, messages, max_tokens=None):
+    prompt_tokens = sum(get_text_tokens(message['content']) for message in messages)
+    context_length = model_info.get('context_length')
+    if context_length is not None and prompt_tokens > context_length:
+        raise urllib3.exceptions.HTTPError(
+            f'Prompt of about {prompt_tokens:,} tokens exceeds the model "{model}" context length of {context_length:,} tokens'
+        )
+    num_ctx_needed = prompt_tokens + (max_tokens if max_tokens is not None else OLLAMA_RESPONSE_TOKENS)
+    if num_ctx_needed <= OLLAMA_DEFAULT_NUM_CTX:
+        return None
+    num_ctx = 1 << (num_ctx_needed - 1).bit_length()
+    return min(num_ctx, context_length) if context_length is not None else num_ctx
+
+
+# Load a model into memory, in preparation for a chat request
+def ollama_preload(pool_manager, model, keep_alive=None):
+    get_model_info(pool_manager, model)
+    url_generate = _get_ollama_url('/api/generate')
+    data_generate = {'model': model}
+    if keep_alive is not None:
+        data_generate['keep_alive'] = keep_alive
+    response_generate = pool_manager.request('POST', url_generate, headers=_JSON_HEADERS, body=json_dumps(data_generate), retries=0)
+    try:
+        if response_generate.status != 200:
+            raise urllib3.exceptions.HTTPError(f'Unknown model "{model}" ({response_generate.status})')
+    finally:
+        response_generate.close()
+
+
+# Helper to create the Ollama chat request
+def _get_ollama_json(model, model_info, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, keep_alive=None):
+    is_thinking = 'thinking' in model_info['capabilities']
     messages = []
     if system_prompt:
         messages.append({'role': 'system', 'content': system_prompt})
-    messages.append({'role': 'user', 'content': prompt})
+    messages.append({'role': 'user', 'content': get_prompt_text(prompt)})
     data_chat = {
         'model': model,
         'messages': messages,
         'stream': True,
         'think': is_thinking,
     }
-    if temperature is not None or top_p is not None or max_tokens is not None:
+    if keep_alive is not None:
+        data_chat['keep_alive'] = keep_alive
+    num_ctx = get_num_ctx(model, model_info, messages, max_tokens)
+    if temperature is not None or top_p is not None or max_tokens is not None or num_ctx is not None:
         data_chat['options'] = {}
     if temperature is not None:
         data_chat['options']['temperature'] = temperature
@@ -75,22 +279,68 @@ def ollama_chat(pool_manager, model, system_prompt, prompt, temperature=None, to
         data_chat['options']['top_p'] = top_p
     if max_tokens is not None:
         data_chat['options']['num_predict'] = max_tokens
-    response_chat = pool_manager.request('POST', url_chat, json=data_chat, preload_content=False, retries=0)
+    if num_ctx is not None:
+        data_chat['options']['num_ctx'] = num_ctx
+    return data_chat
+
+
+# Call the Ollama API and yield the response chunk strings
+def ollama_chat(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None, usage=None,
+                keep_alive=None):
+    # Start a streaming chat request - is this a thinking model?
+    model_info = get_model_info(pool_manager, model)
+    url_chat = _get_ollama_url('/api/chat')
+    data_chat = _get_ollama_json(model, model_info, system_prompt, prompt, temperature, top_p, max_tokens, keep_alive)
+    response_chat = pool_manager.request(
+        'POST', url_chat, headers=_JSON_HEADERS, body=json_dumps(data_chat), preload_content=False, retries=0
+    )
     try:
         if response_chat.status != 200:
             raise urllib3.exceptions.HTTPError(f'Unknown model "{model}" ({response_chat.status})')
 
         # Respond with each streamed JSON chunk
         for chunk in _iter_ndjson(response_chat):
-            if 'error' in chunk:
-                raise urllib3.exceptions.HTTPError(chunk['error'])
-            content = chunk['message']['content']
-            if content:
+            yield from _process_chunk(chunk, usage)
+    finally:
+        response_chat.close()
+
+
+# Call the Ollama API with an AsyncPoolManager and yield the response chunk strings - the async
+# counterpart of ollama_chat
+async def ollama_chat_async(pool_manager, model, system_prompt, prompt, temperature=None, top_p=None, max_tokens=None,
+                            usage=None, keep_alive=None):
+    model_info = await get_model_info_async(pool_manager, model)
+    url_chat = _get_ollama_url('/api/chat')
+    data_chat = _get_ollama_json(model, model_info, system_prompt, prompt, temperature, top_p, max_tokens, keep_alive)
+    response_chat = await pool_manager.request('POST', url_chat, headers=_JSON_HEADERS, body=json_dumps(data_chat))
+    try:
+        if response_chat.status != 200:
+            raise urllib3.exceptions.HTTPError(f'Unknown model "{model}" ({response_chat.status})')
+
+        # Respond with each streamed JSON chunk
+        async for chunk in _aiter_ndjson(response_chat):
+            for content in _process_chunk(chunk, usage):
                 yield content
     finally:
         response_chat.close()
 
 
+# Helper to yield a streamed chat chunk's content, if any
+def _process_chunk(chunk, usage):
+    if 'error' in chunk:
+        raise urllib3.exceptions.HTTPError(chunk['error'])
+    content = chunk['message']['content']
+    if content:
+        yield content
+
+    # Track the token usage - the final chunk carries it
+    if usage is not None and chunk.get('done'):
+        if chunk.get('prompt_eval_count') is not None:
+            usage['input_tokens'] = chunk['prompt_eval_count']
+        if chunk.get('eval_count') is not None:
+            usage['output_tokens'] = chunk['eval_count']
+
+
 # List available Ollama models
 def ollama_list(pool_manager):
     url_tags = _get_ollama_url('/api/tags')
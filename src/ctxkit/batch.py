@@ -0,0 +1,255 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit batch mode - run the prompt jobs of a JSON Lines file concurrently or with the providers'
+batch APIs
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import os
+import shutil
+import time
+
+import schema_markdown
+
+from .api import API_PROVIDERS, DEFAULT_SYSTEM, DEFAULT_SYSTEM_DIFF, get_provider_option_error, get_response_key, \
+    output_api_call
+from .api._responses import load_response, save_response
+from .api._retry import RetryPolicy, RetryPoolManager
+from .config import CTXKIT_SMD, fetch_text, process_config_prompt
+from .extract import FileExtractor, extract_file
+
+
+# The default maximum concurrent batch jobs
+DEFAULT_CONCURRENCY = 4
+
+
+# Run the batch jobs and write each job's JSON report line to the report file, in job order. Returns
+# the (job count, failure count) tuple.
+def run_batch(args, pool_manager, report):
+    with open(args.batch, 'r', encoding='utf-8') as batch_file:
+        job_lines = [(ix_line + 1, line) for ix_line, line in enumerate(batch_file) if line.strip()]
+
+    # Run the jobs - the jobs share the connection pool and the file text cache
+    text_cache = {}
+    failure_count = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        if args.batch_api:
+            job_reports = _run_batch_api_jobs(args, pool_manager, text_cache, executor, job_lines)
+        else:
+            job_reports = executor.map(lambda job_line: _run_job(args, pool_manager, text_cache, *job_line), job_lines)
+        for job_report in job_reports:
+            if job_report['status'] != 'ok':
+                failure_count += 1
+            print(json.dumps(job_report), file=report, flush=True)
+
+    return (len(job_lines), failure_count)
+
+
+# Helper to run a batch job and return its report
+def _run_job(args, pool_manager, text_cache, line_number, line):
+    job_report = {'line': line_number}
+    start_time = time.perf_counter()
+    try:
+        job_args, job_pool_manager, system_prompt, prompt = _prepare_job(args, pool_manager, text_cache, job_report, line)
+
+        # Call the API - the response is discarded if there's no output file
+        with _open_output(job_args) as output:
+            output_api_call(job_args, job_pool_manager, output, system_prompt, prompt)
+
+        job_report['status'] = 'ok'
+    except Exception as exc:
+        job_report['status'] = 'error'
+        job_report['error'] = str(exc)
+
+    job_report['total_ms'] = round((time.perf_counter() - start_time) * 1000, 1)
+    return job_report
+
+
+# Helper to run the batch jobs with the API providers' batch APIs and return the job reports. The jobs
+# are submitted as one batch per provider, so the job reports are available once all batches end.
+def _run_batch_api_jobs(args, pool_manager, text_cache, executor, job_lines):
+    start_time = time.perf_counter()
+
+    # Prepare the jobs
+    def prepare_job(job_line):
+        line_number, line = job_line
+        job_report = {'line': line_number}
+        try:
+            job = _prepare_job(args, pool_manager, text_cache, job_report, line)
+            provider = job[0].api[0]
+            if 'batch' not in API_PROVIDERS[provider]:
+                raise ValueError(f'--batch-api is not supported by the {provider} API')
+        except Exception as exc:
+            job_report['status'] = 'error'
+            job_report['error'] = str(exc)
+            job = None
+        return (job_report, job)
+
+    prepared_jobs = list(executor.map(prepare_job, job_lines))
+
+    # Group the jobs by provider
+    provider_jobs = {}
+    for job_report, job in prepared_jobs:
+        if job is not None:
+            provider_jobs.setdefault(job[0].api[0], []).append((job_report, job))
+
+    # Run each provider's batch and output its job responses
+    def run_provider_batch(provider, jobs):
+        # Use the cached responses, if any - the other jobs are submitted as a batch
+        response_keys = [
+            get_response_key(job_args, system_prompt, prompt) for _, (job_args, _, system_prompt, prompt) in jobs
+        ]
+        job_results = [
+            (load_response(response_key), None) if response_key is not None else (None, None)
+            for response_key in response_keys
+        ]
+        ix_batch_jobs = [ix_job for ix_job, (response, _) in enumerate(job_results) if response is None]
+        if ix_batch_jobs:
+            batch_requests = []
+            for ix_job in ix_batch_jobs:
+                _, (job_args, _, system_prompt, prompt) = jobs[ix_job]
+                batch_requests.append({
+                    'model': job_args.api[1],
+                    'system_prompt': system_prompt,
+                    'prompt': prompt,
+                    'temperature': job_args.temp,
+                    'top_p': job_args.topp,
+                    'max_tokens': job_args.maxtok
+                })
+            batch_pool_manager = pool_manager
+            if args.retries > 0:
+                batch_pool_manager = RetryPoolManager(pool_manager, RetryPolicy(args.retries))
+            try:
+                batch_results = API_PROVIDERS[provider]['batch'](batch_pool_manager, batch_requests)
+            except Exception as exc:
+                batch_results = [(None, str(exc))] * len(batch_requests)
+
+            # Cache the batch responses, if requested
+            for ix_job, (response, error) in zip(ix_batch_jobs, batch_results):
+                job_results[ix_job] = (response, error)
+                if error is None and response_keys[ix_job] is not None:
+                    save_response(response_keys[ix_job], response, args.response_cache_size)
+
+        for (job_report, (job_args, _, _, _)), (response, error) in zip(jobs, job_results):
+            try:
+                if error is not None:
+                    raise ValueError(error)
+                with _open_output(job_args) as output:
+                    output.write(f'{response}\n')
+                if job_args.extract:
+                    _extract_files(job_args, response)
+                job_report['status'] = 'ok'
+            except Exception as exc:
+                job_report['status'] = 'error'
+                job_report['error'] = str(exc)
+
+    list(executor.map(lambda provider_job: run_provider_batch(*provider_job), provider_jobs.items()))
+
+    # Each job's total time is the time to run all batches
+    total_ms = round((time.perf_counter() - start_time) * 1000, 1)
+    for job_report, _ in prepared_jobs:
+        job_report['total_ms'] = total_ms
+    return [job_report for job_report, _ in prepared_jobs]
+
+
+# Helper to extract the files from a batch job's response
+def _extract_files(args, response):
+    extractor = FileExtractor()
+    for file_path, content in extractor.feed(response) + extractor.close():
+        extract_file(args, file_path, content)
+
+
+# Helper to validate a batch job and return its (job args, job pool manager, system prompt, prompt)
+# tuple. The job's ID is added to the job report.
+def _prepare_job(args, pool_manager, text_cache, job_report, line):
+    job = schema_markdown.validate_type(CTXKIT_BATCH_TYPES, 'CtxKitBatchJob', json.loads(line))
+    if 'id' in job:
+        job_report['id'] = job['id']
+
+    # Get the job's arguments
+    job_args = argparse.Namespace(**vars(args))
+    provider = job.get('provider', args.api[0] if args.api else None)
+    model = job.get('model', args.api[1] if args.api else None)
+    if provider is None or model is None:
+        raise ValueError('No API provider and model specified')
+    if provider not in API_PROVIDERS:
+        raise ValueError(f'Unknown API provider "{provider}"')
+    provider_option_error = get_provider_option_error(args, provider)
+    if provider_option_error is not None:
+        raise ValueError(provider_option_error)
+    job_args.api = (provider, model)
+    job_args.output = job.get('output')
+    job_args.extract = job.get('extract', args.extract)
+    job_args.diff = job.get('diff', args.diff)
+
+    # Retry transient request failures - each job has its own retry budget
+    job_pool_manager = pool_manager
+    if args.retries > 0:
+        job_pool_manager = RetryPoolManager(pool_manager, RetryPolicy(args.retries))
+
+    # Get the system prompt
+    system_path = job.get('system', args.system)
+    if system_path is not None:
+        system_prompt = fetch_text(job_pool_manager, system_path, text_cache) if system_path else None
+    elif job_args.diff:
+        system_prompt = DEFAULT_SYSTEM_DIFF
+    else:
+        system_prompt = DEFAULT_SYSTEM
+
+    # Get the prompt
+    config = {'items': job['items']}
+    prompt = list(process_config_prompt(job_pool_manager, job_args, config, dict(job.get('variables', {})), text_cache=text_cache))
+
+    return (job_args, job_pool_manager, system_prompt, prompt)
+
+
+# Helper to open a batch job's output file - a discarded string buffer if there's no output file
+def _open_output(job_args):
+    if not job_args.output:
+        return io.StringIO()
+    if job_args.backup and os.path.isfile(job_args.output):
+        shutil.copy(job_args.output, f'{job_args.output}.bak')
+    output_dir = os.path.dirname(job_args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return open(job_args.output, 'w', encoding='utf-8')
+
+
+# The ctxkit batch job format
+CTXKIT_BATCH_SMD = '''\
+# A ctxkit batch job - one per line of the batch JSON Lines file
+struct CtxKitBatchJob
+
+    # The job ID, included in the job's report
+    optional string id
+
+    # The list of prompt items
+    CtxKitItem[len > 0] items
+
+    # The prompt variables
+    optional string{} variables
+
+    # The API provider (default is the "--api" provider)
+    optional string provider
+
+    # The API model (default is the "--api" model)
+    optional string model
+
+    # The response output file path (default is none)
+    optional string output
+
+    # If true, extract response files (default is the "--extract" argument)
+    optional bool extract
+
+    # If true, use unified diff format for file changes (default is the "--diff" argument)
+    optional bool diff
+
+    # The system prompt file path or URL, "" for none (default is the "--system" argument)
+    optional string system
+'''
+CTXKIT_BATCH_TYPES = schema_markdown.parse_schema_markdown(f'{CTXKIT_BATCH_SMD}\n\n{CTXKIT_SMD}')
@@ -0,0 +1,192 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit HTTP record/replay cassettes
+
+A cassette captures the raw HTTP response bytes, chunk boundaries, and timing of each request made
+through a urllib3 PoolManager, in order. Replaying a cassette returns the recorded responses, so
+they flow through the same parsing code as live responses without network access.
+
+Request bodies and headers (which contain the prompt and API keys) are not recorded. API keys in
+URL query strings are redacted.
+"""
+
+import base64
+import json
+import re
+import time
+
+import urllib3
+
+
+# The cassette file format version
+CASSETTE_VERSION = 1
+
+
+# urllib3 PoolManager proxy that records each request's response to a cassette
+class RecordPoolManager:
+
+    # The requests must not depend on the local cache state (see use_local_cache)
+    local_cache = False
+
+
+    def __init__(self, pool_manager):
+        self.pool_manager = pool_manager
+        self.interactions = []
+
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
+
+
+    def request(self, method, url, **kwargs):
+        start_time = time.perf_counter()
+        response = self.pool_manager.request(method, url, **kwargs)
+        interaction = {
+            'method': method,
+            'url': redact_url(url),
+            'status': response.status,
+            'headers': {key: value for key, value in response.headers.items() if key.lower() != 'set-cookie'},
+            'elapsed': time.perf_counter() - start_time
+        }
+        self.interactions.append(interaction)
+        return RecordResponse(response, interaction, start_time)
+
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as cassette_file:
+            json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions}, cassette_file, indent=1)
+
+
+# urllib3 HTTPResponse proxy that records the response content
+class RecordResponse:
+
+    def __init__(self, response, interaction, start_time):
+        self.response = response
+        self.interaction = interaction
+        self.start_time = start_time
+
+
+    @property
+    def status(self):
+        return self.response.status
+
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+
+    @property
+    def data(self):
+        data = self.response.data
+        self.interaction['data'] = _encode_bytes(data)
+        return data
+
+
+    def json(self):
+        return json.loads(self.data.decode('utf-8'))
+
+
+    def read_chunked(self, *args, **kwargs):
+        chunks = self.interaction.setdefault('chunks', [])
+        for chunk in self.response.read_chunked(*args, **kwargs):
+            chunks.append([round(time.perf_counter() - self.start_time, 6), _encode_bytes(chunk)])
+            yield chunk
+
+
+    def close(self):
+        self.response.close()
+
+
+    def release_conn(self):
+        self.response.release_conn()
+
+
+# urllib3 PoolManager stand-in that replays a cassette's responses, in order
+class ReplayPoolManager:
+
+    # The requests must not depend on the local cache state (see use_local_cache)
+    local_cache = False
+
+
+    def __init__(self, cassette, realtime=False):
+        self.interactions = list(cassette['interactions'])
+        self.realtime = realtime
+
+
+    @classmethod
+    def load(cls, path, realtime=False):
+        with open(path, 'r', encoding='utf-8') as cassette_file:
+            cassette = json.load(cassette_file)
+        if cassette.get('version') != CASSETTE_VERSION:
+            raise urllib3.exceptions.HTTPError(f'Unsupported cassette version, "{path}"')
+        return cls(cassette, realtime)
+
+
+    def request(self, method, url, **_kwargs):
+        # Match the next recorded request - request bodies and headers are not recorded
+        if not self.interactions:
+            raise urllib3.exceptions.HTTPError(f'No recorded response for {method} {redact_url(url)}')
+        interaction = self.interactions.pop(0)
+        if interaction['method'] != method or interaction['url'] != redact_url(url):
+            raise urllib3.exceptions.HTTPError(
+                f'Recorded request {interaction["method"]} {interaction["url"]} does not match {method} {redact_url(url)}'
+            )
+        if self.realtime:
+            time.sleep(interaction['elapsed'])
+        return ReplayResponse(interaction, self.realtime)
+
+
+# urllib3 HTTPResponse stand-in for a replayed response
+class ReplayResponse:
+
+    def __init__(self, interaction, realtime=False):
+        self.interaction = interaction
+        self.realtime = realtime
+        self.status = interaction['status']
+        self.headers = urllib3.HTTPHeaderDict(interaction['headers'])
+
+
+    @property
+    def data(self):
+        if 'data' in self.interaction:
+            return _decode_bytes(self.interaction['data'])
+        return b''.join(_decode_bytes(chunk) for _, chunk in self.interaction.get('chunks', []))
+
+
+    def json(self):
+        return json.loads(self.data.decode('utf-8'))
+
+
+    def read_chunked(self, *args, **kwargs): # pylint: disable=unused-argument
+        chunk_time = self.interaction['elapsed']
+        for offset, chunk in self.interaction.get('chunks', []):
+            if self.realtime:
+                time.sleep(max(offset - chunk_time, 0))
+                chunk_time = offset
+            yield _decode_bytes(chunk)
+
+
+    def close(self):
+        pass
+
+
+    def release_conn(self):
+        pass
+
+
+# Helper to redact API keys from a URL's query string
+def redact_url(url):
+    return _R_URL_KEY.sub(r'\1REDACTED', url)
+
+_R_URL_KEY = re.compile(r'([?&](?:key|api_key|apikey)=)[^&]*')
+
+
+def _encode_bytes(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _decode_bytes(data):
+    return base64.b64decode(data)
@@ -0,0 +1,78 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit thin client - forward the command-line arguments to a ctxkit server, if running
+"""
+
+import json
+import os
+import socket
+import sys
+
+
+def main(argv=None):
+    """
+    ctxkit command-line script client entry point
+    """
+
+    # Run the request on the server, if one is running - otherwise, run it here
+    if argv is None:
+        argv = sys.argv[1:]
+    server_path = os.getenv('CTXKIT_SERVER')
+    if server_path and '--serve' not in argv and hasattr(socket, 'AF_UNIX'):
+        exit_code = run_client(server_path, argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    # Import the ctxkit main module only when needed - the client is faster without it
+    from .main import main as ctxkit_main # pylint: disable=import-outside-toplevel
+    ctxkit_main(argv)
+
+
+# Run a request on the ctxkit server and return its exit code - None if the server is not running
+def run_client(server_path, argv):
+    stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        try:
+            client_socket.connect(server_path)
+        except OSError:
+            return None
+        with client_socket.makefile('rwb') as client_file:
+            return _run_request(client_file, argv, stdin, stdout, stderr)
+
+
+# Helper to send a request to the ctxkit server and return its exit code
+def _run_request(client_file, argv, stdin, stdout, stderr):
+    # Send the request
+    request = {
+        'argv': argv,
+        'flags': os.getenv('CTXKIT_FLAGS', ''),
+        'cwd': os.getcwd(),
+        'stdout_isatty': stdout.isatty(),
+        'stderr_isatty': stderr.isatty()
+    }
+    _send_message(client_file, request)
+
+    # Output the server's messages until it exits
+    for line in client_file:
+        message = json.loads(line)
+        if 'stdout' in message:
+            stdout.write(message['stdout'])
+            stdout.flush()
+        elif 'stderr' in message:
+            stderr.write(message['stderr'])
+            stderr.flush()
+        elif 'stdin' in message:
+            _send_message(client_file, {'stdin': stdin.read()})
+        else:
+            return message['exit']
+
+    print('\nError: ctxkit server disconnected', file=stderr)
+    return 2
+
+
+# Helper to send a JSON Lines message to the server
+def _send_message(client_file, message):
+    client_file.write(json.dumps(message).encode('utf-8') + b'\n')
+    client_file.flush()
@@ -15,12 +15,19 @@ import urllib3
 
 
 # Process a configuration model and return the prompt string
-def process_config(pool_manager, args, config, variables, root_dir='.'):
-    return '\n\n'.join(process_config_items(pool_manager, args, config, variables, root_dir))
+def process_config(pool_manager, args, config, variables, root_dir='.', text_cache=None):
+    return '\n\n'.join(process_config_items(pool_manager, args, config, variables, root_dir, text_cache))
 
 
 # Process a configuration model and yield the prompt item strings
-def process_config_items(pool_manager, args, config, variables, root_dir='.'):
+def process_config_items(pool_manager, args, config, variables, root_dir='.', text_cache=None):
+    for _, item_text in process_config_prompt(pool_manager, args, config, variables, root_dir, text_cache):
+        yield item_text
+
+
+# Process a configuration model and yield the prompt item (item type, text) tuples - directory
+# files are "file" items. File and URL text is cached in the text cache dict, if provided.
+def process_config_prompt(pool_manager, args, config, variables, root_dir='.', text_cache=None):
     # Output the prompt items
     for item in config['items']:
         item_key = list(item.keys())[0]
@@ -38,24 +45,24 @@ def process_config_items(pool_manager, args, config, variables, root_dir='.'):
 
         # Config item
         if item_key == 'config':
-            included_config = schema_markdown.validate_type(CTXKIT_TYPES, 'CtxKitConfig', json.loads(fetch_text(pool_manager, item_path)))
-            yield from process_config_items(pool_manager, args, included_config, variables, os.path.dirname(item_path))
+            included_config = schema_markdown.validate_type(CTXKIT_TYPES, 'CtxKitConfig', json.loads(fetch_text(pool_manager, item_path, text_cache)))
+            yield from process_config_prompt(pool_manager, args, included_config, variables, os.path.dirname(item_path), text_cache)
 
         # File include item
         elif item_key == 'include':
-            yield fetch_text(pool_manager, item_path)
+            yield ('include', fetch_text(pool_manager, item_path, text_cache))
 
         # File include with variables item
         elif item_key == 'template':
-            yield _replace_variables(fetch_text(pool_manager, item_path), variables)
+            yield ('template', _replace_variables(fetch_text(pool_manager, item_path, text_cache), variables))
 
         # File item
         elif item_key == 'file':
-            file_text = fetch_text(pool_manager, item_path)
+            file_text = fetch_text(pool_manager, item_path, text_cache)
             if args.diff:
                 file_text = _add_line_numbers(file_text)
             newline = '\n'
-            yield f'<{item_path}>{newline}{file_text}{newline if file_text else ""}</{item_path}>'
+            yield ('file', f'<{item_path}>{newline}{file_text}{newline if file_text else ""}</{item_path}>')
 
         # Directory item
         elif item_key == 'dir':
@@ -69,10 +76,10 @@ def process_config_items(pool_manager, args, config, variables, root_dir='.'):
             # Output the file text
             newline = '\n'
             for file_path in dir_files:
-                file_text = fetch_text(pool_manager, file_path)
+                file_text = fetch_text(pool_manager, file_path, text_cache)
                 if args.diff:
                     file_text = _add_line_numbers(file_text)
-                yield f'<{file_path}>{newline}{file_text}{newline if file_text else ""}</{file_path}>'
+                yield ('file', f'<{file_path}>{newline}{file_text}{newline if file_text else ""}</{file_path}>')
 
         # Variable definition item
         elif item_key == 'var':
@@ -80,15 +87,21 @@ def process_config_items(pool_manager, args, config, variables, root_dir='.'):
 
         # Long message item
         elif item_key == 'long':
-            yield _replace_variables('\n'.join(item['long']), variables)
+            yield ('long', _replace_variables('\n'.join(item['long']), variables))
 
         # Message item
         else: # if item_key == 'message'
-            yield _replace_variables(item['message'], variables)
+            yield ('message', _replace_variables(item['message'], variables))
 
 
-# Helper to fetch a file or URL text
-def fetch_text(pool_manager, path):
+# Helper to fetch a file or URL text, using the text cache, if provided - the text cache is a dict or
+# an object with the dict "get" and item assignment methods
+def fetch_text(pool_manager, path, text_cache=None):
+    if text_cache is not None:
+        text = text_cache.get(path)
+        if text is None:
+            text = text_cache[path] = fetch_text(pool_manager, path)
+        return text
     if is_url(path):
         response = pool_manager.request(method='GET', url=path, retries=0)
         try:
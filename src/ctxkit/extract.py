@@ -0,0 +1,181 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit response file extraction
+"""
+
+import os
+import shutil
+
+from .config import is_url
+from .diff import apply_diff
+
+
+class FileExtractor:
+    """
+    Incremental, single-pass response file tag scanner
+
+    Response text is fed as it streams. Each call to feed returns the list of (file path, content)
+    tuples completed by the fed text - or, if spans is true, the list of (file path, open tag line
+    index, close tag line index) tuples. A file is a line of the form "<path>" followed by the content
+    lines and a line beginning with "</path>".
+
+    Matching is leftmost-first: the earliest open tag that is ever closed wins, and any tags within
+    its content are ignored. An open tag that is never closed (e.g. an HTML tag in explanatory text)
+    does not hide the files that follow it. Only the lines since the earliest pending open tag are
+    held, and each line is examined once, so scanning is linear in the response size.
+    """
+
+    __slots__ = ('_spans', '_pending', '_line_index', '_lines', '_lines_base', '_candidates', '_unclosed')
+
+
+    def __init__(self, spans=False):
+        self._spans = spans
+        self._pending = []
+        self._line_index = 0
+        self._lines = []
+        self._lines_base = 0
+        self._candidates = []
+        self._unclosed = {}
+
+
+    def feed(self, text):
+        files = []
+
+        # No complete line yet?
+        if '\n' not in text:
+            if text:
+                self._pending.append(text)
+            return files
+
+        # Process the complete lines, holding any trailing partial line
+        self._pending.append(text)
+        lines = ''.join(self._pending).split('\n')
+        self._pending.clear()
+        partial = lines.pop()
+        if partial:
+            self._pending.append(partial)
+        for line in lines:
+            self._process_line(line, files)
+        return files
+
+
+    def close(self):
+        files = []
+
+        # Process the final, unterminated line
+        if self._pending:
+            self._process_line(''.join(self._pending), files)
+            self._pending.clear()
+
+        # Resolve the open tags that were never closed - each closed tag that follows is a file
+        candidates = self._candidates
+        ix_candidate = 0
+        while ix_candidate < len(candidates):
+            candidate = candidates[ix_candidate]
+            ix_candidate += 1
+            if candidate[2] is not None:
+                files.append(self._candidate_file(candidate))
+                while ix_candidate < len(candidates) and candidates[ix_candidate][1] <= candidate[2]:
+                    ix_candidate += 1
+        self._reset()
+        return files
+
+
+    def _reset(self):
+        self._lines = []
+        self._candidates = []
+        self._unclosed = {}
+
+
+    def _candidate_file(self, candidate):
+        name, open_index, close_index = candidate
+        if self._spans:
+            return (name, open_index, close_index)
+        content_lines = self._lines[open_index - self._lines_base + 1:close_index - self._lines_base]
+        return (name, '\n'.join(content_lines).strip())
+
+
+    def _process_line(self, line, files):
+        line_index = self._line_index
+        self._line_index += 1
+        if self._candidates:
+            self._lines.append(line)
+
+        # Close tag line? It closes each pending open tag of the same name, unless the tag has no
+        # content lines.
+        if line.startswith('</'):
+            name_end = line.find('>')
+            waiting = self._unclosed.pop(line[2:name_end], None) if name_end != -1 else None
+            if waiting:
+                still_waiting = []
+                for candidate in waiting:
+                    if line_index > candidate[1] + 1:
+                        candidate[2] = line_index
+                    else:
+                        still_waiting.append(candidate)
+                if still_waiting:
+                    self._unclosed[line[2:name_end]] = still_waiting
+
+                # Earliest open tag closed? It's a file, and everything within it is content.
+                head = self._candidates[0]
+                if head[2] is not None:
+                    files.append(self._candidate_file(head))
+                    self._reset()
+                    return
+
+        # Open tag line?
+        if len(line) > 2 and line[0] == '<' and line[-1] == '>':
+            name = line[1:-1]
+            if '<' not in name and '>' not in name:
+                if not self._candidates:
+                    self._lines = [line]
+                    self._lines_base = line_index
+                candidate = [name, line_index, None]
+                self._candidates.append(candidate)
+                self._unclosed.setdefault(name, []).append(candidate)
+
+
+# Get the (file path, open tag line index, close tag line index) tuples of a text's files, in order
+def get_file_spans(text):
+    extractor = FileExtractor(spans=True)
+    return extractor.feed(text) + extractor.close()
+
+
+# Extract a response file
+def extract_file(args, file_path, content):
+    file_path = os.path.normpath(file_path)
+
+    # Ignore URLs
+    if is_url(file_path):
+        return
+
+    # Delete?
+    if content == 'ctxkit: delete':
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return
+
+    # Backup the existing file
+    if args.backup and os.path.exists(file_path):
+        shutil.copy(file_path, f'{file_path}.bak')
+
+    # Create the file's parent directory
+    file_dir = os.path.dirname(file_path)
+    if file_dir: # pragma: no branch
+        os.makedirs(file_dir, exist_ok=True)
+
+    # Is content a unified diff?
+    if args.diff:
+        if os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as fh:
+                old_content = fh.read()
+        else:
+            old_content = ''
+        content = apply_diff(old_content, content)
+
+    # Write the file
+    with open(file_path, 'w', encoding='utf-8') as file_:
+        file_.write(content.strip())
+        file_.write('\n')
@@ -9,20 +9,55 @@ import argparse
 import os
 import shutil
 import sys
+import threading
 
 import urllib3
 
-from .api import API_PROVIDERS, DEFAULT_SYSTEM, DEFAULT_SYSTEM_DIFF, output_api_call
-from .config import CTXKIT_SMD, fetch_text, process_config, process_config_items
+from .api import API_PROVIDERS, DEFAULT_HEDGE_FIRST_MS, DEFAULT_HEDGE_STALL_MS, DEFAULT_SYSTEM, DEFAULT_SYSTEM_DIFF, \
+    get_all_output_path, get_provider_option_error, output_api_all, output_api_call
+from .api._compress import CompressPoolManager
+from .api._responses import DEFAULT_RESPONSE_CACHE_SIZE
+from .api._retry import DEFAULT_RETRIES, RetryPolicy, RetryPoolManager
+from .api._warm import warm_connection
+from .batch import DEFAULT_CONCURRENCY, run_batch
+from .cassette import RecordPoolManager, ReplayPoolManager
+from .config import CTXKIT_SMD, fetch_text, process_config, process_config_items, process_config_prompt
+from .server import serve
+from .shard import output_shards
 
 
-def main(argv=None):
+# The mode options' conflicting options - mode option to (conflicting option arguments, error message)
+_OPTION_CONFLICTS = {
+    'race': (
+        ('batch', 'chain', 'record', 'replay'),
+        '--race and --all cannot be used with --batch, --chain, --record, or --replay'
+    ),
+    'hedge': (
+        ('race', 'all', 'batch', 'chain', 'record', 'replay'),
+        '--hedge cannot be used with --race, --all, --batch, --chain, --record, or --replay'
+    ),
+    'response_cache': (
+        ('race', 'hedge', 'chain', 'record', 'replay'),
+        '--response-cache cannot be used with --race, --hedge, --chain, --record, or --replay'
+    ),
+    'shard': (
+        ('all', 'batch', 'chain', 'record', 'replay'),
+        '--shard cannot be used with --all, --batch, --chain, --record, or --replay'
+    ),
+    'batch': (
+        ('items', 'list', 'output', 'chain', 'preload', 'record', 'replay'),
+        '--batch cannot be used with prompt items, --list, --output, --chain, --preload, --record, or --replay'
+    )
+}
+
+
+def main(argv=None, flags=None, server_cache=None):
     """
     ctxkit command-line script main entry point
     """
 
-    # Combine the command-line and environment arguments
-    argv_env = os.getenv('CTXKIT_FLAGS', '').split()
+    # Combine the command-line and environment arguments - a server request has the client's flags
+    argv_env = (os.getenv('CTXKIT_FLAGS', '') if flags is None else flags).split()
     argv_combined = argv_env + (sys.argv[1:] if argv is None else argv)
 
     # Compute the API provider documentation
@@ -63,14 +98,56 @@ def main(argv=None):
     dir_group.add_argument('-x', '--ext', action='append', default=[], help='add a directory text file extension')
     dir_group.add_argument('-l', '--depth', metavar='INT', type=int, default=0, help='the maximum directory depth, default is 0 (infinite)')
     api_group = parser.add_argument_group('API Calling')
-    api_group.add_argument('--api', nargs=2, metavar=('API', 'MODEL'), action=APIAction,
+    api_group.add_argument('--api', nargs=2, metavar=('API', 'MODEL'), dest='apis', action=APIAction,
                            help='pass to an API provider (see "API Providers")')
     api_group.add_argument('--list', metavar='API', action=APIAction,
                            help='list API provider models (see "API Providers")')
     api_group.add_argument('--temp', metavar='NUM', type=float, help='set the model response temperature')
     api_group.add_argument('--topp', metavar='NUM', type=float, help='set the model response top_p')
     api_group.add_argument('--maxtok', metavar='NUM', type=int, help='set the model response max tokens')
-    api_group.add_argument('--noapi', dest='api', action='store_false', help='do not pass to an API provider')
+    api_group.add_argument('--continue', metavar='NUM', dest='continuations', type=int, default=0,
+                           help='continue a response truncated by the max tokens up to NUM times')
+    api_group.add_argument('--noapi', dest='apis', action='store_const', const=None, help='do not pass to an API provider')
+    api_group.add_argument('--race', action='store_true',
+                           help='pass to each "--api" provider and output the first response to start')
+    api_group.add_argument('--all', action='store_true',
+                           help='pass to each "--api" provider and output every response')
+    api_group.add_argument('--hedge', nargs=2, metavar=('API', 'MODEL'), action=APIAction,
+                           help='pass to a backup API provider if the response is slow')
+    api_group.add_argument('--hedge-first', metavar='MS', type=int, default=DEFAULT_HEDGE_FIRST_MS,
+                           help=f'hedge if the first response text takes longer, default is {DEFAULT_HEDGE_FIRST_MS}')
+    api_group.add_argument('--hedge-stall', metavar='MS', type=int, default=DEFAULT_HEDGE_STALL_MS,
+                           help=f'hedge if the response stalls for longer, default is {DEFAULT_HEDGE_STALL_MS}')
+    api_group.add_argument('--retries', metavar='NUM', type=int, default=DEFAULT_RETRIES,
+                           help=f'the maximum API request retries, default is {DEFAULT_RETRIES} (0 for none)')
+    api_group.add_argument('--compress', action='store_true', help='gzip compress the API request bodies')
+    api_group.add_argument('--chain', metavar='PATH',
+                           help='continue the conversation of the response ID file (gpt only)')
+    api_group.add_argument('--context-cache', metavar='SECS', type=int,
+                           help="cache the prompt's files for SECS seconds and reuse the cache (gemini only)")
+    api_group.add_argument('--keep-alive', metavar='DURATION', type=_keep_alive_type,
+                           help='keep the model loaded for the duration, e.g. "30m" or -1 for forever (ollama only)')
+    api_group.add_argument('--preload', action='store_true', help='load the model while the prompt is assembled (ollama only)')
+    api_group.add_argument('--stats', action='store_true', help='output the API call latency statistics to stderr')
+    api_group.add_argument('--stats-json', metavar='PATH', help='append the API call latency statistics to a JSON Lines file')
+    api_group.add_argument('--response-cache', action='store_true',
+                           help='cache the API responses locally and reuse them for identical requests')
+    api_group.add_argument('--response-cache-size', metavar='MB', type=int, default=DEFAULT_RESPONSE_CACHE_SIZE,
+                           help=f'the maximum response cache size, default is {DEFAULT_RESPONSE_CACHE_SIZE}')
+    api_group.add_argument('--record', metavar='PATH', help='record the HTTP responses to a cassette file')
+    api_group.add_argument('--replay', metavar='PATH', help='replay the HTTP responses from a cassette file')
+    shard_group = parser.add_argument_group('Map-Reduce Mode')
+    shard_group.add_argument('--shard', metavar='TOKENS', type=int,
+                             help="split the prompt's files into shards of TOKENS estimated tokens and reduce the responses")
+    shard_group.add_argument('--reduce', metavar='PATH', help='the reduce prompt file path or URL')
+    batch_group = parser.add_argument_group('Batch Mode')
+    batch_group.add_argument('--batch', metavar='PATH', help='run the prompt jobs of a JSON Lines file')
+    batch_group.add_argument('--concurrency', metavar='NUM', type=int, default=DEFAULT_CONCURRENCY,
+                             help=f'the maximum concurrent batch jobs or shards, default is {DEFAULT_CONCURRENCY}')
+    batch_group.add_argument('--batch-api', action='store_true',
+                             help="run the batch jobs with the providers' batch APIs (claude and gpt only)")
+    server_group = parser.add_argument_group('Server Mode')
+    server_group.add_argument('--serve', metavar='SOCKET', help='run the ctxkit server on the Unix socket path')
     parser.epilog = f'''\
 API Providers:
 {api_doc}
@@ -89,10 +166,124 @@ Examples:
         print(CTXKIT_SMD.strip())
         return
 
-    # Initialize urllib3 PoolManager
-    pool_manager = urllib3.PoolManager()
+    # Run the server?
+    if args.serve:
+        if args.items or args.apis or args.list or args.batch:
+            parser.error('--serve cannot be used with prompt items, --api, --list, or --batch')
+        if server_cache is not None:
+            parser.error('--serve cannot be used by a ctxkit server request')
+        try:
+            serve(args.serve, main)
+        except Exception as exc:
+            print(f'\nError: {exc}', file=sys.stderr)
+            sys.exit(2)
+        return
+
+    # Record and replay are exclusive
+    if args.record and args.replay:
+        parser.error('--record and --replay cannot be used together')
+
+    # Get the API providers - without "--race" or "--all", the last "--api" provider is used (e.g. to
+    # override the CTXKIT_FLAGS provider)
+    if args.apis and not args.race and not args.all:
+        args.apis = args.apis[-1:]
+    args.api = args.apis[0] if args.apis else None
+
+    # Check the multiple API provider options
+    if args.race or args.all:
+        if args.race and args.all:
+            parser.error('--race and --all cannot be used together')
+        if not args.api:
+            parser.error('--race and --all require --api')
+        _check_option_conflicts(parser, args, 'race')
+        if args.all and args.extract:
+            parser.error('--all cannot be used with --extract')
+
+    # Check the hedged request options
+    if args.hedge:
+        if not args.api:
+            parser.error('--hedge requires --api')
+        _check_option_conflicts(parser, args, 'hedge')
+        if args.hedge_first < 1 or args.hedge_stall < 1:
+            parser.error('--hedge-first and --hedge-stall must be at least 1')
+
+    # Check the response cache options
+    if args.response_cache:
+        _check_option_conflicts(parser, args, 'response_cache')
+        if args.response_cache_size < 1:
+            parser.error('--response-cache-size must be at least 1')
+
+    # Check the map-reduce options
+    if args.shard is not None:
+        if not args.api:
+            parser.error('--shard requires --api')
+        _check_option_conflicts(parser, args, 'shard')
+        if args.shard < 1 or args.concurrency < 1:
+            parser.error('--shard and --concurrency must be at least 1')
+    elif args.reduce:
+        parser.error('--reduce requires --shard')
+
+    # Check the provider-specific options
+    for provider, _ in (*(args.apis or []), *([args.hedge] if args.hedge else [])):
+        provider_option_error = get_provider_option_error(args, provider)
+        if provider_option_error is not None:
+            parser.error(provider_option_error)
+
+    # Check the batch mode options
+    if args.batch:
+        _check_option_conflicts(parser, args, 'batch')
+        if args.concurrency < 1:
+            parser.error('--concurrency must be at least 1')
+    elif args.batch_api:
+        parser.error('--batch-api requires --batch')
+
+    # Initialize urllib3 PoolManager - compressed responses are negotiated and request bodies are
+    # optionally compressed. Concurrent batch jobs and API calls share the pool's connections.
+    pool_manager_args = {}
+    if args.batch or args.shard is not None:
+        pool_manager_args['maxsize'] = args.concurrency
+    elif args.hedge:
+        pool_manager_args['maxsize'] = 2
+    elif args.apis and len(args.apis) > 1:
+        pool_manager_args['maxsize'] = len(args.apis)
+    if server_cache is not None:
+        pool_manager_key = tuple(sorted(pool_manager_args.items()))
+        if pool_manager_key not in server_cache.pool_managers:
+            server_cache.pool_managers[pool_manager_key] = urllib3.PoolManager(**pool_manager_args)
+        pool_manager = CompressPoolManager(server_cache.pool_managers[pool_manager_key], args.compress)
+    else:
+        pool_manager = CompressPoolManager(urllib3.PoolManager(**pool_manager_args), args.compress)
+    text_cache = server_cache.text_cache if server_cache is not None else None
+
+    # Run the batch jobs?
+    if args.batch:
+        try:
+            job_count, failure_count = run_batch(args, pool_manager, sys.stdout)
+        except Exception as exc:
+            print(f'\nError: {exc}', file=sys.stderr)
+            sys.exit(2)
+        if failure_count:
+            print(f'\nError: {failure_count} of {job_count} batch jobs failed', file=sys.stderr)
+            sys.exit(2)
+        return
+
+    # Retry transient request failures
+    if args.retries > 0:
+        pool_manager = RetryPoolManager(pool_manager, RetryPolicy(args.retries))
 
     try:
+        # Record or replay the HTTP responses?
+        if args.replay:
+            pool_manager = ReplayPoolManager.load(args.replay)
+        elif args.record:
+            pool_manager = RecordPoolManager(pool_manager)
+
+        # Connect to the API provider, and load the model if requested, while the prompt is assembled
+        prepare_thread = None
+        if args.api and not args.replay:
+            prepare_thread = threading.Thread(target=_prepare_api, args=(pool_manager, args), daemon=True)
+            prepare_thread.start()
+
         # List models?
         if args.list:
             models = API_PROVIDERS[args.list]['list'](pool_manager)
@@ -119,7 +310,7 @@ Examples:
 
         # Get the system prompt
         if args.system is not None:
-            system_prompt = fetch_text(pool_manager, args.system) if args.system else None
+            system_prompt = fetch_text(pool_manager, args.system, text_cache) if args.system else None
         elif args.diff:
             system_prompt = DEFAULT_SYSTEM_DIFF
         else:
@@ -127,9 +318,14 @@ Examples:
 
         # Output file?
         if args.output:
-            # Backup the output file, if requested
-            if args.backup and os.path.isfile(args.output):
-                shutil.copy(args.output, f'{args.output}.bak')
+            # Backup the output files, if requested
+            if args.all:
+                output_paths = [get_all_output_path(args.output, provider, model) for provider, model in args.apis]
+            else:
+                output_paths = [args.output]
+            for output_path in output_paths:
+                if args.backup and os.path.isfile(output_path):
+                    shutil.copy(output_path, f'{output_path}.bak')
 
             # Create the output directory
             output_dir = os.path.dirname(args.output)
@@ -139,11 +335,9 @@ Examples:
         # Pass stdin to an AI?
         if args.api and not config['items']:
             prompt = sys.stdin.read()
-            if args.output:
-                with open(args.output, 'w', encoding='utf-8') as output:
-                    output_api_call(args, pool_manager, output, system_prompt, prompt)
-            else:
-                output_api_call(args, pool_manager, sys.stdout, system_prompt, prompt)
+            if prepare_thread is not None:
+                prepare_thread.join()
+            _output_api(args, pool_manager, system_prompt, prompt)
             return
 
         # No items specified
@@ -153,16 +347,14 @@ Examples:
         # Process the configuration
         if args.api:
             # Pass prompt to an AI
-            prompt = process_config(pool_manager, args, config, {})
-            if args.output:
-                with open(args.output, 'w', encoding='utf-8') as output:
-                    output_api_call(args, pool_manager, output, system_prompt, prompt)
-            else:
-                output_api_call(args, pool_manager, sys.stdout, system_prompt, prompt)
+            prompt = list(process_config_prompt(pool_manager, args, config, {}, text_cache=text_cache))
+            if prepare_thread is not None:
+                prepare_thread.join()
+            _output_api(args, pool_manager, system_prompt, prompt)
         else:
             # Output to file?
             if args.output:
-                prompt = process_config(pool_manager, args, config, {})
+                prompt = process_config(pool_manager, args, config, {}, text_cache=text_cache)
                 with open(args.output, 'w', encoding='utf-8') as output:
                     print(prompt, file=output)
             else:
@@ -170,7 +362,7 @@ Examples:
                 items = []
                 if system_prompt:
                     items.append(f'<system>\n{system_prompt}\n</system>')
-                items.extend(process_config_items(pool_manager, args, config, {}))
+                items.extend(process_config_items(pool_manager, args, config, {}, text_cache=text_cache))
                 for ix_item, item_text in enumerate(items):
                     if ix_item != 0:
                         print()
@@ -180,6 +372,53 @@ Examples:
         print(f'\nError: {exc}', file=sys.stderr)
         sys.exit(2)
 
+    finally:
+        # Save the recorded cassette, even on error
+        if isinstance(pool_manager, RecordPoolManager):
+            pool_manager.save(args.record)
+
+
+# Helper to report an error if a mode option is used with any of its conflicting options
+def _check_option_conflicts(parser, args, option):
+    conflicts, message = _OPTION_CONFLICTS[option]
+    if any(getattr(args, conflict) for conflict in conflicts):
+        parser.error(message)
+
+
+# Helper to output the API call response to the output file or stdout
+def _output_api(args, pool_manager, system_prompt, prompt):
+    output_api = output_shards if args.shard is not None else output_api_call
+    if args.all:
+        output_api_all(args, pool_manager, sys.stdout, system_prompt, prompt)
+    elif args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output_api(args, pool_manager, output, system_prompt, prompt)
+    else:
+        output_api(args, pool_manager, sys.stdout, system_prompt, prompt)
+
+
+# Helper to prepare for the API calls - open the provider connections and load the models. Preloading
+# is skipped when recording, since the preload requests are not ordered with the prompt requests.
+# Errors are reported but not fatal.
+def _prepare_api(pool_manager, args):
+    for provider, model in (*args.apis, *([args.hedge] if args.hedge else [])):
+        provider_url = API_PROVIDERS[provider].get('url')
+        if provider_url is not None:
+            warm_connection(pool_manager, provider_url)
+        if args.preload and not args.record:
+            try:
+                API_PROVIDERS[provider]['preload'](pool_manager, model, args.keep_alive)
+            except Exception as exc:
+                print(f'Preload failed: {exc}', file=sys.stderr)
+
+
+# argparse type for the model keep-alive duration - a number of seconds or a duration string
+def _keep_alive_type(value):
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
 
 # argparse action to validate API provider
 class APIAction(argparse.Action):
@@ -188,6 +427,10 @@ class APIAction(argparse.Action):
         provider = values[0] if isinstance(values, list) else values
         if provider not in API_PROVIDERS:
             parser.error(f'Invalid API provider "{provider}". Valid options are: {", ".join(sorted(API_PROVIDERS.keys()))}')
+
+        # The "--api" provider-model pairs accumulate
+        if self.dest == 'apis':
+            values = [*(getattr(namespace, self.dest) or []), values]
         setattr(namespace, self.dest, values)
 
 
@@ -0,0 +1,254 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit server - run ctxkit requests from thin clients in a long-running process
+"""
+
+import collections
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+
+from .config import is_url
+
+
+# The ctxkit server's state that's kept warm across requests
+class ServerCache:
+    """
+    The pool managers are keyed by their PoolManager arguments, so connections to the API providers
+    are reused across requests. The text cache caches the file text (including configuration files)
+    of all requests.
+    """
+
+    __slots__ = ('pool_managers', 'text_cache')
+
+
+    def __init__(self):
+        self.pool_managers = {}
+        self.text_cache = FileTextCache()
+
+
+# The file text cache's maximum size, in characters
+FILE_TEXT_CACHE_SIZE = 100 * 1024 * 1024
+
+
+# File text cache that's valid across requests - a file's cached text is discarded when its modification
+# time or size changes, or when it can't be stat'ed. The least-recently used text is discarded when the
+# cache exceeds its maximum size, in characters. URL text is not cached.
+class FileTextCache:
+
+    __slots__ = ('_files', '_stats', '_size', '_max_size')
+
+
+    def __init__(self, max_size=FILE_TEXT_CACHE_SIZE):
+        self._files = collections.OrderedDict()
+        self._stats = {}
+        self._size = 0
+        self._max_size = max_size
+
+
+    def get(self, path):
+        if is_url(path):
+            return None
+        abs_path = os.path.abspath(path)
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            self._stats.pop(abs_path, None)
+            self._remove(abs_path)
+            return None
+
+        # Cache hit?
+        file_stat = (stat.st_mtime_ns, stat.st_size)
+        file_entry = self._files.get(abs_path)
+        if file_entry is not None and file_entry[0] == file_stat:
+            self._files.move_to_end(abs_path)
+            self._stats.pop(abs_path, None)
+            return file_entry[1]
+
+        # The file's stat is kept for the text's assignment - the text is read after the stat, so a
+        # concurrent modification invalidates it
+        self._remove(abs_path)
+        self._stats[abs_path] = file_stat
+        return None
+
+
+    def __setitem__(self, path, text):
+        if not is_url(path):
+            abs_path = os.path.abspath(path)
+            file_stat = self._stats.pop(abs_path, None)
+            if file_stat is not None and len(text) <= self._max_size:
+                self._remove(abs_path)
+                self._files[abs_path] = (file_stat, text)
+                self._size += len(text)
+                while self._size > self._max_size:
+                    _, (_, lru_text) = self._files.popitem(last=False)
+                    self._size -= len(lru_text)
+
+
+    # Helper to remove a file's cached text
+    def _remove(self, abs_path):
+        file_entry = self._files.pop(abs_path, None)
+        if file_entry is not None:
+            self._size -= len(file_entry[1])
+
+
+# Create the ctxkit server listening on a Unix socket path. Requests are run by main_fn one at a time,
+# since each request changes the working directory and the standard streams.
+def create_server(socket_path, main_fn):
+    if not hasattr(socket, 'AF_UNIX'): # pragma: no cover
+        raise OSError('ctxkit server is not supported on this platform')
+
+    # Remove a stale socket file - error if a server is listening
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as test_socket:
+            try:
+                test_socket.connect(socket_path)
+            except OSError:
+                os.remove(socket_path)
+            else:
+                raise OSError(f'ctxkit server is already running, "{socket_path}"')
+
+    server_cache = ServerCache()
+    request_lock = threading.Lock()
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            client = _ClientConnection(self.rfile, self.wfile)
+            with request_lock:
+                exit_code = _run_request(main_fn, server_cache, client, request)
+            client.send({'exit': exit_code})
+
+    # Only the server's user may connect - requests run as the server's user. The socket is created
+    # with a restrictive umask, so it's never accessible to other users.
+    umask = os.umask(0o077)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    finally:
+        os.umask(umask)
+    try:
+        os.chmod(socket_path, 0o600)
+    except OSError:
+        server.server_close()
+        raise
+    return server
+
+
+# Run the ctxkit server until interrupted
+def serve(socket_path, main_fn):
+    server = create_server(socket_path, main_fn)
+    print(f'ctxkit server listening on "{socket_path}"', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+# Helper to run a client's request and return the exit code
+def _run_request(main_fn, server_cache, client, request):
+    cwd = os.getcwd()
+    stdin = sys.stdin
+    stdout = _ClientStream(client, 'stdout', request.get('stdout_isatty', False))
+    stderr = _ClientStream(client, 'stderr', request.get('stderr_isatty', False))
+    try:
+        os.chdir(request['cwd'])
+        sys.stdin = _ClientStdin(client)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                main_fn(request['argv'], request.get('flags', ''), server_cache)
+                exit_code = 0
+            except SystemExit as exc:
+                if exc.code is None or isinstance(exc.code, int):
+                    exit_code = exc.code or 0
+                else:
+                    print(exc.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        sys.stdin = stdin
+        os.chdir(cwd)
+    return exit_code
+
+
+# A client connection - messages are JSON Lines objects
+class _ClientConnection:
+
+    __slots__ = ('_rfile', '_wfile', '_lock')
+
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._wfile = wfile
+        self._lock = threading.Lock()
+
+
+    # Send a message to the client
+    def send(self, message):
+        with self._lock:
+            self._wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+            self._wfile.flush()
+
+
+    # Receive a message from the client
+    def receive(self):
+        return json.loads(self._rfile.readline())
+
+
+# Text stream that writes to a client's standard stream
+class _ClientStream(io.TextIOBase):
+
+    def __init__(self, client, stream_name, is_tty):
+        super().__init__()
+        self._client = client
+        self._stream_name = stream_name
+        self._is_tty = is_tty
+
+
+    def isatty(self):
+        return self._is_tty
+
+
+    def writable(self):
+        return True
+
+
+    def write(self, text):
+        if text:
+            self._client.send({self._stream_name: text})
+        return len(text)
+
+
+# Text stream that reads the client's stdin - stdin is requested from the client when it's first read
+class _ClientStdin(io.TextIOBase):
+
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+        self._text = None
+
+
+    def readable(self):
+        return True
+
+
+    def read(self, size=-1):
+        if self._text is None:
+            self._client.send({'stdin': True})
+            self._text = self._client.receive()['stdin']
+        if size is None or size < 0:
+            size = len(self._text)
+        text, self._text = self._text[:size], self._text[size:]
+        return text
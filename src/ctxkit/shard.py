@@ -0,0 +1,92 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit map-reduce mode - pass the prompt to an API for each shard of its files concurrently, then
+reduce the shard responses to one response
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import io
+import sys
+
+import urllib3
+
+from .api import output_api_call
+from .api._prompt import SHARD_ITEM_TYPES, get_text_tokens, split_prompt_shards
+from .config import fetch_text
+from .extract import get_file_spans
+
+
+# The default reduce prompt
+DEFAULT_REDUCE = '''\
+The request above was made separately for each part of the files, because the files do not fit in
+one prompt. Each part's response is above, in a "<response>" tag. Combine the responses into one
+response to the request, as if all of the files had been in one prompt. Merge duplicate content and do
+not mention the parts.
+'''
+
+
+# Output the response of a prompt whose files are split into shards of at most "--shard" estimated
+# tokens. Each shard's prompt is passed to the API concurrently, and its files are extracted, if
+# requested. Then the reduce prompt is passed the shard responses and its response is output. A prompt
+# that fits in one shard is passed to the API as is. A reduce prompt that doesn't fit in a shard is an
+# error.
+def output_shards(args, pool_manager, output, system_prompt, prompt):
+    shards = split_prompt_shards(prompt, args.shard - get_text_tokens(system_prompt or ''))
+    if len(shards) == 1:
+        output_api_call(args, pool_manager, output, system_prompt, prompt)
+        return
+
+    # Pass each shard's prompt to the API
+    def call_shard(shard_prompt):
+        try:
+            shard_output = io.StringIO()
+            output_api_call(args, pool_manager, shard_output, system_prompt, shard_prompt)
+            return (shard_output.getvalue(), None)
+        except Exception as exc:
+            return (None, exc)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        shard_results = list(executor.map(call_shard, shards))
+
+    # Report the errors - the reduce prompt requires every shard's response
+    error_count = 0
+    for ix_shard, (_, error) in enumerate(shard_results):
+        if error is not None:
+            error_count += 1
+            print(f'Error: shard {ix_shard + 1}: {error}', file=sys.stderr)
+    if error_count:
+        raise urllib3.exceptions.HTTPError(f'{error_count} of {len(shards)} shards failed')
+
+    # Pass the request items, the shard responses, and the reduce prompt to the API - files were
+    # extracted from the shard responses, so their content is omitted
+    reduce_text = fetch_text(pool_manager, args.reduce) if args.reduce else DEFAULT_REDUCE
+    reduce_prompt = [item for item in prompt if item[0] not in SHARD_ITEM_TYPES]
+    for response, _ in shard_results:
+        if args.extract:
+            response = _omit_files(response)
+        reduce_prompt.append(('response', f'<response>\n{response.strip()}\n</response>'))
+    reduce_prompt.append(('message', reduce_text))
+    reduce_tokens = get_text_tokens(system_prompt or '') + sum(get_text_tokens(item_text) for _, item_text in reduce_prompt)
+    if reduce_tokens > args.shard:
+        raise urllib3.exceptions.HTTPError(
+            f'Reduce prompt of about {reduce_tokens:,} tokens exceeds the shard size of {args.shard:,} tokens'
+        )
+    reduce_args = argparse.Namespace(**vars(args))
+    reduce_args.extract = False
+    output_api_call(reduce_args, pool_manager, output, system_prompt, reduce_prompt)
+
+
+# Helper to replace a response's files with a line naming the file
+def _omit_files(response):
+    lines = response.split('\n')
+    omitted_lines = []
+    ix_line = 0
+    for file_path, open_index, close_index in get_file_spans(response):
+        omitted_lines.extend(lines[ix_line:open_index])
+        omitted_lines.append(f'[Extracted file: {file_path}]')
+        ix_line = close_index + 1
+    omitted_lines.extend(lines[ix_line:])
+    return '\n'.join(omitted_lines)
@@ -0,0 +1,165 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit API call latency statistics
+"""
+
+import json
+import math
+import time
+
+
+# API call latency statistics
+class StreamStats:
+
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+        self.start_time = None
+        self.headers_time = None
+        self.first_time = None
+        self.last_time = None
+        self.end_time = None
+        self.gaps = []
+        self.chunk_count = 0
+        self.char_count = 0
+        self.usage = {}
+        self.error = None
+
+
+    # Mark the start of the API call
+    def start(self):
+        self.start_time = time.perf_counter()
+
+
+    # Mark the receipt of response headers - the last headers before the first chunk are the
+    # streamed response's
+    def headers(self):
+        if self.first_time is None:
+            self.headers_time = time.perf_counter()
+
+
+    # Mark the receipt of a response text chunk
+    def chunk(self, text):
+        now = time.perf_counter()
+        if self.first_time is None:
+            self.first_time = now
+        else:
+            self.gaps.append(now - self.last_time)
+        self.last_time = now
+        self.chunk_count += 1
+        self.char_count += len(text)
+
+
+    # Add an API response's token usage
+    def add_usage(self, usage):
+        for usage_key, usage_value in usage.items():
+            self.usage[usage_key] = self.usage.get(usage_key, 0) + usage_value
+
+
+    # Mark the end of the API call
+    def finish(self, error=None):
+        self.end_time = time.perf_counter()
+        if error is not None:
+            self.error = str(error)
+
+
+    # Get the statistics as a JSON-serializable dict - times are in milliseconds
+    def as_dict(self):
+        total = self.end_time - self.start_time
+        result = {
+            'provider': self.provider,
+            'model': self.model,
+            'headers_ms': _ms(self.headers_time - self.start_time) if self.headers_time is not None else None,
+            'first_token_ms': _ms(self.first_time - self.start_time) if self.first_time is not None else None,
+            'total_ms': _ms(total),
+            'chunks': self.chunk_count,
+            'chars': self.char_count,
+            'chars_per_sec': round(self.char_count / total, 1) if total > 0 else None,
+            'gap_p50_ms': _ms(_percentile(self.gaps, 50)),
+            'gap_p95_ms': _ms(_percentile(self.gaps, 95)),
+            'gap_max_ms': _ms(max(self.gaps)) if self.gaps else None
+        }
+        if self.usage:
+            result['usage'] = dict(self.usage)
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+
+    # Format the statistics report text
+    def format(self):
+        stats = self.as_dict()
+        lines = [
+            f'Stats: {stats["provider"]} {stats["model"]}',
+            f'  headers:     {_format_ms(stats["headers_ms"])}',
+            f'  first token: {_format_ms(stats["first_token_ms"])}',
+            f'  total:       {_format_ms(stats["total_ms"])}',
+            f'  chunks:      {stats["chunks"]:,} (gap p50 {_format_ms(stats["gap_p50_ms"])}, ' +
+            f'p95 {_format_ms(stats["gap_p95_ms"])}, max {_format_ms(stats["gap_max_ms"])})',
+            f'  output:      {stats["chars"]:,} chars ({_format_rate(stats["chars_per_sec"])})'
+        ]
+        if self.usage:
+            usage_parts = (f'{self.usage[usage_key]:,} {usage_label}' for usage_key, usage_label in _USAGE_LABELS if usage_key in self.usage)
+            lines.append(f'  tokens:      {", ".join(usage_parts)}')
+        if self.error is not None:
+            lines.append(f'  error:       {self.error}')
+        return '\n'.join(lines)
+
+
+    # Output the statistics report to stderr and/or append the JSON record to a JSON Lines file
+    def output(self, stderr=None, json_path=None):
+        if stderr is not None:
+            print(self.format(), file=stderr)
+        if json_path is not None:
+            with open(json_path, 'a', encoding='utf-8') as json_file:
+                json_file.write(json.dumps(self.as_dict()))
+                json_file.write('\n')
+
+
+# The token usage keys and their report labels
+_USAGE_LABELS = (
+    ('input_tokens', 'input'),
+    ('cache_read_tokens', 'cache read'),
+    ('cache_write_tokens', 'cache write'),
+    ('output_tokens', 'output')
+)
+
+
+# urllib3 PoolManager proxy that marks the receipt of response headers
+class StatsPoolManager:
+
+    def __init__(self, pool_manager, stats):
+        self.pool_manager = pool_manager
+        self.stats = stats
+
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
+
+
+    def request(self, *args, **kwargs):
+        response = self.pool_manager.request(*args, **kwargs)
+        self.stats.headers()
+        return response
+
+
+# Helper to compute the nearest-rank percentile of a list of values
+def _percentile(values, percent):
+    if not values:
+        return None
+    sorted_values = sorted(values)
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _format_ms(milliseconds):
+    return f'{milliseconds:,.1f} ms' if milliseconds is not None else 'n/a'
+
+
+def _format_rate(chars_per_sec):
+    return f'{chars_per_sec:,.1f} chars/sec' if chars_per_sec is not None else 'n/a'
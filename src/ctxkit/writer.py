@@ -0,0 +1,121 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+"""
+ctxkit coalescing output writer
+"""
+
+import queue
+import threading
+import time
+
+
+# The default flush interval, in seconds, and flush size, in characters
+FLUSH_INTERVAL = 0.02
+FLUSH_SIZE = 8192
+
+
+# Streamed response text output writer
+class OutputWriter:
+    """
+    Interactive terminal output is written and flushed per write, so each token echoes immediately.
+
+    Other output (files and pipes) is written by a separate thread, decoupled from the network read
+    loop by a bounded queue. The writer thread coalesces the queued text and writes and flushes it
+    when FLUSH_SIZE characters are buffered or FLUSH_INTERVAL seconds have passed since the text
+    was queued. If the output falls behind, the queue fills and write blocks.
+    """
+
+    __slots__ = ('output', 'flush_interval', 'flush_size', '_queue', '_thread', '_error')
+
+    # The end-of-output queue sentinel
+    _CLOSE = object()
+
+
+    def __init__(self, output, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE, queue_size=1024):
+        self.output = output
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._error = None
+        if _isatty(output):
+            self._queue = None
+            self._thread = None
+        else:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name='ctxkit-writer', daemon=True)
+            self._thread.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(raise_error=exc_type is None)
+
+
+    def write(self, text):
+        if self._thread is None:
+            self.output.write(text)
+            self.output.flush()
+        else:
+            if self._error is not None:
+                raise self._error
+            self._queue.put(text)
+
+
+    def close(self, raise_error=True):
+        if self._thread is not None:
+            self._queue.put(self._CLOSE)
+            self._thread.join()
+            self._thread = None
+            if self._error is not None and raise_error:
+                raise self._error
+
+
+    # The writer thread
+    def _run(self):
+        buffer = []
+        buffer_size = 0
+        flush_time = None
+        while True:
+            # Wait for text until the flush deadline, if any
+            try:
+                if flush_time is None:
+                    text = self._queue.get()
+                else:
+                    text = self._queue.get(timeout=max(flush_time - time.monotonic(), 0))
+            except queue.Empty:
+                text = None
+
+            # Buffer the text
+            is_close = text is self._CLOSE
+            if text is not None and not is_close:
+                if not buffer:
+                    flush_time = time.monotonic() + self.flush_interval
+                buffer.append(text)
+                buffer_size += len(text)
+
+            # Flush?
+            if buffer and (is_close or text is None or buffer_size >= self.flush_size or time.monotonic() >= flush_time):
+                if self._error is None:
+                    try:
+                        self.output.write(''.join(buffer))
+                        self.output.flush()
+                    except Exception as exc: # pylint: disable=broad-exception-caught
+                        self._error = exc
+                buffer = []
+                buffer_size = 0
+                flush_time = None
+
+            # Done?
+            if is_close:
+                break
+
+
+# Helper to determine if an output stream is an interactive terminal
+def _isatty(output):
+    try:
+        return output.isatty()
+    except (AttributeError, ValueError):
+        return False
@@ -0,0 +1,395 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import asyncio
+import json
+import ssl
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api import (
+    API_PROVIDERS, AsyncPoolManager, TruncatedResponseError, claude_chat_async, gemini_chat_async, gpt_chat_async,
+    grok_chat_async, ollama_chat_async
+)
+from ctxkit.api._continue import CONTINUE_PROMPT
+
+
+# Helper to create a chunked HTTP response
+def _chunked_response(body_chunks, status=200, headers=None):
+    response = f'HTTP/1.1 {status} OK\r\nTransfer-Encoding: chunked\r\n'.encode('utf-8')
+    for name, value in (headers or {}).items():
+        response += f'{name}: {value}\r\n'.encode('utf-8')
+    response += b'\r\n'
+    for chunk in body_chunks:
+        response += f'{len(chunk):x}\r\n'.encode('utf-8') + chunk + b'\r\n'
+    return response + b'0\r\n\r\n'
+
+
+# Helper to create a Content-Length HTTP response
+def _length_response(body, status=200):
+    return f'HTTP/1.1 {status} OK\r\nContent-Length: {len(body)}\r\n\r\n'.encode('utf-8') + body
+
+
+# Helper to create a mock asyncio.open_connection function - each connection reads the next bytes of
+# connection_responses and its written request bytes are appended to requests
+def _mock_open_connection(connection_responses, requests):
+    connection_responses = list(connection_responses)
+
+    async def mock_open_connection(host, port, ssl=None): # pylint: disable=redefined-outer-name, unused-argument
+        reader = asyncio.StreamReader()
+        reader.feed_data(connection_responses.pop(0))
+        reader.feed_eof()
+        request_bytes = bytearray()
+        requests.append(request_bytes)
+        writer = unittest.mock.Mock()
+        writer.write.side_effect = request_bytes.extend
+        writer.drain = unittest.mock.AsyncMock()
+        return reader, writer
+
+    return unittest.mock.Mock(side_effect=mock_open_connection)
+
+
+# Helper to split request bytes into the request line, the headers, and the body
+def _parse_request(request_bytes):
+    request_head, _, body = bytes(request_bytes).partition(b'\r\n\r\n')
+    request_line, *header_lines = request_head.decode('utf-8').split('\r\n')
+    return request_line, dict(header_line.split(': ', 1) for header_line in header_lines), body
+
+
+# Helper to run an async chat function and return its response chunks
+def _run_chat(chat_fn, *args, **kwargs):
+    async def run_chat():
+        async with AsyncPoolManager() as pool_manager:
+            return [chunk async for chunk in chat_fn(pool_manager, *args, **kwargs)]
+    return asyncio.run(run_chat())
+
+
+class TestAPIAsync(unittest.TestCase):
+
+    def test_claude_chat_async(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([_chunked_response([
+            b'event: message_start\ndata: {"type": "message_start", "message": {"usage": {"input_tokens": 10}}}\n\n',
+            b'data: {"type": "content_block_delta", "delta": {"text": "Good"}}\n\ndata: {"type": "content_block_',
+            b'delta", "delta": {"text": "bye"}}\n\n',
+            b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 2}}\n\n',
+            b'data: {"type": "message_stop"}\n\n'
+        ])], requests)
+        usage = {}
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}):
+            chunks = _run_chat(claude_chat_async, 'model-name', 'System', 'Hello', usage=usage)
+
+        self.assertListEqual(chunks, ['Good', 'bye'])
+        self.assertDictEqual(usage, {'input_tokens': 10, 'output_tokens': 2})
+        self.assertEqual(mock_open_connection.call_count, 1)
+        self.assertEqual(mock_open_connection.call_args.args, ('api.anthropic.com', 443))
+        self.assertIsInstance(mock_open_connection.call_args.kwargs['ssl'], ssl.SSLContext)
+        request_line, headers, body = _parse_request(requests[0])
+        self.assertEqual(request_line, 'POST /v1/messages HTTP/1.1')
+        self.assertDictEqual(headers, {
+            'Host': 'api.anthropic.com',
+            'x-api-key': 'XXXX',
+            'anthropic-version': '2023-06-01',
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body))
+        })
+        self.assertDictEqual(json.loads(body), {
+            'model': 'model-name',
+            'messages': [{'role': 'user', 'content': 'Hello'}],
+            'max_tokens': 8000,
+            'system': 'System',
+            'stream': True
+        })
+
+
+    def test_claude_chat_async_truncated(self):
+        mock_open_connection = _mock_open_connection([_chunked_response([
+            b'data: {"type": "content_block_delta", "delta": {"text": "Good"}}\n\n',
+            b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}\n\n',
+            b'data: {"type": "message_stop"}\n\n'
+        ])], [])
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}):
+            with self.assertRaises(TruncatedResponseError) as cm_exc:
+                _run_chat(claude_chat_async, 'model-name', None, 'Hello')
+
+        self.assertEqual(str(cm_exc.exception), 'Claude API response truncated (stop_reason: max_tokens)')
+
+
+    def test_gpt_chat_async(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([_chunked_response([
+            b'data: {"type": "response.created", "response": {"id": "resp_123"}}\n\n',
+            b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+            b'data: {"type": "response.completed", "response": {"usage": {"input_tokens": 10, "output_tokens": 1}}}\n\n'
+        ])], requests)
+        usage = {}
+        conversation = {}
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}):
+            chunks = _run_chat(gpt_chat_async, 'model-name', None, 'Hello', usage=usage, conversation=conversation)
+
+        self.assertListEqual(chunks, ['Goodbye'])
+        self.assertDictEqual(usage, {'input_tokens': 10, 'output_tokens': 1})
+        self.assertDictEqual(conversation, {'response_id': 'resp_123'})
+        request_line, headers, body = _parse_request(requests[0])
+        self.assertEqual(request_line, 'POST /v1/responses HTTP/1.1')
+        self.assertEqual(headers['Authorization'], 'Bearer XXXX')
+        self.assertDictEqual(json.loads(body), {'model': 'model-name', 'input': 'Hello', 'stream': True})
+
+
+    def test_gemini_chat_async(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([_chunked_response([
+            b'data: {"candidates": [{"content": {"parts": [{"text": "Good"}, {"text": "bye"}]}}]}\n\n',
+            b'data: {"candidates": [{"finishReason": "STOP"}], "usageMetadata": {"promptTokenCount": 10}}\n\n'
+        ])], requests)
+        usage = {}
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX'}):
+            chunks = _run_chat(gemini_chat_async, 'model-name', None, 'Hello', temperature=0.5, usage=usage)
+
+        self.assertListEqual(chunks, ['Good', 'bye'])
+        self.assertDictEqual(usage, {'input_tokens': 10})
+        request_line, _, body = _parse_request(requests[0])
+        self.assertEqual(request_line, 'POST /v1beta/models/model-name:streamGenerateContent?key=XXXX&alt=sse HTTP/1.1')
+        self.assertDictEqual(json.loads(body), {
+            'contents': [{'role': 'user', 'parts': [{'text': 'Hello'}]}],
+            'generationConfig': {'temperature': 0.5}
+        })
+
+
+    def test_grok_chat_async(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([_chunked_response([
+            b'data: {"choices": [{"delta": {"content": " response"}}]}\n\n',
+            b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n',
+            b'data: [DONE]\n\n'
+        ])], requests)
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}):
+            chunks = _run_chat(grok_chat_async, 'model-name', None, 'Hello', continuation='Partial')
+
+        self.assertListEqual(chunks, [' response'])
+        request_line, _, body = _parse_request(requests[0])
+        self.assertEqual(request_line, 'POST /v1/chat/completions HTTP/1.1')
+        self.assertDictEqual(json.loads(body), {
+            'model': 'model-name',
+            'messages': [
+                {'role': 'user', 'content': 'Hello'},
+                {'role': 'assistant', 'content': 'Partial'},
+                {'role': 'user', 'content': CONTINUE_PROMPT}
+            ],
+            'stream': True
+        })
+
+
+    def test_grok_chat_async_error(self):
+        mock_open_connection = _mock_open_connection([
+            _length_response(b'{"error": {"message": "Invalid API key", "type": "auth"}}', status=401)
+        ], [])
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}):
+            with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+                _run_chat(grok_chat_async, 'model-name', None, 'Hello')
+
+        self.assertEqual(str(cm_exc.exception), 'xAI API failed with status 401: Invalid API key (type: auth)')
+
+
+    def test_ollama_chat_async(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([
+            _length_response(b'{"capabilities": ["completion"]}') +
+            _chunked_response([
+                b'{"message": {"content": "Good"}}\n{"message": {"con',
+                b'tent": "bye"}}\n{"message": {"content": ""}, "done": true, "prompt_eval_count": 10, "eval_count": 2}'
+            ])
+        ], requests)
+        usage = {}
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection), \
+             unittest.mock.patch('os.environ', {}):
+            chunks = _run_chat(ollama_chat_async, 'model-name', None, 'Hello', usage=usage, keep_alive='5m')
+
+        self.assertListEqual(chunks, ['Good', 'bye'])
+        self.assertDictEqual(usage, {'input_tokens': 10, 'output_tokens': 2})
+
+        # Both requests are sent on the same connection
+        self.assertEqual(mock_open_connection.call_count, 1)
+        self.assertEqual(mock_open_connection.call_args.args, ('127.0.0.1', 11434))
+        self.assertIsNone(mock_open_connection.call_args.kwargs['ssl'])
+        show_request, _, chat_request = bytes(requests[0]).partition(b'}POST ')
+        self.assertTrue(show_request.startswith(b'POST /api/show HTTP/1.1\r\nHost: 127.0.0.1:11434\r\n'))
+        request_line, _, body = _parse_request(b'POST ' + chat_request)
+        self.assertEqual(request_line, 'POST /api/chat HTTP/1.1')
+        self.assertDictEqual(json.loads(body), {
+            'model': 'model-name',
+            'messages': [{'role': 'user', 'content': 'Hello'}],
+            'stream': True,
+            'think': False,
+            'keep_alive': '5m'
+        })
+
+
+    def test_api_providers_chat_async(self):
+        self.assertListEqual(
+            [provider for provider, provider_info in API_PROVIDERS.items() if 'chat_async' in provider_info],
+            list(API_PROVIDERS)
+        )
+
+
+class TestAsyncPoolManager(unittest.TestCase):
+
+    def test_request_reuse(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([
+            _length_response(b'first') + _chunked_response([b'sec', b'ond'], headers={'Connection': 'close'}),
+            _length_response(b'third')
+        ], requests)
+
+        async def run_requests():
+            async with AsyncPoolManager() as pool_manager:
+                responses = []
+                for _ in range(3):
+                    response = await pool_manager.request('GET', 'http://localhost:8080/path?q=1')
+                    responses.append((response.status, await response.read()))
+                return responses
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            responses = asyncio.run(run_requests())
+
+        self.assertListEqual(responses, [(200, b'first'), (200, b'second'), (200, b'third')])
+        self.assertEqual(mock_open_connection.call_count, 2)
+        self.assertEqual(
+            bytes(requests[0]),
+            b'GET /path?q=1 HTTP/1.1\r\nHost: localhost:8080\r\n\r\n' * 2
+        )
+
+
+    def test_request_stale_connection(self):
+        requests = []
+        mock_open_connection = _mock_open_connection([_length_response(b'first'), _length_response(b'second')], requests)
+
+        async def run_requests():
+            async with AsyncPoolManager() as pool_manager:
+                responses = []
+                for _ in range(2):
+                    response = await pool_manager.request('POST', 'http://localhost/', headers={'X-Test': 'A'}, body='body')
+                    responses.append(await response.read())
+                return responses
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            responses = asyncio.run(run_requests())
+
+        # The idle connection was closed by the server, so the second request is sent on a new connection
+        self.assertListEqual(responses, [b'first', b'second'])
+        self.assertEqual(mock_open_connection.call_count, 2)
+        self.assertEqual(bytes(requests[1]), b'POST / HTTP/1.1\r\nHost: localhost\r\nX-Test: A\r\nContent-Length: 4\r\n\r\nbody')
+
+
+    def test_request_read_to_eof(self):
+        mock_open_connection = _mock_open_connection([
+            b'HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 500 Internal Server Error\r\nX-Header: A\r\nx-header: B\r\n\r\nError',
+        ], [])
+
+        async def run_request():
+            async with AsyncPoolManager() as pool_manager:
+                response = await pool_manager.request('GET', 'http://localhost/')
+                return response.status, response.headers, await response.read()
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            status, headers, body = asyncio.run(run_request())
+
+        self.assertEqual(status, 500)
+        self.assertDictEqual(headers, {'x-header': 'A, B'})
+        self.assertEqual(body, b'Error')
+
+
+    def test_request_chunked_trailers(self):
+        mock_open_connection = _mock_open_connection([
+            b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5;ext=1\r\nHello\r\n0\r\nX-Trailer: A\r\n\r\n'
+        ], [])
+
+        async def run_request():
+            async with AsyncPoolManager() as pool_manager:
+                response = await pool_manager.request('GET', 'http://localhost/')
+                return await response.read()
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            self.assertEqual(asyncio.run(run_request()), b'Hello')
+
+
+    def test_request_premature_end(self):
+        for response_bytes in (
+            b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nHello',
+            b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nHello\r\n',
+            b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nHel'
+        ):
+            with self.subTest(response_bytes=response_bytes):
+                mock_open_connection = _mock_open_connection([response_bytes], [])
+
+                async def run_request():
+                    async with AsyncPoolManager() as pool_manager:
+                        response = await pool_manager.request('GET', 'http://localhost/')
+                        return await response.read()
+
+                with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+                    with self.assertRaises(urllib3.exceptions.ProtocolError) as cm_exc:
+                        asyncio.run(run_request())
+
+                self.assertEqual(str(cm_exc.exception), 'Response ended prematurely')
+
+
+    def test_request_invalid_response(self):
+        for response_bytes, message in (
+            (b'Hello\r\n\r\n', "Invalid status line b'Hello\\r\\n'"),
+            (b'HTTP/1.1 200 OK\r\nContent-Length: X\r\n\r\n', "Invalid Content-Length 'X'"),
+            (b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nX\r\n', "Invalid chunk size b'X\\r\\n'"),
+            (b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n1\r\nAB\r\n', 'Invalid chunk terminator')
+        ):
+            with self.subTest(response_bytes=response_bytes):
+                mock_open_connection = _mock_open_connection([response_bytes], [])
+
+                async def run_request():
+                    async with AsyncPoolManager() as pool_manager:
+                        response = await pool_manager.request('GET', 'http://localhost/')
+                        return await response.read()
+
+                with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+                    with self.assertRaises(urllib3.exceptions.ProtocolError) as cm_exc:
+                        asyncio.run(run_request())
+
+                self.assertEqual(str(cm_exc.exception), message)
+
+
+    def test_request_connection_closed(self):
+        mock_open_connection = _mock_open_connection([b''], [])
+
+        async def run_request():
+            async with AsyncPoolManager() as pool_manager:
+                await pool_manager.request('GET', 'http://localhost/')
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            with self.assertRaises(ConnectionResetError):
+                asyncio.run(run_request())
+
+
+    def test_response_close(self):
+        mock_open_connection = _mock_open_connection([_chunked_response([b'Hello', b'World'])], [])
+
+        async def run_request():
+            async with AsyncPoolManager(maxsize=1) as pool_manager:
+                response = await pool_manager.request('GET', 'http://localhost/')
+                async for chunk in response.read_chunked():
+                    self.assertEqual(chunk, b'Hello')
+                    break
+                response.close()
+                return response
+
+        with unittest.mock.patch('asyncio.open_connection', mock_open_connection):
+            response = asyncio.run(run_request())
+
+        # The partially-read response's connection is closed, not reused
+        self.assertEqual(response._writer.close.call_count, 1) # pylint: disable=protected-access
@@ -0,0 +1,392 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._batch import BatchRequestError, poll_batch
+from ctxkit.api.claude import ANTHROPIC_BATCHES_URL, claude_batch
+from ctxkit.api.gpt import OPENAI_BATCHES_URL, OPENAI_FILES_URL, gpt_batch
+from ctxkit.main import main
+
+from .test_main import create_test_files
+
+
+# Helper to create a mock JSON response
+def _mock_json_response(response_json, status=200):
+    mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    mock_response.status = status
+    mock_response.json.return_value = response_json
+    return mock_response
+
+
+# Helper to create a mock JSON Lines response
+def _mock_json_lines_response(rows):
+    mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    mock_response.status = 200
+    mock_response.data = ''.join(f'{json.dumps(row)}\n' for row in rows).encode('utf-8')
+    return mock_response
+
+
+# Helper to create a Claude batch result
+def _claude_result(custom_id, text, stop_reason='end_turn'):
+    return {
+        'custom_id': custom_id,
+        'result': {
+            'type': 'succeeded',
+            'message': {'content': [{'type': 'text', 'text': text}], 'stop_reason': stop_reason}
+        }
+    }
+
+
+# Helper to create an OpenAI batch output file row
+def _gpt_result(custom_id, text, status='completed'):
+    response_body = {
+        'status': status,
+        'output': [{'type': 'message', 'content': [{'type': 'output_text', 'text': text}]}]
+    }
+    if status == 'incomplete':
+        response_body['incomplete_details'] = {'reason': 'max_output_tokens'}
+    return {'custom_id': custom_id, 'response': {'status_code': 200, 'body': response_body}, 'error': None}
+
+
+class TestAPIBatch(unittest.TestCase):
+
+    def test_claude_batch(self):
+        with unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('ctxkit.api._batch.time.sleep') as mock_sleep, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            results_url = f'{ANTHROPIC_BATCHES_URL}/batch-1/results'
+            mock_pool_manager = unittest.mock.Mock()
+            mock_pool_manager.request.side_effect = [
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'in_progress'}),
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'in_progress'}),
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'ended', 'results_url': results_url}),
+                _mock_json_lines_response([
+                    _claude_result('request-2', 'Truncated', 'max_tokens'),
+                    _claude_result('request-0', 'Hello'),
+                    {'custom_id': 'request-1', 'result': {'type': 'errored', 'error': {'error': {'message': 'Overloaded'}}}},
+                    {'custom_id': 'request-3', 'result': {'type': 'expired'}}
+                ])
+            ]
+
+            results = claude_batch(mock_pool_manager, [
+                {'model': 'model-name', 'system_prompt': 'Be brief', 'prompt': 'One',
+                 'temperature': 0.5, 'top_p': None, 'max_tokens': 100},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Two',
+                 'temperature': None, 'top_p': None, 'max_tokens': None},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Three',
+                 'temperature': None, 'top_p': None, 'max_tokens': None},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Four',
+                 'temperature': None, 'top_p': None, 'max_tokens': None},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Five',
+                 'temperature': None, 'top_p': None, 'max_tokens': None}
+            ])
+
+        self.assertListEqual(results, [
+            ('Hello', None),
+            (None, 'Claude API error: Overloaded'),
+            (None, 'Claude API response truncated (stop_reason: max_tokens)'),
+            (None, 'Claude batch request expired'),
+            (None, 'Claude batch request result not found')
+        ])
+        self.assertEqual(stderr.getvalue(), 'Claude batch batch-1 submitted (5 requests)\n')
+        mock_sleep.assert_called_once_with(30)
+
+        # Check the requests
+        headers = {
+            'x-api-key': 'XXXX',
+            'anthropic-version': '2023-06-01',
+            'Content-Type': 'application/json'
+        }
+        request_calls = mock_pool_manager.request.call_args_list
+        self.assertEqual(len(request_calls), 4)
+        self.assertEqual(request_calls[0].kwargs['method'], 'POST')
+        self.assertEqual(request_calls[0].kwargs['url'], ANTHROPIC_BATCHES_URL)
+        self.assertDictEqual(request_calls[0].kwargs['headers'], headers)
+        batch_json = json.loads(request_calls[0].kwargs['body'])
+        self.assertEqual(len(batch_json['requests']), 5)
+        self.assertDictEqual(batch_json['requests'][0], {
+            'custom_id': 'request-0',
+            'params': {
+                'model': 'model-name',
+                'messages': [{'role': 'user', 'content': 'One'}],
+                'max_tokens': 100,
+                'system': 'Be brief',
+                'temperature': 0.5
+            }
+        })
+        self.assertDictEqual(batch_json['requests'][1], {
+            'custom_id': 'request-1',
+            'params': {
+                'model': 'model-name',
+                'messages': [{'role': 'user', 'content': 'Two'}],
+                'max_tokens': 8000
+            }
+        })
+        self.assertEqual(request_calls[1], unittest.mock.call(
+            method='GET', url=f'{ANTHROPIC_BATCHES_URL}/batch-1', headers=headers, retries=0
+        ))
+        self.assertEqual(request_calls[3], unittest.mock.call(method='GET', url=results_url, headers=headers, retries=0))
+
+
+    def test_claude_batch_error(self):
+        with unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager = unittest.mock.Mock()
+            mock_pool_manager.request.return_value = _mock_json_response(None, status=400)
+
+            with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+                claude_batch(mock_pool_manager, [
+                    {'model': 'model-name', 'system_prompt': None, 'prompt': 'One',
+                     'temperature': None, 'top_p': None, 'max_tokens': None}
+                ])
+
+        self.assertEqual(str(cm_exc.exception), 'Claude batch API failed with status 400')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_claude_batch_poll_error(self):
+        with unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('ctxkit.api._batch.time.sleep') as mock_sleep, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            results_url = f'{ANTHROPIC_BATCHES_URL}/batch-1/results'
+            mock_pool_manager = unittest.mock.Mock()
+            mock_pool_manager.request.side_effect = [
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'in_progress'}),
+                _mock_json_response(None, status=529),
+                urllib3.exceptions.MaxRetryError(None, results_url, 'Connection refused'),
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'ended', 'results_url': results_url}),
+                _mock_json_lines_response([_claude_result('request-0', 'Hello')])
+            ]
+
+            # Transient poll errors don't lose the submitted batch
+            results = claude_batch(mock_pool_manager, [
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'One',
+                 'temperature': None, 'top_p': None, 'max_tokens': None}
+            ])
+
+        self.assertListEqual(results, [('Hello', None)])
+        self.assertEqual(
+            stderr.getvalue(),
+            'Claude batch batch-1 submitted (1 requests)\n'
+            'Batch status request failed with status 529 - polling again\n'
+            'Batch status request failed with error: Connection refused - polling again\n'
+        )
+        self.assertListEqual(mock_sleep.call_args_list, [unittest.mock.call(30), unittest.mock.call(30)])
+
+
+    def test_poll_batch_error(self):
+        with unittest.mock.patch('ctxkit.api._batch.time.sleep') as mock_sleep, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            get_batch = unittest.mock.Mock(side_effect=[
+                BatchRequestError('Batch API failed with status 503', 503),
+                BatchRequestError('Batch API failed with status 404', 404)
+            ])
+
+            # A non-transient poll error stops polling
+            with self.assertRaises(BatchRequestError) as cm_exc:
+                poll_batch(get_batch, lambda batch: True)
+
+        self.assertEqual(str(cm_exc.exception), 'Batch API failed with status 404')
+        self.assertEqual(stderr.getvalue(), 'Batch status request failed with status 503 - polling again\n')
+        mock_sleep.assert_called_once_with(30)
+
+
+    def test_gpt_batch(self):
+        with unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('ctxkit.api._batch.time.sleep') as mock_sleep, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager = unittest.mock.Mock()
+            mock_pool_manager.request.side_effect = [
+                _mock_json_response({'id': 'file-in'}),
+                _mock_json_response({'id': 'batch-1', 'status': 'validating'}),
+                _mock_json_response({'id': 'batch-1', 'status': 'in_progress'}),
+                _mock_json_response({'id': 'batch-1', 'status': 'completed', 'output_file_id': 'file-out', 'error_file_id': 'file-err'}),
+                _mock_json_lines_response([
+                    _gpt_result('request-2', 'Truncated', 'incomplete'),
+                    _gpt_result('request-0', 'Hello')
+                ]),
+                _mock_json_lines_response([
+                    {
+                        'custom_id': 'request-1',
+                        'response': {'status_code': 400, 'body': {'error': {'message': 'Bad model'}}},
+                        'error': None
+                    }
+                ])
+            ]
+
+            results = gpt_batch(mock_pool_manager, [
+                {'model': 'model-name', 'system_prompt': 'Be brief', 'prompt': 'One',
+                 'temperature': None, 'top_p': None, 'max_tokens': 100},
+                {'model': 'bad-model', 'system_prompt': None, 'prompt': 'Two',
+                 'temperature': None, 'top_p': None, 'max_tokens': None},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Three',
+                 'temperature': None, 'top_p': None, 'max_tokens': None},
+                {'model': 'model-name', 'system_prompt': None, 'prompt': 'Four',
+                 'temperature': None, 'top_p': None, 'max_tokens': None}
+            ])
+
+        self.assertListEqual(results, [
+            ('Hello', None),
+            (None, 'OpenAI API failed with status 400: Bad model'),
+            (None, 'OpenAI API response truncated (reason: max_output_tokens)'),
+            (None, 'OpenAI batch request not completed (batch status: completed)')
+        ])
+        self.assertEqual(stderr.getvalue(), 'OpenAI batch batch-1 submitted (4 requests)\n')
+        self.assertEqual(mock_sleep.call_count, 1)
+
+        # Check the input file upload
+        request_calls = mock_pool_manager.request.call_args_list
+        self.assertEqual(len(request_calls), 6)
+        upload_kwargs = request_calls[0].kwargs
+        self.assertEqual(upload_kwargs['method'], 'POST')
+        self.assertEqual(upload_kwargs['url'], OPENAI_FILES_URL)
+        self.assertDictEqual(upload_kwargs['headers'], {'Authorization': 'Bearer XXXX'})
+        self.assertEqual(upload_kwargs['fields']['purpose'], 'batch')
+        file_name, file_data, file_type = upload_kwargs['fields']['file']
+        self.assertEqual(file_name, 'batch.jsonl')
+        self.assertEqual(file_type, 'application/jsonl')
+        batch_lines = [json.loads(line) for line in file_data.decode('utf-8').splitlines()]
+        self.assertEqual(len(batch_lines), 4)
+        self.assertDictEqual(batch_lines[0], {
+            'custom_id': 'request-0',
+            'method': 'POST',
+            'url': '/v1/responses',
+            'body': {'model': 'model-name', 'input': 'One', 'instructions': 'Be brief', 'max_output_tokens': 100}
+        })
+
+        # Check the batch creation and result file downloads
+        self.assertEqual(request_calls[1].kwargs['url'], OPENAI_BATCHES_URL)
+        self.assertDictEqual(json.loads(request_calls[1].kwargs['body']), {
+            'input_file_id': 'file-in',
+            'endpoint': '/v1/responses',
+            'completion_window': '24h'
+        })
+        self.assertEqual(request_calls[2].kwargs['url'], f'{OPENAI_BATCHES_URL}/batch-1')
+        self.assertEqual(request_calls[4].kwargs['url'], f'{OPENAI_FILES_URL}/file-out/content')
+        self.assertEqual(request_calls[5].kwargs['url'], f'{OPENAI_FILES_URL}/file-err/content')
+
+
+    def test_gpt_batch_failed(self):
+        with unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stderr', io.StringIO()):
+            mock_pool_manager = unittest.mock.Mock()
+            mock_pool_manager.request.side_effect = [
+                _mock_json_response({'id': 'file-in'}),
+                _mock_json_response({'id': 'batch-1', 'status': 'validating'}),
+                _mock_json_response({'id': 'batch-1', 'status': 'failed', 'errors': {
+                    'object': 'list',
+                    'data': [{'code': 'invalid_request', 'message': 'Invalid input file', 'line': 1}]
+                }})
+            ]
+
+            with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+                gpt_batch(mock_pool_manager, [
+                    {'model': 'model-name', 'system_prompt': None, 'prompt': 'One',
+                     'temperature': None, 'top_p': None, 'max_tokens': None}
+                ])
+
+        self.assertEqual(str(cm_exc.exception), 'OpenAI batch failed: Invalid input file (code: invalid_request)')
+
+
+    def test_batch_api_main(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX', 'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('ctxkit.api._batch.time.sleep'), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            output_path = os.path.join(temp_dir, 'out', 'one.txt')
+            extract_path = os.path.join(temp_dir, 'extract.txt')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write(json.dumps({'id': 'one', 'items': [{'message': 'One'}], 'output': output_path}) + '\n')
+                batch_file.write(json.dumps({'items': [{'message': 'Two'}], 'provider': 'grok'}) + '\n')
+                batch_file.write(json.dumps({'items': [{'message': 'Three'}], 'extract': True}) + '\n')
+                batch_file.write(json.dumps({'items': [{'message': 'Four'}]}) + '\n')
+
+            results_url = f'{ANTHROPIC_BATCHES_URL}/batch-1/results'
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'in_progress'}),
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'ended', 'results_url': results_url}),
+                _mock_json_lines_response([
+                    _claude_result('request-0', 'Hello'),
+                    _claude_result('request-1', f'<{extract_path}>\nbatch\n</{extract_path}>'),
+                    _claude_result('request-2', 'Truncated', 'max_tokens')
+                ])
+            ]
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch', batch_path, '--batch-api', '--api', 'claude', 'model-name', '-s', ''])
+
+            with open(output_path, 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), 'Hello\n')
+            with open(extract_path, 'r', encoding='utf-8') as extract_file:
+                self.assertEqual(extract_file.read(), 'batch\n')
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        batch_json = json.loads(mock_pool_manager_instance.request.call_args_list[0].kwargs['body'])
+        self.assertListEqual(
+            [batch_request['params']['messages'][0]['content'] for batch_request in batch_json['requests']],
+            ['One', 'Three', 'Four']
+        )
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        for report in reports:
+            self.assertIsInstance(report.pop('total_ms'), float)
+        self.assertListEqual(reports, [
+            {'line': 1, 'id': 'one', 'status': 'ok'},
+            {'line': 2, 'status': 'error', 'error': '--batch-api is not supported by the grok API'},
+            {'line': 3, 'status': 'ok'},
+            {'line': 4, 'status': 'error', 'error': 'Claude API response truncated (stop_reason: max_tokens)'}
+        ])
+        self.assertEqual(
+            stderr.getvalue(),
+            'Claude batch batch-1 submitted (3 requests)\n\nError: 2 of 4 batch jobs failed\n'
+        )
+
+
+    def test_batch_api_main_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write(json.dumps({'items': [{'message': 'One'}]}) + '\n')
+                batch_file.write(json.dumps({'items': [{'message': 'Two'}]}) + '\n')
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = _mock_json_response(None, status=401)
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch', batch_path, '--batch-api', '--api', 'gpt', 'model-name', '-s', '', '--retries', '0'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        mock_pool_manager_instance.request.assert_called_once()
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        for report in reports:
+            self.assertIsInstance(report.pop('total_ms'), float)
+        self.assertListEqual(reports, [
+            {'line': 1, 'status': 'error', 'error': 'OpenAI batch API failed with status 401'},
+            {'line': 2, 'status': 'error', 'error': 'OpenAI batch API failed with status 401'}
+        ])
+        self.assertEqual(stderr.getvalue(), '\nError: 2 of 2 batch jobs failed\n')
+
+
+    def test_batch_api_invalid_args(self):
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch-api', '-m', 'Hello'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIn('ctxkit: error: --batch-api requires --batch', stderr.getvalue())
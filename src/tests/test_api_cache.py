@@ -0,0 +1,52 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import unittest
+import unittest.mock
+
+from ctxkit.api._cache import load_cache_index, update_cache_index
+
+from .test_main import create_test_files
+
+
+class TestAPICache(unittest.TestCase):
+
+    def test_update_cache_index(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True):
+            self.assertDictEqual(load_cache_index('test.json'), {})
+            update_cache_index('test.json', lambda cache_index: cache_index.update({'a': 1}))
+            update_cache_index('test.json', lambda cache_index: cache_index.update({'b': 2}))
+            self.assertDictEqual(load_cache_index('test.json'), {'a': 1, 'b': 2})
+            self.assertListEqual(sorted(os.listdir(temp_dir)), ['test.json', 'test.json.lock'])
+
+
+    def test_update_cache_index_concurrent(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True):
+            # Concurrent updates don't lose each other's entries
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(
+                    lambda ix: update_cache_index('test.json', lambda cache_index: cache_index.update({str(ix): ix})),
+                    range(32)
+                ))
+            self.assertDictEqual(load_cache_index('test.json'), {str(ix): ix for ix in range(32)})
+            self.assertListEqual(sorted(os.listdir(temp_dir)), ['test.json', 'test.json.lock'])
+
+
+    def test_update_cache_index_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True), \
+             unittest.mock.patch('os.replace', side_effect=PermissionError('Permission denied')):
+            # A cache write failure is not an error, and the temporary file is removed
+            update_cache_index('test.json', lambda cache_index: cache_index.update({'a': 1}))
+            self.assertDictEqual(load_cache_index('test.json'), {})
+            self.assertListEqual(os.listdir(temp_dir), ['test.json.lock'])
+
+
+    def test_update_cache_index_no_cache_dir(self):
+        with unittest.mock.patch.dict('os.environ', {}, clear=True):
+            update_cache_index('test.json', lambda cache_index: cache_index.update({'a': 1}))
+            self.assertDictEqual(load_cache_index('test.json'), {})
@@ -2,6 +2,7 @@
 # https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
 
 import io
+import json
 import os
 import unittest
 import unittest.mock
@@ -11,7 +12,7 @@ import urllib3
 from ctxkit.api import DEFAULT_SYSTEM
 from ctxkit.main import main
 
-from .test_main import create_test_files
+from .test_main import JSONBody, create_test_files
 
 
 class TestClaude(unittest.TestCase):
@@ -26,8 +27,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -44,14 +45,14 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -71,8 +72,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -89,7 +90,7 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
@@ -97,7 +98,82 @@ class TestClaude(unittest.TestCase):
                 'max_tokens': 8000,
                 'stream': True,
                 'system': DEFAULT_SYSTEM
+            }),
+            preload_content=False,
+            retries=0
+        )
+        mock_claude_response.close.assert_called_once()
+
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+
+    def test_claude_prompt_cache(self):
+        with create_test_files([
+                 ('test.txt', 'test text'),
+                 (('src', 'a.py'), 'a'),
+                 (('src', 'b.py'), 'b')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            src_path = os.path.join(temp_dir, 'src')
+            a_path = os.path.join(src_path, 'a.py')
+            b_path = os.path.join(src_path, 'b.py')
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+
+            # Create a mock Response object for the HTTP response
+            mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_claude_response.status = 200
+            mock_claude_response.read_chunked.return_value = [
+                b'data: {"type": "message_start", "message": {"usage": {"input_tokens": 12, ' +
+                b'"cache_creation_input_tokens": 0, "cache_read_input_tokens": 2048, "output_tokens": 1}}}\n\n',
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 5}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_claude_response
+
+            main(['-m', 'Review', '-f', test_path, '-d', src_path, '-x', 'py', '-m', 'Hello', '--api', 'claude', 'model-name',
+                  '--stats-json', stats_path])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats = json.loads(stats_file.read())
+
+        mock_pool_manager_instance.request.assert_called_once_with(
+            method='POST',
+            url='https://api.anthropic.com/v1/messages',
+            headers={
+                'x-api-key': 'XXXX',
+                'anthropic-version': '2023-06-01',
+                'Content-Type': 'application/json'
             },
+            body=JSONBody({
+                'model': 'model-name',
+                'messages': [
+                    {
+                        'role': 'user',
+                        'content': [
+                            {'type': 'text', 'text': 'Review'},
+                            {'type': 'text', 'text': f'<{test_path}>\ntest text\n</{test_path}>'},
+                            {'type': 'text', 'text': f'<{a_path}>\na\n</{a_path}>'},
+                            {'type': 'text', 'text': f'<{b_path}>\nb\n</{b_path}>', 'cache_control': {'type': 'ephemeral'}},
+                            {'type': 'text', 'text': 'Hello'}
+                        ]
+                    }
+                ],
+                'max_tokens': 8000,
+                'stream': True,
+                'system': [
+                    {'type': 'text', 'text': DEFAULT_SYSTEM, 'cache_control': {'type': 'ephemeral'}}
+                ]
+            }),
             preload_content=False,
             retries=0
         )
@@ -105,6 +181,64 @@ class TestClaude(unittest.TestCase):
 
         self.assertEqual(stdout.getvalue(), 'Goodbye\n')
         self.assertEqual(stderr.getvalue(), '')
+        self.assertDictEqual(stats['usage'], {
+            'input_tokens': 12,
+            'cache_read_tokens': 2048,
+            'cache_write_tokens': 0,
+            'output_tokens': 5
+        })
+
+
+    def test_claude_prompt_cache_no_suffix(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+
+            # Create a mock Response object for the HTTP response
+            mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_claude_response.status = 200
+            mock_claude_response.read_chunked.return_value = [
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_claude_response
+
+            main(['-f', test_path, '--api', 'claude', 'model-name', '-s', ''])
+
+        mock_pool_manager_instance.request.assert_called_once_with(
+            method='POST',
+            url='https://api.anthropic.com/v1/messages',
+            headers={
+                'x-api-key': 'XXXX',
+                'anthropic-version': '2023-06-01',
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'model': 'model-name',
+                'messages': [
+                    {
+                        'role': 'user',
+                        'content': [
+                            {'type': 'text', 'text': f'<{test_path}>\ntest text\n</{test_path}>', 'cache_control': {'type': 'ephemeral'}}
+                        ]
+                    }
+                ],
+                'max_tokens': 8000,
+                'stream': True
+            }),
+            preload_content=False,
+            retries=0
+        )
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
 
 
     def test_claude_output(self):
@@ -121,8 +255,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -143,14 +277,14 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello\n\ntest text'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -170,8 +304,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -188,7 +322,7 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
@@ -196,7 +330,7 @@ class TestClaude(unittest.TestCase):
                 'temperature': 0.2,
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -216,8 +350,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -234,7 +368,7 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
@@ -242,7 +376,7 @@ class TestClaude(unittest.TestCase):
                 'top_p': 0.2,
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -280,14 +414,14 @@ class TestClaude(unittest.TestCase):
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -309,10 +443,10 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: {"type": "message_delta", "delta": {"usage": {"output_tokens": 1}}}',
-                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}',
-                b'data: {"type": "message_stop"}'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"usage": {"output_tokens": 1}}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -336,8 +470,8 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -360,9 +494,9 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "partial"}}',
-                b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}',
-                b'data: {"type": "message_stop"}'
+                b'data: {"type": "content_block_delta", "delta": {"text": "partial"}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -377,6 +511,117 @@ class TestClaude(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '\nError: Claude API response truncated (stop_reason: max_tokens)\n')
 
 
+
+    def test_claude_truncated_continue(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_claude_response.status = 200
+            mock_claude_response.read_chunked.return_value = [
+                b'data: {"type": "content_block_delta", "delta": {"text": "<a.txt>"}}\n\n',
+                b'data: {"type": "content_block_delta", "delta": {"text": "\\nA\\n "}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
+            ]
+            mock_claude_response2 = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_claude_response2.status = 200
+            mock_claude_response2.read_chunked.return_value = [
+                b'data: {"type": "content_block_delta", "delta": {"text": "\\n"}}\n\n',
+                b'data: {"type": "content_block_delta", "delta": {"text": " B\\n</a.txt>"}}\n\n',
+                b'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_claude_response, mock_claude_response2]
+
+            main(['-m', 'Hello', '--api', 'claude', 'model-name', '-s', '', '--continue', '1'])
+
+        self.assertListEqual(mock_pool_manager_instance.request.call_args_list, [
+            unittest.mock.call(
+                method='POST',
+                url='https://api.anthropic.com/v1/messages',
+                headers={
+                    'x-api-key': 'XXXX',
+                    'anthropic-version': '2023-06-01',
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'model': 'model-name',
+                    'messages': [
+                        {'role': 'user', 'content': 'Hello'}
+                    ],
+                    'max_tokens': 8000,
+                    'stream': True
+                }),
+                preload_content=False,
+                retries=0
+            ),
+            unittest.mock.call(
+                method='POST',
+                url='https://api.anthropic.com/v1/messages',
+                headers={
+                    'x-api-key': 'XXXX',
+                    'anthropic-version': '2023-06-01',
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'model': 'model-name',
+                    'messages': [
+                        {'role': 'user', 'content': 'Hello'},
+                        {'role': 'assistant', 'content': '<a.txt>\nA'}
+                    ],
+                    'max_tokens': 8000,
+                    'stream': True
+                }),
+                preload_content=False,
+                retries=0
+            )
+        ])
+        mock_claude_response.close.assert_called_once()
+        mock_claude_response2.close.assert_called_once()
+        self.assertEqual(stdout.getvalue(), '<a.txt>\nA\n B\n</a.txt>\n')
+        self.assertEqual(stderr.getvalue(), '\nResponse truncated - continuing (1 of 1)\n')
+
+
+    def test_claude_truncated_continue_limit(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            def mock_request(**_kwargs):
+                mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_claude_response.status = 200
+                mock_claude_response.read_chunked.return_value = [
+                    b'data: {"type": "content_block_delta", "delta": {"text": "partial "}}\n\n',
+                    b'data: {"type": "message_delta", "delta": {"stop_reason": "max_tokens"}}\n\n',
+                    b'data: {"type": "message_stop"}\n\n'
+                ]
+                return mock_claude_response
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_request
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'claude', 'model-name', '-s', '', '--continue', '2'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 3)
+        self.assertEqual(stdout.getvalue(), 'partial partial partial ')
+        self.assertEqual(stderr.getvalue(), '''\
+
+Response truncated - continuing (1 of 2)
+
+Response truncated - continuing (2 of 2)
+
+Error: Claude API response truncated (stop_reason: max_tokens)
+''')
+
+
     def test_claude_no_terminator_with_content(self):
         # Connection drops mid-stream: content arrives but no terminator
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
@@ -387,7 +632,7 @@ class TestClaude(unittest.TestCase):
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "partial"}}'
+                b'data: {"type": "content_block_delta", "delta": {"text": "partial"}}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -414,9 +659,11 @@ class TestClaude(unittest.TestCase):
             mock_claude_response.read_chunked.return_value = [
                 b'''\
 data: {"type": "content_block_delta", "delta": {"text": "Goodbye\\n"}}
+
 data: {"type": "content_block_delta", "delta": {"text": "Goodbye2"}}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -433,14 +680,14 @@ data: {"type": "content_block_delta", "delta": {"text": "Goodbye2"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -463,8 +710,9 @@ data: {"type": "content_block_delta", "delta": {"text": "Goodbye2"}}
                 b'''
 data: {"type": "content_block_delta", "delta":
 data: {"text": "Goodbye"}}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -481,14 +729,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -509,8 +757,8 @@ data: {"text": "Goodbye"}}
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -527,14 +775,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -555,8 +803,8 @@ data: {"text": "Goodbye"}}
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}',
-                b'data: [DONE]'
+                b'data: {"type": "content_block_delta", "delta": {"text": "Goodbye"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -578,14 +826,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -622,14 +870,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -665,14 +913,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -706,10 +954,10 @@ data: {"text": "Goodbye"}}
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "other_type", "data": "ignored"}',  # False case: wrong type
-                b'data: {"type": "content_block_delta", "delta": {"text": "Valid"}}',  # True case
-                b'data: {"type": "content_block_delta", "delta": {}}',  # False case: no 'text' in delta
-                b'data: [DONE]'
+                b'data: {"type": "other_type", "data": "ignored"}\n\n',  # False case: wrong type
+                b'data: {"type": "content_block_delta", "delta": {"text": "Valid"}}\n\n',  # True case
+                b'data: {"type": "content_block_delta", "delta": {}}\n\n',  # False case: no 'text' in delta
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -726,14 +974,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -754,8 +1002,8 @@ data: {"text": "Goodbye"}}
             mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_claude_response.status = 200
             mock_claude_response.read_chunked.return_value = [
-                b'data: {"type": "error", "error": {"message": "Test API error"}}',
-                b'data: [DONE]'
+                b'data: {"type": "error", "error": {"message": "Test API error"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -774,14 +1022,14 @@ data: {"text": "Goodbye"}}
                 'anthropic-version': '2023-06-01',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 8000,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -821,7 +1069,8 @@ data: {"text": "Goodbye"}}
             headers={
                 'x-api-key': 'XXXX',
                 'anthropic-version': '2023-06-01',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -860,7 +1109,8 @@ claude-3-sonnet-20240229
             headers={
                 'x-api-key': 'XXXX',
                 'anthropic-version': '2023-06-01',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
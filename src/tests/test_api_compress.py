@@ -0,0 +1,176 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import gzip
+import io
+import json
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._compress import CompressPoolManager
+from ctxkit.main import main
+
+
+def _mock_response(status, chunks=None):
+    response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    response.status = status
+    response.data = b''
+    if chunks is not None:
+        response.read_chunked.return_value = chunks
+    return response
+
+
+class TestCompress(unittest.TestCase):
+
+    def test_accept_encoding(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.return_value = mock_200
+        compress_pool_manager = CompressPoolManager(mock_pool_manager)
+
+        self.assertIs(compress_pool_manager.request('GET', 'https://example.com/models', retries=0), mock_200)
+        self.assertIs(compress_pool_manager.request(method='GET', url='https://example.com/a', headers={'X-Key': 'XXXX'}), mock_200)
+        self.assertIs(compress_pool_manager.request('GET', 'https://example.com/b', headers={'accept-encoding': 'br'}), mock_200)
+        self.assertListEqual(mock_pool_manager.request.call_args_list, [
+            unittest.mock.call('GET', 'https://example.com/models', headers={'Accept-Encoding': 'gzip, deflate'}, retries=0),
+            unittest.mock.call(method='GET', url='https://example.com/a', headers={'X-Key': 'XXXX', 'Accept-Encoding': 'gzip, deflate'}),
+            unittest.mock.call('GET', 'https://example.com/b', headers={'accept-encoding': 'br'})
+        ])
+
+
+    def test_accept_encoding_error_status(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_400 = _mock_response(400)
+        mock_406 = _mock_response(406)
+        mock_pool_manager.request.side_effect = [mock_400, mock_406]
+        compress_pool_manager = CompressPoolManager(mock_pool_manager)
+
+        # GET error statuses are API errors - the request is not retried
+        self.assertIs(compress_pool_manager.request('GET', 'https://example.com/models'), mock_400)
+        self.assertIs(compress_pool_manager.request('GET', 'https://example.com/models'), mock_406)
+        self.assertListEqual(mock_pool_manager.request.call_args_list, [
+            unittest.mock.call('GET', 'https://example.com/models', headers={'Accept-Encoding': 'gzip, deflate'}),
+            unittest.mock.call('GET', 'https://example.com/models', headers={'Accept-Encoding': 'gzip, deflate'})
+        ])
+        mock_400.close.assert_not_called()
+        self.assertSetEqual(compress_pool_manager.uncompressed_hosts, set())
+
+
+    def test_accept_encoding_decode_error(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.side_effect = [urllib3.exceptions.DecodeError('bad gzip'), mock_200]
+        compress_pool_manager = CompressPoolManager(mock_pool_manager)
+
+        self.assertIs(compress_pool_manager.request('GET', 'https://example.com/models'), mock_200)
+        self.assertListEqual(mock_pool_manager.request.call_args_list, [
+            unittest.mock.call('GET', 'https://example.com/models', headers={'Accept-Encoding': 'gzip, deflate'}),
+            unittest.mock.call('GET', 'https://example.com/models')
+        ])
+        self.assertSetEqual(compress_pool_manager.uncompressed_hosts, {'example.com'})
+
+
+    def test_compress_body(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.return_value = mock_200
+        compress_pool_manager = CompressPoolManager(mock_pool_manager, compress=True)
+        body = json.dumps({'prompt': 'x' * 2000}).encode('utf-8')
+
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', headers={'X-Key': 'XXXX'}, body=body), mock_200)
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=b'{}'), mock_200)
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat'), mock_200)
+
+        self.assertEqual(mock_pool_manager.request.call_count, 3)
+        compressed_call = mock_pool_manager.request.call_args_list[0]
+        self.assertEqual(compressed_call.kwargs['headers'], {'X-Key': 'XXXX', 'Content-Encoding': 'gzip'})
+        self.assertLess(len(compressed_call.kwargs['body']), len(body))
+        self.assertEqual(gzip.decompress(compressed_call.kwargs['body']), body)
+        self.assertEqual(mock_pool_manager.request.call_args_list[1], unittest.mock.call('POST', 'https://example.com/chat', body=b'{}'))
+        self.assertEqual(mock_pool_manager.request.call_args_list[2], unittest.mock.call('POST', 'https://example.com/chat'))
+
+
+    def test_compress_body_not_enabled(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.return_value = mock_200
+        compress_pool_manager = CompressPoolManager(mock_pool_manager)
+        body = 'x' * 2000
+
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=body), mock_200)
+        mock_pool_manager.request.assert_called_once_with('POST', 'https://example.com/chat', body=body)
+
+
+    def test_compress_body_rejected(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_415 = _mock_response(415)
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.side_effect = [mock_415, mock_200, mock_200]
+        compress_pool_manager = CompressPoolManager(mock_pool_manager, compress=True)
+        body = 'x' * 2000
+
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=body, retries=0), mock_200)
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=body, retries=0), mock_200)
+        self.assertListEqual(mock_pool_manager.request.call_args_list, [
+            unittest.mock.call('POST', 'https://example.com/chat', headers={'Content-Encoding': 'gzip'},
+                               body=gzip.compress(body.encode('utf-8'), compresslevel=6, mtime=0), retries=0),
+            unittest.mock.call('POST', 'https://example.com/chat', body=body, retries=0),
+            unittest.mock.call('POST', 'https://example.com/chat', body=body, retries=0)
+        ])
+        mock_415.close.assert_called_once_with()
+
+
+    def test_compress_body_400(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_400 = _mock_response(400)
+        mock_400_uncompressed = _mock_response(400)
+        mock_400_other = _mock_response(400)
+        mock_200 = _mock_response(200)
+        mock_pool_manager.request.side_effect = [mock_400, mock_400_uncompressed, mock_400_other, mock_200]
+        compress_pool_manager = CompressPoolManager(mock_pool_manager, compress=True)
+        body = 'x' * 2000
+        compressed_call = unittest.mock.call(
+            'POST', 'https://example.com/chat', headers={'Content-Encoding': 'gzip'},
+            body=gzip.compress(body.encode('utf-8'), compresslevel=6, mtime=0)
+        )
+
+        # A 400 status that the uncompressed request also gets is an API error - the host's compression is kept
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=body), mock_400_uncompressed)
+        self.assertSetEqual(compress_pool_manager.uncompressed_hosts, set())
+
+        # A 400 status that the uncompressed request doesn't get is a rejected compressed request body
+        self.assertIs(compress_pool_manager.request('POST', 'https://example.com/chat', body=body), mock_200)
+        self.assertSetEqual(compress_pool_manager.uncompressed_hosts, {'example.com'})
+        self.assertListEqual(mock_pool_manager.request.call_args_list, [
+            compressed_call,
+            unittest.mock.call('POST', 'https://example.com/chat', body=body),
+            compressed_call,
+            unittest.mock.call('POST', 'https://example.com/chat', body=body)
+        ])
+        mock_400.close.assert_called_once_with()
+        mock_400_other.close.assert_called_once_with()
+
+
+    def test_compress_main(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = _mock_response(200, [
+                b'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n',
+                b'data: [DONE]\n\n'
+            ])
+
+            message = 'x' * 2000
+            main(['-m', message, '--api', 'grok', 'model-name', '-s', '', '--compress'])
+
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager_instance.request.assert_called_once()
+        request_kwargs = mock_pool_manager_instance.request.call_args.kwargs
+        self.assertEqual(request_kwargs['method'], 'POST')
+        self.assertEqual(request_kwargs['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(request_kwargs['body']))['messages'], [{'role': 'user', 'content': message}])
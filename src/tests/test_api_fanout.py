@@ -0,0 +1,208 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import threading
+import unittest
+import unittest.mock
+
+from ctxkit.api import get_all_output_path
+from ctxkit.main import main
+
+from .test_main import create_test_files, mock_grok_request
+
+
+class TestAPIFanout(unittest.TestCase):
+
+    def test_race(self):
+        slow_event = threading.Event()
+        model_responses = {}
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'slow-model': [slow_event, 'Slow', ' response'], 'fast-model': ['Fast', ' response']},
+                model_responses
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'slow-model', '--api', 'grok', 'fast-model', '--race', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Fast response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with(maxsize=2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+
+        # The losing response is shut down once the fast response wins, and then closed
+        self.assertTrue(slow_event.is_set())
+        for _ in range(100):
+            if model_responses['slow-model'].close.called:
+                break
+            threading.Event().wait(0.01)
+        model_responses['slow-model'].close.assert_called_once_with()
+        model_responses['fast-model'].close.assert_called_once_with()
+
+
+    def test_race_failure(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'bad-model': None, 'good-model': ['Good', ' response']}
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'bad-model', '--api', 'grok', 'good-model', '--race', '-s', '', '--retries', '0'])
+
+        self.assertEqual(stdout.getvalue(), 'Good response\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_race_all_failed(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request({'bad-model': None, 'worse-model': None})
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'grok', 'bad-model', '--api', 'grok', 'worse-model', '--race', '-s', '', '--retries', '0'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '\nError: xAI API failed with status 500\n')
+
+
+    def test_race_stats(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'bad-model': None, 'good-model': ['Good', ' response']}
+            )
+
+            main([
+                '-m', 'Hello', '--api', 'grok', 'bad-model', '--api', 'grok', 'good-model', '--race', '-s', '', '--retries', '0',
+                '--stats-json', stats_path
+            ])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats = json.loads(stats_file.read())
+
+        self.assertEqual(stdout.getvalue(), 'Good response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertEqual(stats['provider'], 'grok')
+        self.assertEqual(stats['model'], 'good-model')
+        self.assertEqual(stats['chunks'], 2)
+        self.assertNotIn('error', stats)
+
+
+    def test_all(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'model-one': ['One', ' response'], 'model-two': ['Two', ' response']}
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-one', '--api', 'grok', 'model-two', '--all', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), '''\
+==> grok model-one <==
+One response
+
+==> grok model-two <==
+Two response
+''')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with(maxsize=2)
+
+
+    def test_all_output(self):
+        with create_test_files([
+                 ('out.grok.model-one.md', 'old')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            output_path = os.path.join(temp_dir, 'out.md')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'model-one': ['One', ' response'], 'model:two': None}
+            )
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main([
+                    '-m', 'Hello', '--api', 'grok', 'model-one', '--api', 'grok', 'model:two', '--all', '-s', '',
+                    '-o', output_path, '-b', '--retries', '0'
+                ])
+
+            with open(os.path.join(temp_dir, 'out.grok.model-one.md'), 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), 'One response\n')
+            with open(os.path.join(temp_dir, 'out.grok.model-one.md.bak'), 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), 'old')
+            with open(os.path.join(temp_dir, 'out.grok.model-two.md'), 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), '')
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(
+            stderr.getvalue(),
+            'Error: grok model:two: xAI API failed with status 500\n\nError: 1 of 2 API calls failed\n'
+        )
+
+
+    def test_api_last(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'XAI_API_KEY': 'XXXX', 'CTXKIT_FLAGS': '--api grok model-one'}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request({'model-two': ['Two']})
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-two', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Two\n')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with()
+
+
+    def test_get_all_output_path(self):
+        self.assertEqual(get_all_output_path('out.md', 'grok', 'grok-4'), 'out.grok.grok-4.md')
+        self.assertEqual(get_all_output_path('out', 'ollama', 'qwen3:8b'), 'out.ollama.qwen3-8b')
+        self.assertEqual(get_all_output_path(os.path.join('a.b', 'out.txt'), 'gemini', 'models/gemini-2.5'),
+                         os.path.join('a.b', 'out.gemini.models-gemini-2.5.txt'))
+
+
+    def test_fanout_invalid_args(self):
+        for argv, message in (
+            (['-m', 'Hello', '--race', '--all', '--api', 'grok', 'model'], '--race and --all cannot be used together'),
+            (['-m', 'Hello', '--race'], '--race and --all require --api'),
+            (['-m', 'Hello', '--all', '--api', 'grok', 'model', '--noapi'], '--race and --all require --api'),
+            (['-m', 'Hello', '--race', '--api', 'grok', 'model', '--record', 'x.json'],
+             '--race and --all cannot be used with --batch, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--all', '--api', 'grok', 'model', '-e'], '--all cannot be used with --extract'),
+            (['-m', 'Hello', '--race', '--api', 'grok', 'model', '--api', 'ollama', 'model', '--keep-alive', '5m'],
+             '--keep-alive is only supported by the ollama API')
+        ):
+            with self.subTest(argv=argv), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(argv)
+
+                self.assertEqual(cm_exc.exception.code, 2)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(f'ctxkit: error: {message}', stderr.getvalue())
@@ -2,6 +2,7 @@
 # https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
 
 import io
+import json
 import os
 import unittest
 import unittest.mock
@@ -9,9 +10,11 @@ import unittest.mock
 import urllib3
 
 from ctxkit.api import DEFAULT_SYSTEM
+from ctxkit.api._continue import CONTINUE_PROMPT
+from ctxkit.api._prompt import get_prefix_hash
 from ctxkit.main import main
 
-from .test_main import create_test_files
+from .test_main import JSONBody, create_test_files
 
 
 class TestGemini(unittest.TestCase):
@@ -26,8 +29,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -42,11 +45,11 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -66,8 +69,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -82,12 +85,12 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ],
                 'systemInstruction': {'parts': [{'text': DEFAULT_SYSTEM}]}
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -97,6 +100,299 @@ class TestGemini(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '')
 
 
+
+
+    def test_gemini_prompt_items(self):
+        with create_test_files([
+                 (('src', 'a.py'), 'a'),
+                 (('src', 'b.py'), 'b')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            src_path = os.path.join(temp_dir, 'src')
+            a_path = os.path.join(src_path, 'a.py')
+            b_path = os.path.join(src_path, 'b.py')
+
+            # Create a mock Response object for the HTTP response
+            mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gemini_response.status = 200
+            mock_gemini_response.read_chunked.return_value = [
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}, "finishReason": "STOP"}]}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_gemini_response
+
+            main(['-d', src_path, '-x', 'py', '-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '-s', ''])
+
+        mock_pool_manager_instance.request.assert_called_once_with(
+            method='POST',
+            url='https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key=XXXX&alt=sse',
+            headers={
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'contents': [
+                    {
+                        'role': 'user',
+                        'parts': [
+                            {'text': f'<{a_path}>\na\n</{a_path}>'},
+                            {'text': f'<{b_path}>\nb\n</{b_path}>'},
+                            {'text': 'Hello'}
+                        ]
+                    }
+                ]
+            }),
+            preload_content=False,
+            retries=0
+        )
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_gemini_context_cache(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api.gemini.time.time', return_value=1000.0), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            cache_dir = os.path.join(temp_dir, 'cache')
+            prefix_text = f'<{test_path}>\ntest text\n</{test_path}>'
+
+            def mock_stream_response():
+                mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_gemini_response.status = 200
+                mock_gemini_response.read_chunked.return_value = [
+                    b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}, "finishReason": "STOP"}], ' +
+                    b'"usageMetadata": {"promptTokenCount": 5000, "cachedContentTokenCount": 4990, "candidatesTokenCount": 1}}\n\n'
+                ]
+                return mock_gemini_response
+
+            mock_cache_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_cache_response.status = 200
+            mock_cache_response.json.return_value = {'name': 'cachedContents/abc123'}
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_cache_response, mock_stream_response(), mock_stream_response()]
+
+            # The first call creates the cached content and the second reuses it
+            with unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX', 'CTXKIT_CACHE_DIR': cache_dir}):
+                main(['-f', test_path, '-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '--context-cache', '600'])
+                main(['-f', test_path, '-m', 'Again', '--api', 'gemini', 'gemini-2.0-flash-exp', '--context-cache', '600'])
+
+            with open(os.path.join(cache_dir, 'gemini-cache.json'), 'r', encoding='utf-8') as index_file:
+                cache_index = json.load(index_file)
+
+        prefix_hash = get_prefix_hash('gemini-2.0-flash-exp', DEFAULT_SYSTEM, prefix_text)
+        self.assertDictEqual(cache_index, {prefix_hash: {'name': 'cachedContents/abc123', 'expires': 1600.0}})
+        self.assertListEqual(mock_pool_manager_instance.request.call_args_list, [
+            unittest.mock.call(
+                method='POST',
+                url='https://generativelanguage.googleapis.com/v1beta/cachedContents?key=XXXX',
+                headers={
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'model': 'models/gemini-2.0-flash-exp',
+                    'contents': [
+                        {'role': 'user', 'parts': [{'text': prefix_text}]}
+                    ],
+                    'systemInstruction': {'parts': [{'text': DEFAULT_SYSTEM}]},
+                    'ttl': '600s'
+                }),
+                retries=0
+            ),
+            unittest.mock.call(
+                method='POST',
+                url='https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key=XXXX&alt=sse',
+                headers={
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'contents': [
+                        {'role': 'user', 'parts': [{'text': 'Hello'}]}
+                    ],
+                    'cachedContent': 'cachedContents/abc123'
+                }),
+                preload_content=False,
+                retries=0
+            ),
+            unittest.mock.call(
+                method='POST',
+                url='https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key=XXXX&alt=sse',
+                headers={
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'contents': [
+                        {'role': 'user', 'parts': [{'text': 'Again'}]}
+                    ],
+                    'cachedContent': 'cachedContents/abc123'
+                }),
+                preload_content=False,
+                retries=0
+            )
+        ])
+        self.assertEqual(stdout.getvalue(), 'Goodbye\nGoodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_gemini_context_cache_expired(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api.gemini.time.time', return_value=1000.0), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            cache_dir = os.path.join(temp_dir, 'cache')
+            prefix_text = f'<{test_path}>\ntest text\n</{test_path}>'
+            prefix_hash = get_prefix_hash('gemini-2.0-flash-exp', None, prefix_text)
+
+            # The index has an unexpired entry that was deleted, and an expired entry
+            os.makedirs(cache_dir)
+            with open(os.path.join(cache_dir, 'gemini-cache.json'), 'w', encoding='utf-8') as index_file:
+                json.dump({
+                    prefix_hash: {'name': 'cachedContents/deleted', 'expires': 2000.0},
+                    'other': {'name': 'cachedContents/other', 'expires': 900.0}
+                }, index_file)
+
+            mock_deleted_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_deleted_response.status = 403
+            mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gemini_response.status = 200
+            mock_gemini_response.read_chunked.return_value = [
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}, "finishReason": "STOP"}]}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_deleted_response, mock_gemini_response]
+
+            with unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX', 'CTXKIT_CACHE_DIR': cache_dir}):
+                main(['-f', test_path, '-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '-s', '', '--context-cache', '600'])
+
+            with open(os.path.join(cache_dir, 'gemini-cache.json'), 'r', encoding='utf-8') as index_file:
+                cache_index = json.load(index_file)
+
+        self.assertDictEqual(cache_index, {'other': {'name': 'cachedContents/other', 'expires': 900.0}})
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        mock_deleted_response.close.assert_called_once()
+        self.assertEqual(mock_pool_manager_instance.request.call_args_list[1], unittest.mock.call(
+            method='POST',
+            url='https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key=XXXX&alt=sse',
+            headers={
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'contents': [
+                    {'role': 'user', 'parts': [{'text': prefix_text}, {'text': 'Hello'}]}
+                ]
+            }),
+            preload_content=False,
+            retries=0
+        ))
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_gemini_context_cache_request_error(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api.gemini.time.time', return_value=1000.0), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            cache_dir = os.path.join(temp_dir, 'cache')
+            prefix_text = f'<{test_path}>\ntest text\n</{test_path}>'
+            prefix_hash = get_prefix_hash('gemini-2.0-flash-exp', None, prefix_text)
+            os.makedirs(cache_dir)
+            with open(os.path.join(cache_dir, 'gemini-cache.json'), 'w', encoding='utf-8') as index_file:
+                json.dump({prefix_hash: {'name': 'cachedContents/abc', 'expires': 2000.0}}, index_file)
+
+            mock_error_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_error_response.status = 429
+            mock_error_response.data = b''
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_error_response
+
+            # A cached request error is not retried uncached, and the cached content is kept
+            with unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX', 'CTXKIT_CACHE_DIR': cache_dir}):
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main([
+                        '-f', test_path, '-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '-s', '',
+                        '--context-cache', '600', '--retries', '0'
+                    ])
+
+            with open(os.path.join(cache_dir, 'gemini-cache.json'), 'r', encoding='utf-8') as index_file:
+                cache_index = json.load(index_file)
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertDictEqual(cache_index, {prefix_hash: {'name': 'cachedContents/abc', 'expires': 2000.0}})
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 1)
+        self.assertEqual(json.loads(mock_pool_manager_instance.request.call_args.kwargs['body'])['cachedContent'], 'cachedContents/abc')
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '\nError: Gemini API failed with status 429\n')
+
+
+    def test_gemini_context_cache_create_error(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            cache_dir = os.path.join(temp_dir, 'cache')
+
+            mock_cache_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_cache_response.status = 400
+            mock_cache_response.data = b'{"error": {"message": "Cached content is too small", "code": 400}}'
+            mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gemini_response.status = 200
+            mock_gemini_response.read_chunked.return_value = [
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}, "finishReason": "STOP"}]}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_cache_response, mock_gemini_response]
+
+            with unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX', 'CTXKIT_CACHE_DIR': cache_dir}):
+                main(['-f', test_path, '-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '-s', '', '--context-cache', '600'])
+
+            self.assertFalse(os.path.exists(cache_dir))
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        mock_cache_response.close.assert_called_once()
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(
+            stderr.getvalue(),
+            'Gemini context cache creation failed with status 400: Cached content is too small (code: 400)\n'
+        )
+
+
+    def test_gemini_context_cache_invalid_api(self):
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'claude', 'model-name', '--context-cache', '600'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertTrue(stderr.getvalue().endswith('ctxkit: error: --context-cache is only supported by the gemini API\n'))
+
+
     def test_gemini_output(self):
         with create_test_files([
                  ('test.txt', 'test text')
@@ -111,8 +407,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -131,11 +427,11 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello\n\ntest text'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -155,8 +451,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -171,14 +467,14 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ],
                 'generationConfig': {
                     'temperature': 0.2
                 }
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -198,8 +494,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -214,14 +510,14 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ],
                 'generationConfig': {
                     'topP': 0.2
                 }
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -241,8 +537,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -257,14 +553,14 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ],
                 'generationConfig': {
                     'maxOutputTokens': 100
                 }
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -300,11 +596,11 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -324,8 +620,8 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "partial"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "MAX_TOKENS"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "partial"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "MAX_TOKENS"}]}\n\n',
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -340,6 +636,51 @@ class TestGemini(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '\nError: Gemini API response truncated (finishReason: MAX_TOKENS)\n')
 
 
+
+    def test_gemini_truncated_continue(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gemini_response.status = 200
+            mock_gemini_response.read_chunked.return_value = [
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Hello, "}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "MAX_TOKENS"}]}\n\n',
+            ]
+            mock_gemini_response2 = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gemini_response2.status = 200
+            mock_gemini_response2.read_chunked.return_value = [
+                b'data: {"candidates": [{"content": {"parts": [{"text": "world"}]}, "finishReason": "STOP"}]}\n\n',
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_gemini_response, mock_gemini_response2]
+
+            main(['-m', 'Hello', '--api', 'gemini', 'gemini-2.0-flash-exp', '-s', '', '--continue', '1'])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_args_list[1], unittest.mock.call(
+            method='POST',
+            url='https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key=XXXX&alt=sse',
+            headers={
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'contents': [
+                    {'role': 'user', 'parts': [{'text': 'Hello'}]},
+                    {'role': 'model', 'parts': [{'text': 'Hello, '}]},
+                    {'role': 'user', 'parts': [{'text': CONTINUE_PROMPT}]}
+                ]
+            }),
+            preload_content=False,
+            retries=0
+        ))
+        self.assertEqual(stdout.getvalue(), 'Hello, world\n')
+        self.assertEqual(stderr.getvalue(), '\nResponse truncated - continuing (1 of 1)\n')
+
+
     def test_gemini_no_finish_reason_with_content(self):
         # Connection drops mid-stream: content arrives but finishReason never does
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
@@ -350,7 +691,7 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "partial"}]}}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "partial"}]}}]}\n\n',
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -375,11 +716,11 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye\\n"}]}}]}',
-                b'data: {"candidates": [{"content": {"parts": [{}]}}]}',
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye2"}]}}]}',
-                b'data: {"candidates": []}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye\\n"}]}}]}\n\n',
+                b'data: {"candidates": [{"content": {"parts": [{}]}}]}\n\n',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye2"}]}}]}\n\n',
+                b'data: {"candidates": []}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -394,11 +735,11 @@ class TestGemini(unittest.TestCase):
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -420,9 +761,11 @@ class TestGemini(unittest.TestCase):
             mock_gemini_response.read_chunked.return_value = [
                 b'''\
 data: {"candidates": [{"content": {"parts": [{"text": "Goodbye\\n"}]}}]}
+
 data: {"candidates": [{"content": {"parts": [{"text": "Goodbye2"}]}}]}
+
 ''',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -437,11 +780,11 @@ data: {"candidates": [{"content": {"parts": [{"text": "Goodbye2"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -464,8 +807,9 @@ data: {"candidates": [{"content": {"parts": [{"text": "Goodbye2"}]}}]}
                 b'''
 data: {"candidates": [{"content": {"parts":
 data:  [{"text": "Goodbye"}]}}]}
+
 ''',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -480,11 +824,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -505,8 +849,8 @@ data:  [{"text": "Goodbye"}]}}]}
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -521,11 +865,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -546,8 +890,8 @@ data:  [{"text": "Goodbye"}]}}]}
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}',
-                b'data: {"candidates": [{"finishReason": "STOP"}]}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Goodbye"}]}}]}\n\n',
+                b'data: {"candidates": [{"finishReason": "STOP"}]}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -567,11 +911,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -607,11 +951,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -646,11 +990,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -686,11 +1030,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -728,11 +1072,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -767,11 +1111,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -791,8 +1135,8 @@ data:  [{"text": "Goodbye"}]}}]}
             mock_gemini_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gemini_response.status = 200
             mock_gemini_response.read_chunked.return_value = [
-                b'data: {"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}',
-                b'data: {"error": {"message": "Rate limit exceeded", "status": "RESOURCE_EXHAUSTED"}}',
+                b'data: {"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}\n\n',
+                b'data: {"error": {"message": "Rate limit exceeded", "status": "RESOURCE_EXHAUSTED"}}\n\n',
             ]
 
             # Configure the mock PoolManager instance
@@ -809,11 +1153,11 @@ data:  [{"text": "Goodbye"}]}}]}
             headers={
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'contents': [
                     {'role': 'user', 'parts': [{'text': 'Hello'}]}
                 ]
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -865,7 +1209,8 @@ data:  [{"text": "Goodbye"}]}}]}
             method='GET',
             url='https://generativelanguage.googleapis.com/v1beta/models?key=XXXX',
             headers={
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -902,7 +1247,8 @@ gemini-2.0-flash-exp
             method='GET',
             url='https://generativelanguage.googleapis.com/v1beta/models?key=XXXX',
             headers={
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -936,7 +1282,8 @@ gemini-2.0-flash-exp
             method='GET',
             url='https://generativelanguage.googleapis.com/v1beta/models?key=XXXX',
             headers={
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -2,6 +2,7 @@
 # https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
 
 import io
+import json
 import os
 import unittest
 import unittest.mock
@@ -9,9 +10,11 @@ import unittest.mock
 import urllib3
 
 from ctxkit.api import DEFAULT_SYSTEM
+from ctxkit.api._continue import CONTINUE_PROMPT
+from ctxkit.api._prompt import get_prefix_hash
 from ctxkit.main import main
 
-from .test_main import create_test_files
+from .test_main import JSONBody, create_test_files
 
 
 class TestGPT(unittest.TestCase):
@@ -26,8 +29,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -43,11 +46,11 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -67,8 +70,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -84,12 +87,12 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'instructions': DEFAULT_SYSTEM,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -99,6 +102,204 @@ class TestGPT(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '')
 
 
+
+    def test_gpt_prompt_cache(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+            prefix_text = f'<{test_path}>\ntest text\n</{test_path}>'
+
+            # Create a mock Response object for the HTTP response
+            mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gpt_response.status = 200
+            mock_gpt_response.read_chunked.return_value = [
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: {"type": "response.completed", "response": {"usage": {"input_tokens": 2000, ' +
+                b'"input_tokens_details": {"cached_tokens": 1920}, "output_tokens": 3}}}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_gpt_response
+
+            main(['-f', test_path, '-m', 'Hello', '--api', 'gpt', 'model-name', '-s', '', '--stats-json', stats_path])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats = json.loads(stats_file.read())
+
+        mock_pool_manager_instance.request.assert_called_once_with(
+            method='POST',
+            url='https://api.openai.com/v1/responses',
+            headers={
+                'Authorization': 'Bearer XXXX',
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'model': 'model-name',
+                'input': [
+                    {
+                        'role': 'user',
+                        'content': [
+                            {'type': 'input_text', 'text': prefix_text},
+                            {'type': 'input_text', 'text': 'Hello'}
+                        ]
+                    }
+                ],
+                'prompt_cache_key': get_prefix_hash('model-name', None, prefix_text)[:32],
+                'stream': True
+            }),
+            preload_content=False,
+            retries=0
+        )
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertDictEqual(stats['usage'], {'input_tokens': 2000, 'cache_read_tokens': 1920, 'output_tokens': 3})
+
+
+
+    def test_gpt_prompt_items(self):
+        with create_test_files([
+                 (('src', 'a.py'), 'a'),
+                 (('src', 'b.py'), 'b')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            src_path = os.path.join(temp_dir, 'src')
+            a_path = os.path.join(src_path, 'a.py')
+            b_path = os.path.join(src_path, 'b.py')
+            a_text = f'<{a_path}>\na\n</{a_path}>'
+            b_text = f'<{b_path}>\nb\n</{b_path}>'
+
+            # Create a mock Response object for the HTTP response
+            mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gpt_response.status = 200
+            mock_gpt_response.read_chunked.return_value = [
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: {"type": "response.completed", "response": {}}\n\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_gpt_response
+
+            main(['-m', 'Review', '-d', src_path, '-x', 'py', '-m', 'Hello', '--api', 'gpt', 'model-name', '-s', ''])
+
+        mock_pool_manager_instance.request.assert_called_once_with(
+            method='POST',
+            url='https://api.openai.com/v1/responses',
+            headers={
+                'Authorization': 'Bearer XXXX',
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'model': 'model-name',
+                'input': [
+                    {
+                        'role': 'user',
+                        'content': [
+                            {'type': 'input_text', 'text': 'Review'},
+                            {'type': 'input_text', 'text': a_text},
+                            {'type': 'input_text', 'text': b_text},
+                            {'type': 'input_text', 'text': 'Hello'}
+                        ]
+                    }
+                ],
+                'prompt_cache_key': get_prefix_hash('model-name', None, f'Review\n\n{a_text}\n\n{b_text}')[:32],
+                'stream': True
+            }),
+            preload_content=False,
+            retries=0
+        )
+        self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_gpt_chain(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            chain_path = os.path.join(temp_dir, 'chain.txt')
+
+            def mock_response(response_id, text):
+                mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_gpt_response.status = 200
+                mock_gpt_response.read_chunked.return_value = [
+                    f'data: {{"type": "response.created", "response": {{"id": "{response_id}"}}}}\n\n'.encode('utf-8'),
+                    f'data: {{"type": "response.output_text.delta", "delta": "{text}"}}\n\n'.encode('utf-8'),
+                    b'data: {"type": "response.completed"}\n\n'
+                ]
+                return mock_gpt_response
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_response('resp_1', 'One'), mock_response('resp_2', 'Two')]
+
+            main(['-m', 'Hello', '--api', 'gpt', 'model-name', '-s', '', '--chain', chain_path])
+            with open(chain_path, 'r', encoding='utf-8') as chain_file:
+                self.assertEqual(chain_file.read(), 'resp_1\n')
+
+            main(['-m', 'Again', '--api', 'gpt', 'model-name', '-s', '', '--chain', chain_path])
+            with open(chain_path, 'r', encoding='utf-8') as chain_file:
+                self.assertEqual(chain_file.read(), 'resp_2\n')
+
+        self.assertListEqual(mock_pool_manager_instance.request.call_args_list, [
+            unittest.mock.call(
+                method='POST',
+                url='https://api.openai.com/v1/responses',
+                headers={
+                    'Authorization': 'Bearer XXXX',
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'model': 'model-name',
+                    'input': 'Hello',
+                    'stream': True
+                }),
+                preload_content=False,
+                retries=0
+            ),
+            unittest.mock.call(
+                method='POST',
+                url='https://api.openai.com/v1/responses',
+                headers={
+                    'Authorization': 'Bearer XXXX',
+                    'Content-Type': 'application/json'
+                },
+                body=JSONBody({
+                    'model': 'model-name',
+                    'input': 'Again',
+                    'previous_response_id': 'resp_1',
+                    'stream': True
+                }),
+                preload_content=False,
+                retries=0
+            )
+        ])
+        self.assertEqual(stdout.getvalue(), 'One\nTwo\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_gpt_chain_invalid_api(self):
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'claude', 'model-name', '--chain', 'chain.txt'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertTrue(stderr.getvalue().endswith('ctxkit: error: --chain is only supported by the gpt API\n'))
+
+
     def test_gpt_output(self):
         with create_test_files([
                  ('test.txt', 'test text')
@@ -113,8 +314,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -134,11 +335,11 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello\n\ntest text',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -158,8 +359,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -175,12 +376,12 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'temperature': 0.2,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -200,8 +401,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -217,12 +418,12 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'top_p': 0.2,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -242,8 +443,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -259,12 +460,12 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'max_output_tokens': 100,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -301,11 +502,11 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -325,8 +526,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: {"type": "response.completed"}'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: {"type": "response.completed"}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -349,8 +550,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "partial"}',
-                b'data: {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}}'
+                b'data: {"type": "response.output_text.delta", "delta": "partial"}\n\n',
+                b'data: {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -365,6 +566,81 @@ class TestGPT(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '\nError: OpenAI API response truncated (reason: max_output_tokens)\n')
 
 
+
+    def test_gpt_response_incomplete_continue(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gpt_response.status = 200
+            mock_gpt_response.read_chunked.return_value = [
+                b'data: {"type": "response.output_text.delta", "delta": "Hello, "}\n\n',
+                b'data: {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}}\n\n'
+            ]
+            mock_gpt_response2 = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gpt_response2.status = 200
+            mock_gpt_response2.read_chunked.return_value = [
+                b'data: {"type": "response.output_text.delta", "delta": "world"}\n\n',
+                b'data: {"type": "response.completed"}\n\n'
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_gpt_response, mock_gpt_response2]
+
+            main(['-m', 'Hello', '--api', 'gpt', 'model-name', '-s', '', '--continue', '1'])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_args_list[1], unittest.mock.call(
+            method='POST',
+            url='https://api.openai.com/v1/responses',
+            headers={
+                'Authorization': 'Bearer XXXX',
+                'Content-Type': 'application/json'
+            },
+            body=JSONBody({
+                'model': 'model-name',
+                'input': [
+                    {'role': 'user', 'content': 'Hello'},
+                    {'role': 'assistant', 'content': 'Hello, '},
+                    {'role': 'user', 'content': CONTINUE_PROMPT}
+                ],
+                'stream': True
+            }),
+            preload_content=False,
+            retries=0
+        ))
+        self.assertEqual(stdout.getvalue(), 'Hello, world\n')
+        self.assertEqual(stderr.getvalue(), '\nResponse truncated - continuing (1 of 1)\n')
+
+
+    def test_gpt_response_incomplete_content_filter(self):
+        # Only max tokens truncation is continued
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'OPENAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_gpt_response.status = 200
+            mock_gpt_response.read_chunked.return_value = [
+                b'data: {"type": "response.output_text.delta", "delta": "partial"}\n\n',
+                b'data: {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "content_filter"}}}\n\n'
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_gpt_response
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'gpt', 'model-name', '-s', '', '--continue', '1'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 1)
+        self.assertEqual(stdout.getvalue(), 'partial')
+        self.assertEqual(stderr.getvalue(), '\nError: OpenAI API response truncated (reason: content_filter)\n')
+
+
     def test_gpt_response_failed(self):
         # response.failed event raises with the server-supplied error message
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
@@ -375,8 +651,8 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "partial"}',
-                b'data: {"type": "response.failed", "response": {"error": {"message": "model overloaded"}}}'
+                b'data: {"type": "response.output_text.delta", "delta": "partial"}\n\n',
+                b'data: {"type": "response.failed", "response": {"error": {"message": "model overloaded"}}}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -401,7 +677,7 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "partial"}'
+                b'data: {"type": "response.output_text.delta", "delta": "partial"}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -426,11 +702,11 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye\\n"}',
-                b'data: {"type": "response.output_text.delta"}',
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye2"}',
-                b'data: {"type": "other_event"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye\\n"}\n\n',
+                b'data: {"type": "response.output_text.delta"}\n\n',
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye2"}\n\n',
+                b'data: {"type": "other_event"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -446,11 +722,11 @@ class TestGPT(unittest.TestCase):
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -472,9 +748,11 @@ class TestGPT(unittest.TestCase):
             mock_gpt_response.read_chunked.return_value = [
                 b'''\
 data: {"type": "response.output_text.delta", "delta": "Goodbye\\n"}
+
 data: {"type": "response.output_text.delta", "delta": "Goodbye2"}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -490,11 +768,11 @@ data: {"type": "response.output_text.delta", "delta": "Goodbye2"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -517,8 +795,9 @@ data: {"type": "response.output_text.delta", "delta": "Goodbye2"}
                 b'''
 data: {"type": "response.output_text.delta",
 data:  "delta": "Goodbye"}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -534,11 +813,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -559,8 +838,8 @@ data:  "delta": "Goodbye"}
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -576,11 +855,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -601,8 +880,8 @@ data:  "delta": "Goodbye"}
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Goodbye"}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -623,11 +902,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -664,11 +943,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -704,11 +983,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -745,11 +1024,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -788,11 +1067,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -828,11 +1107,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -852,9 +1131,9 @@ data:  "delta": "Goodbye"}
             mock_gpt_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_gpt_response.status = 200
             mock_gpt_response.read_chunked.return_value = [
-                b'data: {"type": "response.output_text.delta", "delta": "Hello"}',
-                b'data: {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}',
-                b'data: [DONE]'
+                b'data: {"type": "response.output_text.delta", "delta": "Hello"}\n\n',
+                b'data: {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -872,11 +1151,11 @@ data:  "delta": "Goodbye"}
                 'Authorization': 'Bearer XXXX',
                 'Content-Type': 'application/json'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'input': 'Hello',
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -929,7 +1208,8 @@ data:  "delta": "Goodbye"}
             url='https://api.openai.com/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -968,7 +1248,8 @@ gpt-4-turbo-preview
             url='https://api.openai.com/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -1003,7 +1284,8 @@ gpt-4-turbo-preview
             url='https://api.openai.com/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
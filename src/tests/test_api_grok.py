@@ -2,6 +2,7 @@
 # https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
 
 import io
+import json
 import os
 import unittest
 import unittest.mock
@@ -9,9 +10,10 @@ import unittest.mock
 import urllib3
 
 from ctxkit.api import DEFAULT_SYSTEM
+from ctxkit.api._continue import CONTINUE_PROMPT
 from ctxkit.main import main
 
-from .test_main import create_test_files
+from .test_main import JSONBody, create_test_files
 
 
 class TestGrok(unittest.TestCase):
@@ -26,8 +28,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -44,13 +46,13 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -70,8 +72,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -88,14 +90,14 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'system', 'content': DEFAULT_SYSTEM},
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -119,8 +121,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -141,13 +143,13 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello\n\ntest text'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -167,8 +169,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -185,14 +187,14 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'temperature': 0.2,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -212,8 +214,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -230,14 +232,14 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'top_p': 0.2,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -257,8 +259,8 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -275,14 +277,14 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'max_tokens': 100,
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -320,13 +322,13 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -346,9 +348,9 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "partial"}}]}',
-                b'data: {"choices": [{"delta": {}, "finish_reason": "length"}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "partial"}}]}\n\n',
+                b'data: {"choices": [{"delta": {}, "finish_reason": "length"}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -363,6 +365,91 @@ class TestGrok(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '\nError: xAI API response truncated (finish_reason: length)\n')
 
 
+
+    def test_grok_truncated_continue(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response.status = 200
+            mock_grok_response.read_chunked.return_value = [
+                b'data: {"choices": [{"delta": {"content": "Hello, "}}]}\n\n',
+                b'data: {"choices": [{"delta": {}, "finish_reason": "length"}]}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+            mock_grok_response2 = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response2.status = 200
+            mock_grok_response2.read_chunked.return_value = [
+                b'data: {"choices": [{"delta": {"content": "world"}}]}\n\n',
+                b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_grok_response, mock_grok_response2]
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '--continue', '1'])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_args_list[1], unittest.mock.call(
+            method='POST',
+            url='https://api.x.ai/v1/chat/completions',
+            headers={
+                'Authorization': 'Bearer XXXX',
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body=JSONBody({
+                'model': 'model-name',
+                'messages': [
+                    {'role': 'system', 'content': DEFAULT_SYSTEM},
+                    {'role': 'user', 'content': 'Hello'},
+                    {'role': 'assistant', 'content': 'Hello, '},
+                    {'role': 'user', 'content': CONTINUE_PROMPT}
+                ],
+                'stream': True
+            }),
+            preload_content=False,
+            retries=0
+        ))
+        self.assertEqual(stdout.getvalue(), 'Hello, world\n')
+        self.assertEqual(stderr.getvalue(), '\nResponse truncated - continuing (1 of 1)\n')
+
+
+
+    def test_grok_usage(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+
+            mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response.status = 200
+            mock_grok_response.read_chunked.return_value = [
+                b'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\n',
+                b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n',
+                b'data: {"choices": [], "usage": {"prompt_tokens": 100, "completion_tokens": 2, ' +
+                b'"prompt_tokens_details": {"cached_tokens": 64}}}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_grok_response
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--stats-json', stats_path])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats = json.loads(stats_file.read())
+
+        self.assertEqual(stdout.getvalue(), 'Hello\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertDictEqual(stats['usage'], {'input_tokens': 100, 'cache_read_tokens': 64, 'output_tokens': 2})
+
+
     def test_grok_finish_reason_stop(self):
         # finish_reason == "stop" is the normal completion case — no error
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
@@ -373,9 +460,9 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -398,7 +485,7 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "partial"}}]}'
+                b'data: {"choices": [{"delta": {"content": "partial"}}]}\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -423,10 +510,10 @@ class TestGrok(unittest.TestCase):
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye\\n"}}]}',
-                b'data: {"choices": [{"delta": {}}]}',
-                b'data: {"choices": [{"delta": {"content": "Goodbye2"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye\\n"}}]}\n\n',
+                b'data: {"choices": [{"delta": {}}]}\n\n',
+                b'data: {"choices": [{"delta": {"content": "Goodbye2"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -443,13 +530,13 @@ class TestGrok(unittest.TestCase):
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -471,9 +558,11 @@ class TestGrok(unittest.TestCase):
             mock_grok_response.read_chunked.return_value = [
                 b'''\
 data: {"choices": [{"delta": {"content": "Goodbye\\n"}}]}
+
 data: {"choices": [{"delta": {"content": "Goodbye2"}}]}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -490,13 +579,13 @@ data: {"choices": [{"delta": {"content": "Goodbye2"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -519,8 +608,9 @@ data: {"choices": [{"delta": {"content": "Goodbye2"}}]}
                 b'''
 data: {"choices": [{"delta":
 data:  {"content": "Goodbye"}}]}
+
 ''',
-                b'data: [DONE]'
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -537,13 +627,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -555,7 +645,7 @@ data:  {"content": "Goodbye"}}]}
 
     def test_grok_split_multibyte_codepoint(self):
         # A multi-byte UTF-8 codepoint (é = b'\xc3\xa9') split across HTTP chunks
-        # would raise UnicodeDecodeError without an incremental decoder.
+        # must be reassembled before the event's data is decoded.
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
              unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
@@ -565,8 +655,8 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
                 b'data: {"choices": [{"delta": {"content": "caf\xc3',
-                b'\xa9"}}]}',
-                b'data: [DONE]'
+                b'\xa9"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -581,7 +671,7 @@ data:  {"content": "Goodbye"}}]}
 
     def test_grok_split_chunk_continuation_no_prefix(self):
         # Real chunk-boundary case: the continuation chunk arrives without its
-        # own 'data:' prefix. Without the SSE helper this content was silently dropped.
+        # own 'data:' prefix, so the partial line must be held until the line ends.
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
              unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
@@ -591,8 +681,8 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
                 b'data: {"choices": [{"delta": {"content":',
-                b' "Goodbye"}}]}',
-                b'data: [DONE]'
+                b' "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -606,8 +696,8 @@ data:  {"content": "Goodbye"}}]}
 
 
     def test_grok_split_chunk_continuation_no_prefix_fails_then_continues(self):
-        # Multi-chunk continuation where each non-prefixed continuation also fails JSON
-        # parse, exercising the data_prefix accumulation branch in the SSE helper.
+        # Multi-chunk continuation where no chunk contains a line terminator until the
+        # last, exercising the SSE parser's pending partial-line buffer.
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
              unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
@@ -618,8 +708,8 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response.read_chunked.return_value = [
                 b'data: {"choices": [{"delta":',
                 b' {"content":',
-                b' "Goodbye"}}]}',
-                b'data: [DONE]'
+                b' "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             mock_pool_manager_instance = mock_pool_manager.return_value
@@ -643,8 +733,8 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -661,13 +751,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -688,8 +778,8 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Goodbye"}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -711,13 +801,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -754,13 +844,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -796,13 +886,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -840,13 +930,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -886,13 +976,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -929,13 +1019,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -955,9 +1045,9 @@ data:  {"content": "Goodbye"}}]}
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": "Hello"}}]}',
-                b'data: {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\n',
+                b'data: {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -976,13 +1066,13 @@ data:  {"content": "Goodbye"}}]}
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -1035,7 +1125,8 @@ data:  {"content": "Goodbye"}}]}
             url='https://api.x.ai/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -1073,7 +1164,8 @@ grok-vision-beta
             url='https://api.x.ai/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
@@ -1108,7 +1200,8 @@ grok-vision-beta
             url='https://api.x.ai/v1/models',
             headers={
                 'Authorization': 'Bearer XXXX',
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Accept-Encoding': 'gzip, deflate'
             },
             retries=0
         )
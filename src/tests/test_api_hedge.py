@@ -0,0 +1,174 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import threading
+import unittest
+import unittest.mock
+
+from ctxkit.api._continue import CONTINUE_PROMPT
+from ctxkit.main import main
+
+from .test_main import mock_grok_request
+
+
+# Helper to get the mock PoolManager's request bodies by model
+def _get_request_bodies(mock_pool_manager_instance):
+    request_bodies = {}
+    for request_call in mock_pool_manager_instance.request.call_args_list:
+        request_body = json.loads(request_call.kwargs['body'])
+        request_bodies[request_body['model']] = request_body
+    return request_bodies
+
+
+class TestAPIHedge(unittest.TestCase):
+
+    def test_hedge_first(self):
+        slow_event = threading.Event()
+        model_responses = {}
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'slow-model': [slow_event, 'Slow'], 'fast-model': ['Fast', ' response']},
+                model_responses
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'slow-model', '--hedge', 'grok', 'fast-model', '--hedge-first', '20', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Fast response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with(maxsize=2)
+        self.assertDictEqual(_get_request_bodies(mock_pool_manager_instance), {
+            'slow-model': {'model': 'slow-model', 'messages': [{'role': 'user', 'content': 'Hello'}], 'stream': True},
+            'fast-model': {'model': 'fast-model', 'messages': [{'role': 'user', 'content': 'Hello'}], 'stream': True}
+        })
+
+        # The slow response is shut down once the fast response wins, and then closed
+        self.assertTrue(slow_event.is_set())
+        for _ in range(100):
+            if model_responses['slow-model'].close.called:
+                break
+            threading.Event().wait(0.01)
+        model_responses['slow-model'].close.assert_called_once_with()
+
+
+    def test_hedge_stall(self):
+        stall_event = threading.Event()
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'stall-model': ['Partial', stall_event, ' stalled'], 'backup-model': [' response']}
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'stall-model', '--hedge', 'grok', 'backup-model', '--hedge-stall', '20', '-s', ''])
+
+        # The backup continues the partial response, and the stalled response is shut down
+        self.assertTrue(stall_event.is_set())
+        self.assertEqual(stdout.getvalue(), 'Partial response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertDictEqual(_get_request_bodies(mock_pool_manager_instance)['backup-model'], {
+            'model': 'backup-model',
+            'messages': [
+                {'role': 'user', 'content': 'Hello'},
+                {'role': 'assistant', 'content': 'Partial'},
+                {'role': 'user', 'content': CONTINUE_PROMPT}
+            ],
+            'stream': True
+        })
+
+
+    def test_hedge_not_needed(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'fast-model': ['Fast', ' response'], 'backup-model': ['Backup']}
+            )
+
+            main(['-m', 'Hello', '--api', 'grok', 'fast-model', '--hedge', 'grok', 'backup-model', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Fast response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertListEqual(list(_get_request_bodies(mock_pool_manager_instance).keys()), ['fast-model'])
+
+
+    def test_hedge_backup_failed(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'slow-model': [0.2, 'Slow', ' response'], 'bad-model': None}
+            )
+
+            main([
+                '-m', 'Hello', '--api', 'grok', 'slow-model', '--hedge', 'grok', 'bad-model', '--hedge-first', '20',
+                '--retries', '0', '-s', ''
+            ])
+
+        self.assertEqual(stdout.getvalue(), 'Slow response\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+
+
+    def test_hedge_all_failed(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(
+                {'slow-model': [0.2, 'Slow', ' response'], 'bad-model': None}
+            )
+            mock_request = mock_pool_manager_instance.request.side_effect
+
+            # The slow request fails after the hedge
+            def mock_slow_failure(**kwargs):
+                if json.loads(kwargs['body'])['model'] == 'slow-model':
+                    threading.Event().wait(0.2)
+                    kwargs['body'] = json.dumps({'model': 'bad-model'})
+                return mock_request(**kwargs)
+
+            mock_pool_manager_instance.request.side_effect = mock_slow_failure
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main([
+                    '-m', 'Hello', '--api', 'grok', 'slow-model', '--hedge', 'grok', 'bad-model', '--hedge-first', '20',
+                    '--retries', '0', '-s', ''
+                ])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '\nError: xAI API failed with status 500\n')
+
+
+    def test_hedge_invalid_args(self):
+        for argv, message in (
+            (['-m', 'Hello', '--hedge', 'grok', 'model'], '--hedge requires --api'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--hedge', 'grok', 'model', '--race'],
+             '--hedge cannot be used with --race, --all, --batch, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--hedge', 'grok', 'model', '--hedge-first', '0'],
+             '--hedge-first and --hedge-stall must be at least 1'),
+            (['-m', 'Hello', '--api', 'ollama', 'model', '--hedge', 'grok', 'model', '--keep-alive', '5m'],
+             '--keep-alive is only supported by the ollama API'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--hedge', 'invalid', 'model'], 'Invalid API provider "invalid"')
+        ):
+            with self.subTest(argv=argv), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(argv)
+
+                self.assertEqual(cm_exc.exception.code, 2)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(f'ctxkit: error: {message}', stderr.getvalue())
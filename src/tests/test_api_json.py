@@ -0,0 +1,40 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import json
+import unittest
+
+from ctxkit.api._json import JSON_BACKENDS, get_json_backend, json_dumps, json_loads
+
+
+class TestJSON(unittest.TestCase):
+
+    def test_json_backends(self):
+        value = {'model': 'model-name', 'messages': [{'role': 'user', 'content': 'Café'}], 'max_tokens': 8000}
+        for name, (loads, dumps) in JSON_BACKENDS.items():
+            with self.subTest(backend=name):
+                body = dumps(value)
+                self.assertIsInstance(body, bytes)
+                self.assertEqual(json.loads(body), value)
+                self.assertEqual(loads(body), value)
+                self.assertEqual(loads(bytearray(body)), value)
+                self.assertEqual(loads(body.decode('utf-8')), value)
+                with self.assertRaises(ValueError):
+                    loads(b'{"a":')
+
+
+    def test_json_backend_stdlib(self):
+        loads, dumps = get_json_backend('json')
+        self.assertEqual(dumps({'a': 'é', 'b': [1, 2]}), '{"a":"é","b":[1,2]}'.encode('utf-8'))
+        self.assertEqual(loads(b'{"a": 1}'), {'a': 1})
+
+
+    def test_json_backend_default(self):
+        self.assertEqual(get_json_backend(), next(iter(JSON_BACKENDS.values())))
+        self.assertEqual(json_loads(json_dumps({'a': 1})), {'a': 1})
+
+
+    def test_json_backend_unknown(self):
+        with self.assertRaises(ValueError) as cm_exc:
+            get_json_backend('unknown')
+        self.assertTrue(str(cm_exc.exception).startswith('Unknown JSON backend "unknown". Available backends are: '))
@@ -12,7 +12,7 @@ import urllib3
 from ctxkit.api import DEFAULT_SYSTEM
 from ctxkit.main import main
 
-from .test_main import create_test_files
+from .test_main import JSONBody, create_test_files
 
 
 class TestOllama(unittest.TestCase):
@@ -32,8 +32,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -49,20 +49,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -92,8 +94,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -109,13 +111,15 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'system', 'content': DEFAULT_SYSTEM},
@@ -123,7 +127,7 @@ class TestOllama(unittest.TestCase):
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -157,8 +161,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -178,20 +182,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello\n\ntest text'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -221,8 +227,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -238,13 +244,15 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
@@ -254,7 +262,7 @@ class TestOllama(unittest.TestCase):
                         },
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -284,8 +292,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -301,13 +309,15 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
@@ -317,7 +327,7 @@ class TestOllama(unittest.TestCase):
                         },
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -347,8 +357,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -364,13 +374,15 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
@@ -380,7 +392,7 @@ class TestOllama(unittest.TestCase):
                         },
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -410,9 +422,9 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': '', 'thinking': 'Hmmm'}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': '', 'thinking': 'Hmmm'}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -428,20 +440,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': True
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -472,8 +486,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -489,20 +503,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -533,8 +549,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'message': {'content': 'there!'}}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -555,20 +571,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -613,20 +631,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -657,8 +677,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'error': 'BOOM!'}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'error': 'BOOM!'}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -676,20 +696,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -729,7 +751,8 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 )
             ]
@@ -741,6 +764,135 @@ class TestOllama(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '\nError: Unknown model "model-name" (500)\n')
 
 
+
+    def test_ollama_num_ctx(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            # Create a mock Response object for the show API call
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {
+                'capabilities': [],
+                'model_info': {'general.architecture': 'llama', 'llama.context_length': 131072}
+            }
+
+            # Create a mock Response object for the chat API call
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [
+                json.dumps({'message': {'content': 'Hi'}}).encode('utf-8') + b'\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response, mock_chat_response]
+
+            # A 30,000 character prompt is about 10,000 tokens - plus the response tokens
+            message = 'x' * 30000
+            main(['-m', message, '--api', 'ollama', 'model-name', '-s', '', '--maxtok', '1000'])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        self.assertEqual(
+            mock_pool_manager_instance.request.call_args_list[1],
+            unittest.mock.call(
+                'POST',
+                'http://127.0.0.1:11434/api/chat',
+                headers={'Content-Type': 'application/json'},
+                body=JSONBody({
+                    'model': 'model-name',
+                    'messages': [
+                        {'role': 'user', 'content': message}
+                    ],
+                    'stream': True,
+                    'think': False,
+                    'options': {'num_predict': 1000, 'num_ctx': 16384}
+                }),
+                preload_content=False,
+                retries=0
+            )
+        )
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_num_ctx_max(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            # Create a mock Response object for the show API call
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {
+                'capabilities': [],
+                'model_info': {'general.architecture': 'llama', 'llama.context_length': 12000}
+            }
+
+            # Create a mock Response object for the chat API call
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [
+                json.dumps({'message': {'content': 'Hi'}}).encode('utf-8') + b'\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response, mock_chat_response]
+
+            message = 'x' * 30000
+            main(['-m', message, '--api', 'ollama', 'model-name', '-s', ''])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        self.assertEqual(
+            mock_pool_manager_instance.request.call_args_list[1].kwargs['body'],
+            JSONBody({
+                'model': 'model-name',
+                'messages': [
+                    {'role': 'user', 'content': message}
+                ],
+                'stream': True,
+                'think': False,
+                'options': {'num_ctx': 12000}
+            })
+        )
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_num_ctx_exceeded(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            # Create a mock Response object for the show API call
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {
+                'capabilities': [],
+                'model_info': {'general.architecture': 'llama', 'llama.context_length': 8192}
+            }
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response]
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'x' * 30000, '--api', 'ollama', 'model-name', '-s', ''])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 1)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(
+            stderr.getvalue(),
+            '\nError: Prompt of about 10,000 tokens exceeds the model "model-name" context length of 8,192 tokens\n'
+        )
+
+
     def test_ollama_chat_error(self):
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch.dict('os.environ', {}, clear=True), \
@@ -771,20 +923,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -814,8 +968,8 @@ class TestOllama(unittest.TestCase):
             mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_chat_response.status = 200
             mock_chat_response.read_chunked.return_value = [
-                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8'),
-                json.dumps({'error': 'BOOM!'}).encode('utf-8')
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n',
+                json.dumps({'error': 'BOOM!'}).encode('utf-8') + b'\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -833,20 +987,22 @@ class TestOllama(unittest.TestCase):
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/show',
-                    json={'model': 'model-name'},
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
                     retries=0
                 ),
                 unittest.mock.call(
                     'POST',
                     'http://127.0.0.1:11434/api/chat',
-                    json={
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
                         'model': 'model-name',
                         'messages': [
                             {'role': 'user', 'content': 'Hello'}
                         ],
                         'stream': True,
                         'think': False
-                    },
+                    }),
                     preload_content=False,
                     retries=0
                 )
@@ -903,6 +1059,71 @@ class TestOllama(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), '')
 
 
+    def test_ollama_byte_chunking(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            # Create a mock Response object for the show API call
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {'capabilities': []}
+
+            # An NDJSON stream with blank lines and an unterminated final line, delivered one byte
+            # at a time (multi-byte codepoints split across chunks)
+            ndjson = (
+                json.dumps({'message': {'content': 'Café '}}, ensure_ascii=False) + '\n\n' +
+                json.dumps({'message': {'content': 'au '}}) + '\r\n' +
+                json.dumps({'message': {'content': 'lait'}})
+            ).encode('utf-8')
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [ndjson[ix:ix + 1] for ix in range(len(ndjson))]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response, mock_chat_response]
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+
+        mock_chat_response.close.assert_called_once_with()
+        self.assertEqual(stdout.getvalue(), 'Café au lait\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_invalid_line(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            # Create a mock Response object for the show API call
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {'capabilities': []}
+
+            # A malformed line in the middle of the stream
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [
+                json.dumps({'message': {'content': 'Hi '}}).encode('utf-8') + b'\n{"message": \n',
+                json.dumps({'message': {'content': 'there!'}}).encode('utf-8') + b'\n'
+            ]
+
+            # Configure the mock PoolManager instance
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response, mock_chat_response]
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        mock_chat_response.close.assert_called_once_with()
+        self.assertEqual(stdout.getvalue(), 'Hi ')
+        self.assertEqual(stderr.getvalue(), '\nError: Invalid streamed response: \'{"message":\'\n')
+
+
     def test_ollama_truncated_stream(self):
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch.dict('os.environ', {}, clear=True), \
@@ -939,6 +1160,239 @@ class TestOllama(unittest.TestCase):
         self.assertEqual(stderr.getvalue(), f'\nError: Invalid streamed response: {truncated.decode("utf-8")!r}\n')
 
 
+
+    def test_ollama_model_cache(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api.ollama.time.time') as mock_time, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            def mock_json_response(data):
+                mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_response.status = 200
+                mock_response.json.return_value = data
+                return mock_response
+
+            def mock_chat_response():
+                mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_response.status = 200
+                mock_response.read_chunked.return_value = [b'{"message": {"content": "Hi"}}\n']
+                return mock_response
+
+            show_data = {
+                'capabilities': ['completion', 'thinking'],
+                'modified_at': '2026-01-01T00:00:00Z',
+                'model_info': {'general.architecture': 'qwen3', 'qwen3.context_length': 40960}
+            }
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                # Call 1 - model information is shown and cached
+                mock_json_response(show_data),
+                mock_chat_response(),
+                # Call 2 - within the TTL
+                mock_chat_response(),
+                # Call 3 - revalidated by modification time
+                mock_json_response({'models': [{'name': 'model-name:latest', 'modified_at': '2026-01-01T00:00:00Z', 'digest': 'abc'}]}),
+                mock_chat_response(),
+                # Call 4 - revalidated by digest, which changed
+                mock_json_response({'models': [{'name': 'model-name:latest', 'modified_at': '2026-02-01T00:00:00Z', 'digest': 'def'}]}),
+                mock_json_response(show_data),
+                mock_chat_response()
+            ]
+
+            mock_time.return_value = 1000.0
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+            mock_time.return_value = 1100.0
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+            mock_time.return_value = 2000.0
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+            with open(os.path.join(temp_dir, 'ollama-models.json'), 'r', encoding='utf-8') as index_file:
+                self.assertDictEqual(json.load(index_file), {
+                    'http://127.0.0.1:11434 model-name': {
+                        'capabilities': ['completion', 'thinking'],
+                        'context_length': 40960,
+                        'modified_at': '2026-01-01T00:00:00Z',
+                        'digest': 'abc',
+                        'checked': 2000.0
+                    }
+                })
+            mock_time.return_value = 3000.0
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+            with open(os.path.join(temp_dir, 'ollama-models.json'), 'r', encoding='utf-8') as index_file:
+                self.assertDictEqual(json.load(index_file), {
+                    'http://127.0.0.1:11434 model-name': {
+                        'capabilities': ['completion', 'thinking'],
+                        'context_length': 40960,
+                        'modified_at': '2026-01-01T00:00:00Z',
+                        'digest': None,
+                        'checked': 3000.0
+                    }
+                })
+
+        self.assertListEqual(
+            [(request_call.args[0], request_call.args[1]) for request_call in mock_pool_manager_instance.request.call_args_list],
+            [
+                ('POST', 'http://127.0.0.1:11434/api/show'),
+                ('POST', 'http://127.0.0.1:11434/api/chat'),
+                ('POST', 'http://127.0.0.1:11434/api/chat'),
+                ('GET', 'http://127.0.0.1:11434/api/tags'),
+                ('POST', 'http://127.0.0.1:11434/api/chat'),
+                ('GET', 'http://127.0.0.1:11434/api/tags'),
+                ('POST', 'http://127.0.0.1:11434/api/show'),
+                ('POST', 'http://127.0.0.1:11434/api/chat')
+            ]
+        )
+        self.assertEqual(
+            mock_pool_manager_instance.request.call_args_list[2].kwargs['body'],
+            JSONBody({'model': 'model-name', 'messages': [{'role': 'user', 'content': 'Hello'}], 'stream': True, 'think': True})
+        )
+        self.assertEqual(stdout.getvalue(), 'Hi\nHi\nHi\nHi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_model_cache_tags_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api.ollama.time.time', return_value=5000.0), \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with open(os.path.join(temp_dir, 'ollama-models.json'), 'w', encoding='utf-8') as index_file:
+                json.dump({
+                    'http://127.0.0.1:11434 model-name': {
+                        'capabilities': [], 'context_length': None, 'modified_at': None, 'digest': 'abc', 'checked': 1000.0
+                    }
+                }, index_file)
+
+            mock_tags_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_tags_response.status = 500
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {'capabilities': []}
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [b'{"message": {"content": "Hi"}}\n']
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_tags_response, mock_show_response, mock_chat_response]
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 3)
+        mock_tags_response.close.assert_called_once_with()
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_preload(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            def mock_request(*_args, **_kwargs):
+                mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_response.status = 200
+                mock_response.json.return_value = {'capabilities': []}
+                mock_response.read_chunked.return_value = [b'{"message": {"content": "Hi"}}\n']
+                return mock_response
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_request
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', '', '--preload', '--keep-alive', '30m'])
+
+        self.assertListEqual(
+            mock_pool_manager_instance.request.call_args_list,
+            [
+                unittest.mock.call(
+                    'POST',
+                    'http://127.0.0.1:11434/api/show',
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
+                    retries=0
+                ),
+                unittest.mock.call(
+                    'POST',
+                    'http://127.0.0.1:11434/api/generate',
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name', 'keep_alive': '30m'}),
+                    retries=0
+                ),
+                unittest.mock.call(
+                    'POST',
+                    'http://127.0.0.1:11434/api/show',
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({'model': 'model-name'}),
+                    retries=0
+                ),
+                unittest.mock.call(
+                    'POST',
+                    'http://127.0.0.1:11434/api/chat',
+                    headers={'Content-Type': 'application/json'},
+                    body=JSONBody({
+                        'model': 'model-name',
+                        'messages': [
+                            {'role': 'user', 'content': 'Hello'}
+                        ],
+                        'stream': True,
+                        'think': False,
+                        'keep_alive': '30m'
+                    }),
+                    preload_content=False,
+                    retries=0
+                )
+            ]
+        )
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_ollama_preload_error(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            def mock_request(_method, url, **_kwargs):
+                mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_response.status = 404 if url.endswith('/api/generate') else 200
+                mock_response.json.return_value = {'capabilities': []}
+                mock_response.read_chunked.return_value = [b'{"message": {"content": "Hi"}}\n']
+                return mock_response
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_request
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', '', '--preload', '--keep-alive', '-1'])
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 4)
+        self.assertEqual(mock_pool_manager_instance.request.call_args_list[3].kwargs['body'], JSONBody({
+            'model': 'model-name',
+            'messages': [
+                {'role': 'user', 'content': 'Hello'}
+            ],
+            'stream': True,
+            'think': False,
+            'keep_alive': -1
+        }))
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), 'Preload failed: Unknown model "model-name" (404)\n')
+
+
+    def test_ollama_preload_invalid_api(self):
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'claude', 'model-name', '--preload'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertTrue(stderr.getvalue().endswith('ctxkit: error: --preload is only supported by the ollama API\n'))
+
+
     def test_ollama_list(self):
         with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
              unittest.mock.patch.dict('os.environ', {}, clear=True), \
@@ -966,6 +1420,7 @@ class TestOllama(unittest.TestCase):
         mock_pool_manager_instance.request.assert_called_once_with(
             'GET',
             'http://127.0.0.1:11434/api/tags',
+            headers={'Accept-Encoding': 'gzip, deflate'},
             retries=0
         )
         mock_tags_response.close.assert_called_once()
@@ -1000,6 +1455,7 @@ qwen2.5:latest
         mock_pool_manager_instance.request.assert_called_once_with(
             'GET',
             'http://127.0.0.1:11434/api/tags',
+            headers={'Accept-Encoding': 'gzip, deflate'},
             retries=0
         )
         mock_tags_response.close.assert_called_once()
@@ -0,0 +1,255 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import base64
+import io
+import json
+import os
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._responses import get_response_hash, load_response, save_response
+from ctxkit.api.claude import ANTHROPIC_BATCHES_URL
+from ctxkit.main import main
+
+from .test_main import create_test_files
+
+
+# Helper to create a mock Grok chat response
+def _mock_grok_response(content, status=200):
+    mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    mock_response.status = status
+    mock_response.data = b''
+    mock_response.read_chunked.return_value = [
+        f'data: {json.dumps({"choices": [{"delta": {"content": content}}]})}\n\n'.encode('utf-8'),
+        b'data: [DONE]\n\n'
+    ]
+    return mock_response
+
+
+# Helper to create a mock JSON response
+def _mock_json_response(response_json):
+    mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    mock_response.status = 200
+    mock_response.json.return_value = response_json
+    return mock_response
+
+
+class TestAPIResponses(unittest.TestCase):
+
+    def test_response_cache(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir, 'XAI_API_KEY': 'XXXX'}, clear=True):
+            extract_path = os.path.join(temp_dir, 'a.txt')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                _mock_grok_response(f'<{extract_path}>\naaa\n</{extract_path}>'),
+                _mock_grok_response('Warm'),
+                _mock_grok_response('Other')
+            ]
+
+            # The second call replays the cached response, including its extracted files
+            for _ in range(2):
+                with open(extract_path, 'w', encoding='utf-8') as extract_file:
+                    extract_file.write('old')
+                with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                     unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                    main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '-e', '--response-cache', '--retries', '0'])
+
+                self.assertEqual(stdout.getvalue(), f'<{extract_path}>\naaa\n</{extract_path}>\n')
+                self.assertEqual(stderr.getvalue(), '')
+                with open(extract_path, 'r', encoding='utf-8') as extract_file:
+                    self.assertEqual(extract_file.read(), 'aaa\n')
+            self.assertEqual(mock_pool_manager_instance.request.call_count, 1)
+
+            # A different request is not cached
+            with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--temp', '0.5', '--response-cache', '--retries', '0'])
+
+            self.assertEqual(stdout.getvalue(), 'Warm\n')
+            self.assertEqual(stderr.getvalue(), '')
+            self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+
+            # The response cache is opt-in
+            with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--retries', '0'])
+
+            self.assertEqual(stdout.getvalue(), 'Other\n')
+            self.assertEqual(stderr.getvalue(), '')
+            self.assertEqual(mock_pool_manager_instance.request.call_count, 3)
+
+
+    def test_response_cache_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir, 'XAI_API_KEY': 'XXXX'}, clear=True):
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [_mock_grok_response('', status=500), _mock_grok_response('Hi')]
+
+            # The failed response is not cached
+            with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--response-cache', '--retries', '0'])
+
+            self.assertEqual(cm_exc.exception.code, 2)
+            self.assertEqual(stdout.getvalue(), '')
+            self.assertEqual(stderr.getvalue(), '\nError: xAI API failed with status 500\n')
+
+            with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--response-cache', '--retries', '0'])
+
+            self.assertEqual(stdout.getvalue(), 'Hi\n')
+            self.assertEqual(stderr.getvalue(), '')
+            self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+
+
+    def test_response_cache_write_error(self):
+        with create_test_files([
+                 ('cache/responses', 'not a directory')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': os.path.join(temp_dir, 'cache'), 'XAI_API_KEY': 'XXXX'}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            extract_path = os.path.join(temp_dir, 'a.txt')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = _mock_grok_response(f'<{extract_path}>\naaa\n</{extract_path}>')
+
+            # A cache write failure is not an error - the files are extracted
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '-e', '--response-cache', '--retries', '0'])
+
+            with open(extract_path, 'r', encoding='utf-8') as extract_file:
+                self.assertEqual(extract_file.read(), 'aaa\n')
+
+        self.assertEqual(stdout.getvalue(), f'<{extract_path}>\naaa\n</{extract_path}>\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_response_cache_batch_api(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir, 'ANTHROPIC_API_KEY': 'XXXX'}, clear=True), \
+             unittest.mock.patch('ctxkit.api._batch.time.sleep'):
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            output_path = os.path.join(temp_dir, 'two.txt')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write(json.dumps({'items': [{'message': 'One'}]}) + '\n')
+                batch_file.write(json.dumps({'items': [{'message': 'Two'}], 'output': output_path}) + '\n')
+
+            # The first job's response is cached
+            save_response(get_response_hash('claude', 'model-name', None, 'One', None, None, None, 'file'), 'Uno', 1)
+
+            results_url = f'{ANTHROPIC_BATCHES_URL}/batch-1/results'
+            results_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            results_response.status = 200
+            results_response.data = json.dumps({
+                'custom_id': 'request-0',
+                'result': {'type': 'succeeded', 'message': {'content': [{'type': 'text', 'text': 'Dos'}], 'stop_reason': 'end_turn'}}
+            }).encode('utf-8')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'in_progress'}),
+                _mock_json_response({'id': 'batch-1', 'processing_status': 'ended', 'results_url': results_url}),
+                results_response
+            ]
+
+            # Only the uncached job is submitted - the second run's jobs are both cached
+            for _ in range(2):
+                with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                     unittest.mock.patch('sys.stderr', io.StringIO()):
+                    main(['--batch', batch_path, '--batch-api', '--api', 'claude', 'model-name', '-s', '', '--response-cache'])
+
+                self.assertListEqual([json.loads(line)['status'] for line in stdout.getvalue().splitlines()], ['ok', 'ok'])
+                with open(output_path, 'r', encoding='utf-8') as output_file:
+                    self.assertEqual(output_file.read(), 'Dos\n')
+
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 3)
+        batch_json = json.loads(mock_pool_manager_instance.request.call_args_list[0].kwargs['body'])
+        self.assertListEqual([batch_request['params']['messages'][0]['content'] for batch_request in batch_json['requests']], ['Two'])
+
+
+    def test_response_cache_invalid_args(self):
+        for argv, message in (
+            (['-m', 'Hello', '--api', 'grok', 'model', '--api', 'grok', 'model2', '--race', '--response-cache'],
+             '--response-cache cannot be used with --race, --hedge, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--response-cache', '--replay', 'x.json'],
+             '--response-cache cannot be used with --race, --hedge, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--response-cache', '--response-cache-size', '0'],
+             '--response-cache-size must be at least 1')
+        ):
+            with self.subTest(argv=argv), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(argv)
+
+                self.assertEqual(cm_exc.exception.code, 2)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(f'ctxkit: error: {message}', stderr.getvalue())
+
+
+    def test_get_response_hash(self):
+        request = ('grok', 'model', 'System', 'Hello', None, None, None, 'file')
+        response_hash = get_response_hash(*request)
+        self.assertEqual(len(response_hash), 64)
+        self.assertEqual(get_response_hash('grok', 'model', 'System', [('message', 'Hello')], None, None, None, 'file'), response_hash)
+        for ix_part, part in enumerate(('gpt', 'model2', None, 'Hello2', 0.5, 0.9, 100, 'diff')):
+            with self.subTest(ix_part=ix_part):
+                changed_request = list(request)
+                changed_request[ix_part] = part
+                self.assertNotEqual(get_response_hash(*changed_request), response_hash)
+
+
+    def test_load_save_response(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True):
+            self.assertIsNone(load_response('a' * 64))
+            save_response('a' * 64, 'Hello', 1)
+            self.assertEqual(load_response('a' * 64), 'Hello')
+
+            # A corrupt entry is not cached
+            with open(os.path.join(temp_dir, 'responses', f'{"a" * 64}.zlib'), 'wb') as response_file:
+                response_file.write(b'corrupt')
+            self.assertIsNone(load_response('a' * 64))
+
+
+    def test_save_response_evict(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True):
+            # Incompressible responses of about 0.4 MB each, compressed
+            responses = [base64.b85encode(os.urandom(400 * 1024)).decode('ascii') for _ in range(3)]
+            responses_dir = os.path.join(temp_dir, 'responses')
+            save_response('a' * 64, responses[0], 1)
+            save_response('b' * 64, responses[1], 1)
+            os.utime(os.path.join(responses_dir, f'{"a" * 64}.zlib'), (1, 1))
+            os.utime(os.path.join(responses_dir, f'{"b" * 64}.zlib'), (2, 2))
+
+            # Loading an entry makes it the most recently used, so the least-recently used is evicted
+            self.assertTrue(load_response('a' * 64) == responses[0])
+            save_response('c' * 64, responses[2], 1)
+            self.assertTrue(load_response('a' * 64) == responses[0])
+            self.assertIsNone(load_response('b' * 64))
+            self.assertTrue(load_response('c' * 64) == responses[2])
+
+
+    def test_save_response_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_CACHE_DIR': temp_dir}, clear=True), \
+             unittest.mock.patch('os.replace', side_effect=PermissionError('Permission denied')):
+            # A cache write failure is not an error, and the temporary file is removed
+            save_response('a' * 64, 'Hello', 1)
+            self.assertIsNone(load_response('a' * 64))
+            self.assertListEqual(os.listdir(os.path.join(temp_dir, 'responses')), ['.lock'])
+
+
+    def test_response_cache_no_cache_dir(self):
+        with unittest.mock.patch.dict('os.environ', {}, clear=True):
+            save_response('a' * 64, 'Hello', 1)
+            self.assertIsNone(load_response('a' * 64))
@@ -0,0 +1,210 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import email.utils
+import io
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._retry import RetryPolicy, RetryPoolManager, _get_retry_after
+from ctxkit.main import main
+
+
+def _mock_response(status, headers=None, chunks=None):
+    response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    response.status = status
+    response.headers = urllib3.HTTPHeaderDict(headers or {})
+    response.data = b''
+    if chunks is not None:
+        response.read_chunked.return_value = chunks
+    return response
+
+
+_GROK_CHUNKS = [
+    b'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n',
+    b'data: [DONE]\n\n'
+]
+
+
+class TestRetry(unittest.TestCase):
+
+    def test_retry_status(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_429 = _mock_response(429, {'retry-after-ms': '1500', 'retry-after': '2'})
+            mock_200 = _mock_response(200, chunks=_GROK_CHUNKS)
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_429, mock_200]
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), 'API request failed with status 429 - retry 1 of 4 in 1.5 seconds\n')
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        mock_sleep.assert_called_once_with(1.5)
+        mock_429.close.assert_called_once_with()
+        mock_429.read_chunked.assert_not_called()
+
+
+    def test_retry_backoff(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('ctxkit.api._retry.random.uniform', side_effect=lambda low, high: high / 2) as mock_uniform, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                _mock_response(529),
+                urllib3.exceptions.MaxRetryError(None, '/', reason=urllib3.exceptions.NewConnectionError(None, 'refused')),
+                _mock_response(503),
+                _mock_response(200, chunks=_GROK_CHUNKS)
+            ]
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '''\
+API request failed with status 529 - retry 1 of 4 in 0.5 seconds
+API request failed with error: None: refused - retry 2 of 4 in 1.0 seconds
+API request failed with status 503 - retry 3 of 4 in 2.0 seconds
+''')
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 4)
+        self.assertListEqual(mock_uniform.call_args_list, [
+            unittest.mock.call(0, 1.0),
+            unittest.mock.call(0, 2.0),
+            unittest.mock.call(0, 4.0)
+        ])
+        self.assertListEqual(mock_sleep.call_args_list, [
+            unittest.mock.call(0.5),
+            unittest.mock.call(1.0),
+            unittest.mock.call(2.0)
+        ])
+
+
+    def test_retry_exhausted(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [
+                _mock_response(503, {'Retry-After': '3'}),
+                _mock_response(503, {'Retry-After': '3'})
+            ]
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--retries', '1'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '''\
+API request failed with status 503 - retry 1 of 1 in 3.0 seconds
+
+Error: xAI API failed with status 503
+''')
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        mock_sleep.assert_called_once_with(3.0)
+
+
+    def test_retry_none(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = _mock_response(429)
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--retries', '0'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '\nError: xAI API failed with status 429\n')
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 1)
+        mock_sleep.assert_not_called()
+
+
+    def test_retry_connection_error_exhausted(self):
+        pool_manager = unittest.mock.Mock()
+        pool_manager.request.side_effect = urllib3.exceptions.ProtocolError('Connection aborted')
+        with unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('ctxkit.api._retry.random.uniform', return_value=0.25), \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            retry_pool_manager = RetryPoolManager(pool_manager, RetryPolicy(2))
+            with self.assertRaises(urllib3.exceptions.ProtocolError):
+                retry_pool_manager.request('GET', 'https://example.com')
+
+        self.assertEqual(stderr.getvalue(), '''\
+API request failed with error: Connection aborted - retry 1 of 2 in 0.2 seconds
+API request failed with error: Connection aborted - retry 2 of 2 in 0.2 seconds
+''')
+        self.assertEqual(pool_manager.request.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+
+    def test_retry_budget(self):
+        pool_manager = unittest.mock.Mock()
+        pool_manager.request.side_effect = lambda *args, **kwargs: _mock_response(503, {'Retry-After': '1'})
+        policy = RetryPolicy(4, budget=3)
+        with unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep, \
+             unittest.mock.patch('sys.stderr', io.StringIO()):
+            retry_pool_manager = RetryPoolManager(pool_manager, policy)
+            self.assertEqual(retry_pool_manager.request('GET', 'https://example.com/a').status, 503)
+            self.assertEqual(retry_pool_manager.request('GET', 'https://example.com/b').status, 503)
+
+        # The first request spends the budget - the second is not retried
+        self.assertEqual(policy.budget, 0)
+        self.assertEqual(pool_manager.request.call_count, 5)
+        self.assertEqual(mock_sleep.call_count, 3)
+
+
+    def test_retry_status_not_retried(self):
+        pool_manager = unittest.mock.Mock()
+        mock_500 = _mock_response(500)
+        pool_manager.request.return_value = mock_500
+        with unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep:
+            retry_pool_manager = RetryPoolManager(pool_manager, RetryPolicy())
+            self.assertIs(retry_pool_manager.request('GET', 'https://example.com'), mock_500)
+        mock_500.close.assert_not_called()
+        mock_sleep.assert_not_called()
+
+
+    def test_retry_after_too_long(self):
+        pool_manager = unittest.mock.Mock()
+        mock_429 = _mock_response(429, {'Retry-After': '3600'})
+        pool_manager.request.return_value = mock_429
+        with unittest.mock.patch('ctxkit.api._retry.time.sleep') as mock_sleep:
+            retry_pool_manager = RetryPoolManager(pool_manager, RetryPolicy())
+            self.assertIs(retry_pool_manager.request('GET', 'https://example.com'), mock_429)
+        mock_sleep.assert_not_called()
+
+
+    def test_retry_getattr(self):
+        pool_manager = unittest.mock.Mock()
+        retry_pool_manager = RetryPoolManager(pool_manager, RetryPolicy())
+        retry_pool_manager.clear()
+        pool_manager.clear.assert_called_once_with()
+
+
+    def test_get_retry_after(self):
+        self.assertIsNone(_get_retry_after(_mock_response(429)))
+        self.assertEqual(_get_retry_after(_mock_response(429, {'Retry-After': '12'})), 12.0)
+        self.assertEqual(_get_retry_after(_mock_response(429, {'Retry-After': '-1'})), 0)
+        self.assertEqual(_get_retry_after(_mock_response(429, {'retry-after-ms': '250'})), 0.25)
+        self.assertEqual(_get_retry_after(_mock_response(429, {'retry-after-ms': 'bad', 'Retry-After': '2'})), 2.0)
+        self.assertIsNone(_get_retry_after(_mock_response(429, {'Retry-After': 'bad'})))
+
+        # HTTP date
+        with unittest.mock.patch('ctxkit.api._retry.time.time', return_value=1000000000.0):
+            retry_date = email.utils.formatdate(1000000030.0, usegmt=True)
+            self.assertEqual(_get_retry_after(_mock_response(429, {'Retry-After': retry_date})), 30.0)
+            retry_date = email.utils.formatdate(999999970.0, usegmt=True)
+            self.assertEqual(_get_retry_after(_mock_response(429, {'Retry-After': retry_date})), 0)
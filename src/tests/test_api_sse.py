@@ -0,0 +1,97 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._sse import SSEParser, iter_sse_events, iter_sse_messages
+
+
+class TestSSE(unittest.TestCase):
+
+    def test_iter_sse_messages(self):
+        self.assertListEqual(list(iter_sse_messages([
+            b'event: message_start\ndata: {"a": 1}\n\n',
+            b'data: {"b": 2}\n\n'
+        ])), [
+            ('message_start', b'{"a": 1}', ''),
+            ('message', b'{"b": 2}', '')
+        ])
+
+
+    def test_iter_sse_messages_multiline_data(self):
+        self.assertListEqual(list(iter_sse_messages([
+            b'data: first\ndata:second\ndata\n\n'
+        ])), [
+            ('message', b'first\nsecond\n', '')
+        ])
+
+
+    def test_iter_sse_messages_line_endings(self):
+        self.assertListEqual(list(iter_sse_messages([
+            b'data: crlf\r\n\r\ndata: cr\r\rdata: lf\n\n',
+            b'data: split\r',
+            b'\n\r',
+            b'\n'
+        ])), [
+            ('message', b'crlf', ''),
+            ('message', b'cr', ''),
+            ('message', b'lf', ''),
+            ('message', b'split', '')
+        ])
+
+
+    def test_iter_sse_messages_byte_chunks(self):
+        stream = b'event: delta\nid: 7\ndata: {"text": "caf\xc3\xa9"}\n\n'
+        self.assertListEqual(list(iter_sse_messages(stream[ix:ix + 1] for ix in range(len(stream)))), [
+            ('delta', b'{"text": "caf\xc3\xa9"}', '7')
+        ])
+
+
+    def test_iter_sse_messages_fields(self):
+        parser = SSEParser()
+        self.assertListEqual(parser.feed(b'\xef\xbb\xbf: comment\nretry: 1000\nretry: x\nunknown: 1\nid: 1\n'), [])
+        self.assertListEqual(parser.feed(b'event: first\n\n'), [])
+        self.assertListEqual(parser.feed(b'id: 2\0\ndata: a\n\nid\ndata: b\n\n'), [
+            ('message', b'a', '1'),
+            ('message', b'b', '')
+        ])
+        self.assertListEqual(parser.feed(b''), [])
+        self.assertListEqual(parser.close(), [])
+        self.assertEqual(parser.retry, 1000)
+
+
+    def test_iter_sse_messages_unterminated(self):
+        self.assertListEqual(list(iter_sse_messages([
+            b'data: first\n\n',
+            b'event: last\ndata: sec',
+            b'ond'
+        ])), [
+            ('message', b'first', ''),
+            ('last', b'second', '')
+        ])
+
+
+    def test_iter_sse_events(self):
+        response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+        response.read_chunked.return_value = [
+            b'event: ping\ndata:\n\n',
+            b'data: {"a": 1}\n\n',
+            b'data: [DONE]\n\n'
+        ]
+        self.assertListEqual(list(iter_sse_events(response)), [{'a': 1}, '[DONE]'])
+
+
+    def test_iter_sse_events_invalid(self):
+        response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+        response.read_chunked.return_value = [
+            b'data: {"a": 1}\n\n',
+            b'data: {"a":\n\n'
+        ]
+        events = iter_sse_events(response)
+        self.assertEqual(next(events), {'a': 1})
+        with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+            next(events)
+        self.assertEqual(str(cm_exc.exception), 'Invalid streamed event: \'{"a":\'')
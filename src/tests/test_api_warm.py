@@ -0,0 +1,166 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import http.server
+import io
+import threading
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.api._warm import warm_connection
+from ctxkit.api.claude import ANTHROPIC_URL
+from ctxkit.main import main
+
+
+class TestWarm(unittest.TestCase):
+
+    def test_warm_connection(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_connection_pool = mock_pool_manager.connection_from_url.return_value
+        mock_connection = mock_connection_pool._get_conn.return_value
+        mock_connection.is_connected = False
+
+        warm_connection(mock_pool_manager, 'https://example.com/v1/chat')
+
+        mock_pool_manager.connection_from_url.assert_called_once_with('https://example.com/v1/chat')
+        mock_connection.connect.assert_called_once_with()
+        mock_connection.close.assert_not_called()
+        mock_connection_pool._put_conn.assert_called_once_with(mock_connection)
+
+
+    def test_warm_connection_connected(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_connection_pool = mock_pool_manager.connection_from_url.return_value
+        mock_connection = mock_connection_pool._get_conn.return_value
+        mock_connection.is_connected = True
+
+        warm_connection(mock_pool_manager, 'https://example.com/v1/chat')
+
+        mock_connection.connect.assert_not_called()
+        mock_connection.close.assert_not_called()
+        mock_connection_pool._put_conn.assert_called_once_with(mock_connection)
+
+
+    def test_warm_connection_error(self):
+        mock_pool_manager = unittest.mock.Mock()
+        mock_connection_pool = mock_pool_manager.connection_from_url.return_value
+        mock_connection = mock_connection_pool._get_conn.return_value
+        mock_connection.is_connected = False
+        mock_connection.connect.side_effect = OSError('refused')
+
+        warm_connection(mock_pool_manager, 'https://example.com/v1/chat')
+
+        mock_connection.connect.assert_called_once_with()
+        mock_connection.close.assert_called_once_with()
+        mock_connection_pool._put_conn.assert_called_once_with(None)
+
+
+    def test_warm_connection_reused(self):
+        connection_count = 0
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                nonlocal connection_count
+                connection_count += 1
+                super().setup()
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'OK')
+
+            def log_message(self, format, *args): # pylint: disable=redefined-builtin
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/test'
+            pool_manager = urllib3.PoolManager()
+            warm_connection(pool_manager, url)
+            response = pool_manager.request('GET', url, retries=0)
+            self.assertEqual(response.data, b'OK')
+
+            # The connected pooled connection is reused
+            warm_connection(pool_manager, url)
+            response = pool_manager.request('GET', url, retries=0)
+            self.assertEqual(response.data, b'OK')
+            pool_manager.clear()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(connection_count, 1)
+
+
+    def test_warm_connection_main(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response.status = 200
+            mock_grok_response.read_chunked.return_value = [
+                b'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_grok_response
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+        # The connection is warmed before the chat request
+        method_names = [method_call[0] for method_call in mock_pool_manager_instance.method_calls]
+        self.assertEqual(method_names[0], 'connection_from_url')
+        self.assertEqual(method_names[-1], 'request')
+        mock_pool_manager_instance.connection_from_url.assert_called_once_with('https://api.x.ai/v1/chat/completions')
+        mock_connection_pool = mock_pool_manager_instance.connection_from_url.return_value
+        mock_connection_pool._put_conn.assert_called_once_with(mock_connection_pool._get_conn.return_value)
+
+
+    def test_warm_connection_main_claude(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'ANTHROPIC_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()), \
+             unittest.mock.patch('sys.stderr', io.StringIO()):
+            mock_claude_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_claude_response.status = 200
+            mock_claude_response.read_chunked.return_value = [
+                b'data: {"type": "content_block_delta", "delta": {"text": "Hi"}}\n\n',
+                b'data: {"type": "message_stop"}\n\n'
+            ]
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = mock_claude_response
+
+            main(['-m', 'Hello', '--api', 'claude', 'model-name', '-s', ''])
+
+        mock_pool_manager_instance.connection_from_url.assert_called_once_with(ANTHROPIC_URL)
+
+
+    def test_warm_connection_main_ollama(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()), \
+             unittest.mock.patch('sys.stderr', io.StringIO()):
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {'capabilities': []}
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [b'{"message": {"content": "Hi"}}\n']
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [mock_show_response, mock_chat_response]
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''])
+
+        # The local Ollama server's connection is not warmed
+        mock_pool_manager_instance.connection_from_url.assert_not_called()
@@ -0,0 +1,241 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import unittest
+import unittest.mock
+
+from ctxkit.config import fetch_text
+from ctxkit.main import main
+
+from .test_main import create_test_files, mock_grok_request
+
+
+# Helper to get a Grok chat request's response chunks - the request's last message, or a failed
+# request for the "Fail" message
+def _get_response_chunks(request):
+    content = request['messages'][-1]['content']
+    return None if content == 'Fail' else [content]
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_batch(self):
+        with create_test_files([
+                 ('a.txt', 'aaa'),
+                 ('system.txt', 'Be brief')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            a_path = os.path.join(temp_dir, 'a.txt')
+            system_path = os.path.join(temp_dir, 'system.txt')
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            output_one = os.path.join(temp_dir, 'out', 'one.txt')
+            output_two = os.path.join(temp_dir, 'out', 'two.txt')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write(json.dumps({
+                    'id': 'one',
+                    'items': [{'message': 'Hello {{name}}'}],
+                    'variables': {'name': 'one'},
+                    'output': output_one
+                }) + '\n')
+                batch_file.write('\n')
+                batch_file.write(json.dumps({
+                    'items': [{'file': a_path}, {'message': 'Two'}],
+                    'model': 'other-model',
+                    'system': '',
+                    'output': output_two
+                }) + '\n')
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks)
+
+            main(['--batch', batch_path, '--concurrency', '2', '--api', 'grok', 'model-name', '-s', system_path])
+
+            with open(output_one, 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), 'Hello one\n')
+            with open(output_two, 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), f'<{a_path}>\naaa\n</{a_path}>\n\nTwo\n')
+
+        mock_pool_manager.assert_called_once_with(maxsize=2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        request_bodies = sorted(
+            (json.loads(request_call.kwargs['body']) for request_call in mock_pool_manager_instance.request.call_args_list),
+            key=lambda request: request['model']
+        )
+        self.assertListEqual(request_bodies, [
+            {
+                'model': 'model-name',
+                'messages': [
+                    {'role': 'system', 'content': 'Be brief'},
+                    {'role': 'user', 'content': 'Hello one'}
+                ],
+                'stream': True
+            },
+            {
+                'model': 'other-model',
+                'messages': [
+                    {'role': 'user', 'content': f'<{a_path}>\naaa\n</{a_path}>\n\nTwo'}
+                ],
+                'stream': True
+            }
+        ])
+
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        for report in reports:
+            self.assertIsInstance(report.pop('total_ms'), float)
+        self.assertListEqual(reports, [
+            {'line': 1, 'id': 'one', 'status': 'ok'},
+            {'line': 3, 'status': 'ok'}
+        ])
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_batch_extract(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            extract_path = os.path.join(temp_dir, 'extract.txt')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write(json.dumps({
+                    'items': [{'message': f'<{extract_path}>\nbatch\n</{extract_path}>'}],
+                    'provider': 'grok',
+                    'model': 'model-name',
+                    'extract': True
+                }) + '\n')
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks)
+
+            main(['--batch', batch_path, '-s', ''])
+
+            with open(extract_path, 'r', encoding='utf-8') as extract_file:
+                self.assertEqual(extract_file.read(), 'batch\n')
+
+        mock_pool_manager.assert_called_once_with(maxsize=4)
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['status'], 'ok')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_batch_errors(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write('{"items": [{"message": "OK"}], "provider": "grok", "model": "model-name"}\n')
+                batch_file.write('{"items": [{"message": "Fail"}], "provider": "grok", "model": "model-name"}\n')
+                batch_file.write('{"items": [{"message": "Hello"}]}\n')
+                batch_file.write('{"items": [{"message": "Hello"}], "provider": "unknown", "model": "model-name"}\n')
+                batch_file.write('{"items": [{"message": "Hello"}], "provider": "claude", "model": "model-name"}\n')
+                batch_file.write('{"items": []}\n')
+                batch_file.write('not json\n')
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks)
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch', batch_path, '-s', '', '--retries', '0', '--context-cache', '60'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        for report in reports:
+            self.assertIsInstance(report.pop('total_ms'), float)
+        self.assertListEqual(reports[:5], [
+            {'line': 1, 'status': 'error', 'error': '--context-cache is only supported by the gemini API'},
+            {'line': 2, 'status': 'error', 'error': '--context-cache is only supported by the gemini API'},
+            {'line': 3, 'status': 'error', 'error': 'No API provider and model specified'},
+            {'line': 4, 'status': 'error', 'error': 'Unknown API provider "unknown"'},
+            {'line': 5, 'status': 'error', 'error': '--context-cache is only supported by the gemini API'}
+        ])
+        self.assertEqual(reports[5]['line'], 6)
+        self.assertEqual(reports[5]['status'], 'error')
+        self.assertEqual(reports[6]['line'], 7)
+        self.assertEqual(reports[6]['status'], 'error')
+        mock_pool_manager_instance.request.assert_not_called()
+        self.assertEqual(stderr.getvalue(), '\nError: 7 of 7 batch jobs failed\n')
+
+
+    def test_batch_api_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+            with open(batch_path, 'w', encoding='utf-8') as batch_file:
+                batch_file.write('{"items": [{"message": "OK"}]}\n')
+                batch_file.write('{"items": [{"message": "Fail"}]}\n')
+
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks)
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch', batch_path, '--api', 'grok', 'model-name', '-s', '', '--concurrency', '1'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        reports = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        for report in reports:
+            self.assertIsInstance(report.pop('total_ms'), float)
+        self.assertListEqual(reports, [
+            {'line': 1, 'status': 'ok'},
+            {'line': 2, 'status': 'error', 'error': 'xAI API failed with status 500'}
+        ])
+        self.assertEqual(stderr.getvalue(), '\nError: 1 of 2 batch jobs failed\n')
+
+
+    def test_batch_not_found(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            batch_path = os.path.join(temp_dir, 'jobs.jsonl')
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--batch', batch_path])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), f"\nError: [Errno 2] No such file or directory: '{batch_path}'\n")
+
+
+    def test_batch_invalid_args(self):
+        for argv, message in (
+            (['--batch', 'jobs.jsonl', '-m', 'Hello'], '--batch cannot be used with prompt items'),
+            (['--batch', 'jobs.jsonl', '-o', 'out.txt'], '--batch cannot be used with prompt items'),
+            (['--batch', 'jobs.jsonl', '--concurrency', '0'], '--concurrency must be at least 1')
+        ):
+            with self.subTest(argv=argv), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(argv)
+
+                self.assertEqual(cm_exc.exception.code, 2)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(f'ctxkit: error: {message}', stderr.getvalue())
+
+
+    def test_fetch_text_cache(self):
+        with create_test_files([
+                 ('a.txt', 'aaa')
+             ]) as temp_dir:
+            a_path = os.path.join(temp_dir, 'a.txt')
+            text_cache = {}
+            self.assertEqual(fetch_text(None, a_path, text_cache), 'aaa')
+            with open(a_path, 'w', encoding='utf-8') as a_file:
+                a_file.write('bbb')
+            self.assertEqual(fetch_text(None, a_path, text_cache), 'aaa')
+            self.assertEqual(fetch_text(None, a_path), 'bbb')
+            self.assertDictEqual(text_cache, {a_path: 'aaa'})
@@ -0,0 +1,237 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.cassette import ReplayPoolManager, redact_url
+from ctxkit.main import main
+
+from .test_main import create_test_files
+
+
+class TestCassette(unittest.TestCase):
+
+    def test_record_replay(self):
+        with create_test_files([]) as temp_dir:
+            cassette_path = os.path.join(temp_dir, 'cassette.json')
+
+            # Record the response
+            with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+                 unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+                mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_grok_response.status = 200
+                mock_grok_response.headers = urllib3.HTTPHeaderDict({'Content-Type': 'text/event-stream', 'Set-Cookie': 'X'})
+                mock_grok_response.read_chunked.return_value = [
+                    b'data: {"choices": [{"delta": {"content": "Good',
+                    b'bye"}}]}\n\n',
+                    b'data: [DONE]\n\n'
+                ]
+                mock_pool_manager_instance = mock_pool_manager.return_value
+                mock_pool_manager_instance.request.return_value = mock_grok_response
+
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--record', cassette_path])
+
+            mock_grok_response.close.assert_called_once_with()
+            self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+            self.assertEqual(stderr.getvalue(), '')
+
+            # Verify the cassette
+            with open(cassette_path, 'r', encoding='utf-8') as cassette_file:
+                cassette = json.load(cassette_file)
+            self.assertEqual(cassette['version'], 1)
+            self.assertEqual(len(cassette['interactions']), 1)
+            interaction = cassette['interactions'][0]
+            self.assertEqual(interaction['method'], 'POST')
+            self.assertEqual(interaction['url'], 'https://api.x.ai/v1/chat/completions')
+            self.assertEqual(interaction['status'], 200)
+            self.assertEqual(interaction['headers'], {'Content-Type': 'text/event-stream'})
+            self.assertIsInstance(interaction['elapsed'], float)
+            self.assertEqual(len(interaction['chunks']), 3)
+            self.assertNotIn('XXXX', json.dumps(cassette))
+
+            # Replay the response - no network access
+            with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+                 unittest.mock.patch('os.environ', {'XAI_API_KEY': 'YYYY'}), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--replay', cassette_path])
+
+            mock_pool_manager.return_value.request.assert_not_called()
+            self.assertEqual(stdout.getvalue(), 'Goodbye\n')
+            self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_record_replay_data(self):
+        with create_test_files([]) as temp_dir:
+            cassette_path = os.path.join(temp_dir, 'cassette.json')
+
+            # Record the error response
+            with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+                 unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'XXXX'}), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+                mock_models_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                mock_models_response.status = 500
+                mock_models_response.headers = urllib3.HTTPHeaderDict()
+                mock_models_response.data = b'{"error": "Server error occurred"}'
+                mock_pool_manager_instance = mock_pool_manager.return_value
+                mock_pool_manager_instance.request.return_value = mock_models_response
+
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(['--list', 'gemini', '--record', cassette_path])
+
+            self.assertEqual(cm_exc.exception.code, 2)
+            self.assertEqual(stdout.getvalue(), '')
+            self.assertEqual(stderr.getvalue(), '\nError: Gemini API failed with status 500: Server error occurred\n')
+
+            # Verify the cassette
+            with open(cassette_path, 'r', encoding='utf-8') as cassette_file:
+                cassette = json.load(cassette_file)
+            interaction = cassette['interactions'][0]
+            self.assertEqual(interaction['url'], 'https://generativelanguage.googleapis.com/v1beta/models?key=REDACTED')
+            self.assertIn('data', interaction)
+            self.assertNotIn('XXXX', json.dumps(cassette))
+
+            # Replay the error response
+            with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+                 unittest.mock.patch('os.environ', {'GOOGLE_API_KEY': 'YYYY'}), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(['--list', 'gemini', '--replay', cassette_path])
+
+            self.assertEqual(cm_exc.exception.code, 2)
+            mock_pool_manager.return_value.request.assert_not_called()
+            self.assertEqual(stdout.getvalue(), '')
+            self.assertEqual(stderr.getvalue(), '\nError: Gemini API failed with status 500: Server error occurred\n')
+
+
+    def test_record_replay_local_cache(self):
+        with create_test_files([
+                 ('test.txt', 'test text')
+             ]) as temp_dir:
+            test_path = os.path.join(temp_dir, 'test.txt')
+            cassette_path = os.path.join(temp_dir, 'cassette.json')
+            environ = {'GOOGLE_API_KEY': 'XXXX', 'CTXKIT_CACHE_DIR': os.path.join(temp_dir, 'cache')}
+
+            def mock_response(data=b'', chunks=()):
+                response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+                response.status = 200
+                response.headers = urllib3.HTTPHeaderDict()
+                response.data = data
+                response.json.return_value = json.loads(data) if data else None
+                response.read_chunked.return_value = list(chunks)
+                return response
+
+            def mock_ollama_responses():
+                return [
+                    mock_response(data=b'{"capabilities": ["completion"], "model_info": {}}'),
+                    mock_response(chunks=[b'{"message": {"content": "Hi"}}\n'])
+                ]
+
+            def mock_gemini_responses():
+                return [
+                    mock_response(data=b'{"name": "cachedContents/abc123"}'),
+                    mock_response(chunks=[b'data: {"candidates": [{"content": {"parts": [{"text": "Hi"}]}, "finishReason": "STOP"}]}\n\n'])
+                ]
+
+            # The local caches, warmed by the first run, are not used when recording or replaying
+            for argv, mock_responses in (
+                (['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', ''], mock_ollama_responses),
+                (['-f', test_path, '-m', 'Hello', '--api', 'gemini', 'model-name', '-s', '', '--context-cache', '600'],
+                 mock_gemini_responses)
+            ):
+                with self.subTest(argv=argv):
+                    for run_argv in (argv, [*argv, '--record', cassette_path], [*argv, '--replay', cassette_path]):
+                        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+                             unittest.mock.patch('os.environ', environ), \
+                             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                            mock_pool_manager.return_value.request.side_effect = mock_responses()
+
+                            main(run_argv)
+
+                        self.assertEqual(stdout.getvalue(), 'Hi\n')
+                        self.assertEqual(stderr.getvalue(), '')
+                        self.assertEqual(mock_pool_manager.return_value.request.call_count, 0 if '--replay' in run_argv else 2)
+
+
+    def test_replay_response(self):
+        pool_manager = ReplayPoolManager({'interactions': [
+            {'method': 'GET', 'url': 'http://test/models', 'status': 200, 'headers': {}, 'elapsed': 0.001,
+             'data': 'eyJtb2RlbHMiOiBbXX0='},
+            {'method': 'POST', 'url': 'http://test/chat', 'status': 200, 'headers': {'Content-Type': 'text/plain'}, 'elapsed': 0.001,
+             'chunks': [[0.002, 'SGVs'], [0.003, 'bG8=']]}
+        ]}, realtime=True)
+
+        response = pool_manager.request('GET', 'http://test/models')
+        self.assertEqual(response.json(), {'models': []})
+        response.release_conn()
+        response.close()
+
+        response = pool_manager.request(method='POST', url='http://test/chat', body=b'{}', preload_content=False)
+        self.assertEqual(response.headers['content-type'], 'text/plain')
+        self.assertEqual(list(response.read_chunked()), [b'Hel', b'lo'])
+        self.assertEqual(response.data, b'Hello')
+
+        with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+            pool_manager.request('GET', 'http://test/models')
+        self.assertEqual(str(cm_exc.exception), 'No recorded response for GET http://test/models')
+
+
+    def test_replay_mismatch(self):
+        pool_manager = ReplayPoolManager({'interactions': [
+            {'method': 'GET', 'url': 'http://test/models?key=REDACTED', 'status': 200, 'headers': {}, 'elapsed': 0, 'data': ''}
+        ]})
+        with self.assertRaises(urllib3.exceptions.HTTPError) as cm_exc:
+            pool_manager.request('POST', 'http://test/models?key=XXXX')
+        self.assertEqual(
+            str(cm_exc.exception),
+            'Recorded request GET http://test/models?key=REDACTED does not match POST http://test/models?key=REDACTED'
+        )
+
+
+    def test_replay_version(self):
+        with create_test_files([
+                 ('cassette.json', '{"version": 2, "interactions": []}')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager'), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            cassette_path = os.path.join(temp_dir, 'cassette.json')
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--list', 'ollama', '--replay', cassette_path])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), f'\nError: Unsupported cassette version, "{cassette_path}"\n')
+
+
+    def test_record_replay_exclusive(self):
+        with unittest.mock.patch('urllib3.PoolManager'), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--list', 'ollama', '--record', 'a.json', '--replay', 'b.json'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertTrue(stderr.getvalue().endswith('error: --record and --replay cannot be used together\n'))
+
+
+    def test_redact_url(self):
+        self.assertEqual(redact_url('https://test/models?key=XXXX&alt=sse'), 'https://test/models?key=REDACTED&alt=sse')
+        self.assertEqual(redact_url('https://test/models?alt=sse&api_key=XXXX'), 'https://test/models?alt=sse&api_key=REDACTED')
+        self.assertEqual(redact_url('https://test/models?monkey=1'), 'https://test/models?monkey=1')
@@ -0,0 +1,120 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import random
+import re
+import unittest
+
+from ctxkit.extract import FileExtractor, get_file_spans
+
+
+# The original file tag regex - the extractor must match its results
+_R_FILENAME_TAG = re.compile(r'^<([^<>]+)>\n(.*?)\n</\1>', re.DOTALL | re.MULTILINE)
+
+
+def _regex_files(response):
+    files = []
+    search_pos = 0
+    while True:
+        match = _R_FILENAME_TAG.search(response, search_pos)
+        if not match:
+            break
+        files.append((match.group(1), match.group(2).strip()))
+        search_pos = match.end()
+    return files
+
+
+def _extractor_files(chunks):
+    extractor = FileExtractor()
+    files = []
+    for chunk in chunks:
+        files.extend(extractor.feed(chunk))
+    files.extend(extractor.close())
+    return files
+
+
+class TestFileExtractor(unittest.TestCase):
+
+    def test_extractor(self):
+        response = '''\
+Here are the files:
+
+<a.py>
+print('a')
+</a.py>
+
+<b.html>
+<html>
+<body>
+</body>
+</html>
+</b.html>
+Done.'''
+        self.assertListEqual(_extractor_files([response]), [
+            ('a.py', "print('a')"),
+            ('b.html', '<html>\n<body>\n</body>\n</html>')
+        ])
+
+
+    def test_extractor_streamed(self):
+        extractor = FileExtractor()
+        self.assertListEqual(extractor.feed('<a.py>\nprint('), [])
+        self.assertListEqual(extractor.feed("'a')\n</a"), [])
+        self.assertListEqual(extractor.feed('.py>\n<b.py>\n'), [('a.py', "print('a')")])
+        self.assertListEqual(extractor.feed('b\n'), [])
+        self.assertListEqual(extractor.feed(''), [])
+        self.assertListEqual(extractor.close(), [])
+
+
+    def test_extractor_unclosed(self):
+        response = '''\
+<div>
+Some explanation
+<a.py>
+a
+</a.py>
+<b.py>
+</b.py>
+b
+</b.py>
+<c.py>
+c'''
+        self.assertListEqual(_extractor_files([response]), [('a.py', 'a'), ('b.py', '</b.py>\nb')])
+        self.assertListEqual(_regex_files(response), [('a.py', 'a'), ('b.py', '</b.py>\nb')])
+
+
+    def test_extractor_unterminated_close(self):
+        self.assertListEqual(_extractor_files(['<a.py>\n\n</a.py>']), [('a.py', '')])
+
+
+    def test_get_file_spans(self):
+        self.assertListEqual(
+            get_file_spans('Intro\n<a.py>\n<b.py>\nb\n</b.py>\n</a.py>\n<c.py>\n</c.py>\nc\n</c.py>\n<d.py>\nDone'),
+            [('a.py', 1, 5), ('c.py', 6, 9)]
+        )
+        self.assertListEqual(get_file_spans(''), [])
+
+
+    def test_extractor_regex_equivalence(self):
+        rng = random.Random(42)
+        line_choices = ['<a>', '<b>', '</a>', '</b>', '</a> trailing', '<//a>', '</a', '<a<b>', 'text', '', ' <a>', '<>']
+        for _ in range(2000):
+            response = '\n'.join(rng.choice(line_choices) for _ in range(rng.randint(0, 12)))
+            if rng.random() < 0.5:
+                response += '\n'
+            chunks = []
+            pos = 0
+            while pos < len(response):
+                size = rng.randint(1, 8)
+                chunks.append(response[pos:pos + size])
+                pos += size
+            with self.subTest(response=response):
+                self.assertListEqual(_extractor_files(chunks), _regex_files(response))
+
+                # The file spans match the extracted files
+                lines = response.split('\n')
+                span_files = [
+                    (name, '\n'.join(lines[open_index + 1:close_index]).strip())
+                    for name, open_index, close_index in get_file_spans(response)
+                ]
+                self.assertListEqual(span_files, _regex_files(response))
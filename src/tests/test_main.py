@@ -6,6 +6,7 @@ import io
 import json
 import os
 from tempfile import TemporaryDirectory
+import threading
 import unittest
 import unittest.mock
 
@@ -33,6 +34,56 @@ def create_test_files(file_defs):
         tempdir.cleanup()
 
 
+# Helper to create a mock PoolManager request function that responds to Grok chat requests -
+# response_chunks maps a model name to its response chunk strings, or is a function that returns a
+# request body's response chunk strings. None response chunks is a failed request. A threading.Event
+# response chunk waits on the event, and a float response chunk waits that many seconds. Shutting down a
+# response sets its events. If provided, model_responses maps each model name to its mock response.
+def mock_grok_request(response_chunks, model_responses=None):
+    def mock_request(**kwargs):
+        request = json.loads(kwargs['body'])
+        model = request['model']
+        chunks = response_chunks(request) if callable(response_chunks) else response_chunks[model]
+        mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+        if model_responses is not None:
+            model_responses[model] = mock_response
+        if chunks is None:
+            mock_response.status = 500
+            mock_response.data = b''
+            return mock_response
+
+        def read_chunked():
+            for chunk in chunks:
+                if isinstance(chunk, threading.Event):
+                    chunk.wait()
+                elif isinstance(chunk, float):
+                    threading.Event().wait(chunk)
+                else:
+                    yield f'data: {json.dumps({"choices": [{"delta": {"content": chunk}}]})}\n\n'.encode('utf-8')
+            yield b'data: [DONE]\n\n'
+
+        mock_response.status = 200
+        mock_response.read_chunked.side_effect = read_chunked
+        mock_response.shutdown.side_effect = lambda: [chunk.set() for chunk in chunks if isinstance(chunk, threading.Event)]
+        return mock_response
+
+    return mock_request
+
+
+# Helper to compare a JSON-encoded request body with its expected value
+class JSONBody:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, bytes) and json.loads(other) == self.value
+
+    def __repr__(self):
+        return f'JSONBody({self.value!r})'
+
+
 class TestMain(unittest.TestCase):
 
     def test_main_submodule(self):
@@ -281,8 +332,8 @@ Hello
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -313,13 +364,13 @@ Hello
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -355,8 +406,8 @@ File
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -387,13 +438,13 @@ File
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -428,8 +479,8 @@ ctxkit: delete
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -454,13 +505,13 @@ ctxkit: delete
                 'Content-Type': 'application/json',
                 'Accept': 'text/event-stream'
             },
-            json={
+            body=JSONBody({
                 'model': 'model-name',
                 'messages': [
                     {'role': 'user', 'content': 'Hello'}
                 ],
                 'stream': True
-            },
+            }),
             preload_content=False,
             retries=0
         )
@@ -496,8 +547,8 @@ ctxkit: delete
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -537,8 +588,8 @@ ctxkit: delete
             mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
             mock_grok_response.status = 200
             mock_grok_response.read_chunked.return_value = [
-                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}',
-                b'data: [DONE]'
+                b'data: {"choices": [{"delta": {"content": ' + json.dumps(response).encode('utf-8') + b'}}]}\n\n',
+                b'data: [DONE]\n\n'
             ]
 
             # Configure the mock PoolManager instance
@@ -0,0 +1,349 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import socket
+import threading
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.client import main as client_main
+from ctxkit.main import main
+from ctxkit.server import FileTextCache, _ClientStdin, create_server
+
+from .test_main import create_test_files
+
+
+# Helper context manager to run a ctxkit server on a temporary Unix socket
+class _TestServer:
+
+    def __init__(self, temp_dir):
+        self.socket_path = os.path.join(temp_dir, 'ctxkit.sock')
+        self.server = None
+        self.thread = None
+
+
+    def __enter__(self):
+        self.server = create_server(self.socket_path, main)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+# Helper to create a mock Grok chat response
+def _mock_grok_response(content):
+    mock_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+    mock_response.status = 200
+    mock_response.read_chunked.return_value = [
+        f'data: {json.dumps({"choices": [{"delta": {"content": content}}]})}\n\n'.encode('utf-8'),
+        b'data: [DONE]\n\n'
+    ]
+    return mock_response
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+class TestServer(unittest.TestCase):
+
+    def test_server(self):
+        with create_test_files([
+                 ('a.txt', 'aaa')
+             ]) as temp_dir, \
+             _TestServer(temp_dir) as test_server, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': test_server.socket_path, 'XAI_API_KEY': 'XXXX'}, clear=True):
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = [_mock_grok_response('Hi'), _mock_grok_response('Bye')]
+
+            # The request is run in the client's working directory
+            cwd = os.getcwd()
+            try:
+                os.chdir(temp_dir)
+                for expected_output in ('Hi\n', 'Bye\n'):
+                    with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                         unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                        with self.assertRaises(SystemExit) as cm_exc:
+                            client_main(['-f', 'a.txt', '--api', 'grok', 'model-name', '-s', ''])
+
+                    self.assertEqual(cm_exc.exception.code, 0)
+                    self.assertEqual(stdout.getvalue(), expected_output)
+                    self.assertEqual(stderr.getvalue(), '')
+            finally:
+                os.chdir(cwd)
+
+        # The PoolManager is reused across requests
+        mock_pool_manager.assert_called_once_with()
+        self.assertEqual(mock_pool_manager_instance.request.call_count, 2)
+        for request_call in mock_pool_manager_instance.request.call_args_list:
+            self.assertEqual(
+                json.loads(request_call.kwargs['body'])['messages'],
+                [{'role': 'user', 'content': '<a.txt>\naaa\n</a.txt>'}]
+            )
+
+
+    def test_server_stdin(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': test_server.socket_path, 'XAI_API_KEY': 'XXXX'}, clear=True), \
+             unittest.mock.patch('sys.stdin', io.StringIO('Hello stdin')), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.return_value = _mock_grok_response('Hi')
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                client_main(['--api', 'grok', 'model-name', '-s', ''])
+
+        self.assertEqual(cm_exc.exception.code, 0)
+        self.assertEqual(stdout.getvalue(), 'Hi\n')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertEqual(
+            json.loads(mock_pool_manager_instance.request.call_args.kwargs['body'])['messages'],
+            [{'role': 'user', 'content': 'Hello stdin'}]
+        )
+
+
+    def test_server_flags(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server, \
+             unittest.mock.patch('urllib3.PoolManager'), \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': test_server.socket_path}, clear=True):
+
+            # The client's CTXKIT_FLAGS are used
+            with unittest.mock.patch.dict('os.environ', {'CTXKIT_FLAGS': '-m First'}), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    client_main(['-m', 'Hello', '-s', ''])
+
+        self.assertEqual(cm_exc.exception.code, 0)
+        self.assertEqual(stdout.getvalue(), 'First\n\nHello\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_server_error(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server, \
+             unittest.mock.patch('urllib3.PoolManager'), \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': test_server.socket_path}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                client_main(['-f', 'missing.txt', '-s', ''])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), "\nError: [Errno 2] No such file or directory: 'missing.txt'\n")
+
+
+    def test_server_serve_request(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server, \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': test_server.socket_path}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+                client_socket.connect(test_server.socket_path)
+                with client_socket.makefile('rwb') as client_file:
+                    client_file.write(json.dumps({'argv': ['--serve', 'other.sock'], 'cwd': temp_dir}).encode('utf-8') + b'\n')
+                    client_file.flush()
+                    messages = [json.loads(line) for line in client_file]
+
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '')
+        self.assertEqual(messages[-1], {'exit': 2})
+        self.assertIn(
+            'ctxkit: error: --serve cannot be used by a ctxkit server request',
+            ''.join(message.get('stderr', '') for message in messages)
+        )
+
+
+    def test_client_no_server(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager'), \
+             unittest.mock.patch.dict('os.environ', {'CTXKIT_SERVER': os.path.join(temp_dir, 'ctxkit.sock')}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            client_main(['-m', 'Hello', '-s', ''])
+
+        self.assertEqual(stdout.getvalue(), 'Hello\n')
+        self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_create_server_running(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server:
+            with self.assertRaises(OSError) as cm_exc:
+                create_server(test_server.socket_path, main)
+
+        self.assertEqual(str(cm_exc.exception), f'ctxkit server is already running, "{test_server.socket_path}"')
+
+
+    def test_create_server_permissions(self):
+        with create_test_files([]) as temp_dir, \
+             _TestServer(temp_dir) as test_server:
+            self.assertEqual(os.stat(test_server.socket_path).st_mode & 0o777, 0o600)
+
+
+    def test_create_server_umask(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('ctxkit.server.socketserver.ThreadingUnixStreamServer') as mock_server:
+            socket_path = os.path.join(temp_dir, 'ctxkit.sock')
+            bind_umasks = []
+
+            # The socket is created with a restrictive umask, and the umask is restored
+            def mock_create_server(*_args):
+                umask = os.umask(0)
+                os.umask(umask)
+                bind_umasks.append(umask)
+                with open(socket_path, 'w', encoding='utf-8'):
+                    pass
+                return mock_server.return_value
+
+            mock_server.side_effect = mock_create_server
+            umask = os.umask(0o022)
+            try:
+                self.assertIs(create_server(socket_path, main), mock_server.return_value)
+                self.assertEqual(os.umask(0o022), 0o022)
+            finally:
+                os.umask(umask)
+
+        self.assertListEqual(bind_umasks, [0o077])
+
+
+    def test_create_server_stale(self):
+        with create_test_files([
+                 ('ctxkit.sock', '')
+             ]) as temp_dir:
+            socket_path = os.path.join(temp_dir, 'ctxkit.sock')
+            server = create_server(socket_path, main)
+            server.server_close()
+
+
+    def test_serve(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('ctxkit.server.socketserver.ThreadingUnixStreamServer') as mock_server, \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            socket_path = os.path.join(temp_dir, 'ctxkit.sock')
+            mock_server_instance = mock_server.return_value
+
+            # The server creates the socket file and runs until interrupted
+            def mock_create_server(*_args):
+                with open(socket_path, 'w', encoding='utf-8'):
+                    pass
+                return mock_server_instance
+
+            mock_server.side_effect = mock_create_server
+            mock_server_instance.serve_forever.side_effect = KeyboardInterrupt()
+
+            main(['--serve', socket_path])
+
+            self.assertFalse(os.path.exists(socket_path))
+
+        mock_server_instance.server_close.assert_called_once_with()
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), f'ctxkit server listening on "{socket_path}"\n')
+
+
+    def test_serve_invalid_args(self):
+        with unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['--serve', 'ctxkit.sock', '-m', 'Hello'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertIn('ctxkit: error: --serve cannot be used with prompt items, --api, --list, or --batch', stderr.getvalue())
+
+
+class TestClientStdin(unittest.TestCase):
+
+    def test_client_stdin(self):
+        mock_client = unittest.mock.Mock()
+        mock_client.receive.return_value = {'stdin': 'Hello stdin'}
+        stdin = _ClientStdin(mock_client)
+
+        # The client's stdin is requested once, on the first read
+        self.assertEqual(stdin.read(5), 'Hello')
+        self.assertEqual(stdin.read(1), ' ')
+        self.assertEqual(stdin.read(), 'stdin')
+        self.assertEqual(stdin.read(), '')
+        mock_client.send.assert_called_once_with({'stdin': True})
+        mock_client.receive.assert_called_once_with()
+
+
+class TestFileTextCache(unittest.TestCase):
+
+    def test_file_text_cache(self):
+        with create_test_files([
+                 ('a.txt', 'aaa')
+             ]) as temp_dir:
+            a_path = os.path.join(temp_dir, 'a.txt')
+            text_cache = FileTextCache()
+            self.assertIsNone(text_cache.get(a_path))
+            text_cache[a_path] = 'aaa'
+            self.assertEqual(text_cache.get(a_path), 'aaa')
+
+            # A modified file is not cached
+            with open(a_path, 'w', encoding='utf-8') as a_file:
+                a_file.write('bbbb')
+            self.assertIsNone(text_cache.get(a_path))
+            text_cache[a_path] = 'bbbb'
+            self.assertEqual(text_cache.get(a_path), 'bbbb')
+
+            # A deleted file is not cached
+            os.remove(a_path)
+            self.assertIsNone(text_cache.get(a_path))
+
+            # URLs are not cached
+            text_cache['https://example.com/a.txt'] = 'aaa'
+            self.assertIsNone(text_cache.get('https://example.com/a.txt'))
+
+
+    def test_file_text_cache_size(self):
+        with create_test_files([
+                 ('a.txt', 'aaa'),
+                 ('b.txt', 'bbb'),
+                 ('c.txt', 'ccc'),
+                 ('d.txt', 'ddddddd')
+             ]) as temp_dir:
+            a_path, b_path, c_path, d_path = (os.path.join(temp_dir, f'{name}.txt') for name in ('a', 'b', 'c', 'd'))
+            text_cache = FileTextCache(max_size=6)
+            for path, text in ((a_path, 'aaa'), (b_path, 'bbb')):
+                self.assertIsNone(text_cache.get(path))
+                text_cache[path] = text
+
+            # The least-recently used text is discarded
+            self.assertEqual(text_cache.get(a_path), 'aaa')
+            self.assertIsNone(text_cache.get(c_path))
+            text_cache[c_path] = 'ccc'
+            self.assertEqual(text_cache.get(a_path), 'aaa')
+            self.assertIsNone(text_cache.get(b_path))
+            self.assertEqual(text_cache.get(c_path), 'ccc')
+
+            # Text larger than the cache is not cached
+            self.assertIsNone(text_cache.get(d_path))
+            text_cache[d_path] = 'ddddddd'
+            self.assertIsNone(text_cache.get(d_path))
+            self.assertEqual(text_cache.get(a_path), 'aaa')
+            self.assertEqual(text_cache.get(c_path), 'ccc')
+
+            # A deleted file's text is discarded, so it doesn't displace other text
+            self.assertEqual(text_cache.get(a_path), 'aaa')
+            os.remove(a_path)
+            self.assertIsNone(text_cache.get(a_path))
+            self.assertIsNone(text_cache.get(b_path))
+            text_cache[b_path] = 'bbb'
+            self.assertEqual(text_cache.get(c_path), 'ccc')
+            self.assertEqual(text_cache.get(b_path), 'bbb')
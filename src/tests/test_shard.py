@@ -0,0 +1,231 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import os
+import re
+import unittest
+import unittest.mock
+
+from ctxkit.api._prompt import split_prompt_shards
+from ctxkit.main import main
+from ctxkit.shard import DEFAULT_REDUCE, _omit_files
+
+from .test_main import create_test_files, mock_grok_request
+
+
+# Helper to create a function that returns a Grok chat request's response chunks - a shard prompt's
+# response is its files, upper-cased, and a reduce prompt's response is "Reduced". Each request's prompt
+# is appended to the prompts list. A shard prompt with the fail file fails.
+def _get_response_chunks(prompts, fail_file=None):
+    def get_response_chunks(request):
+        content = request['messages'][-1]['content']
+        prompts.append(content)
+        if fail_file is not None and fail_file in content:
+            return None
+        if '<response>' in content:
+            return ['Reduced']
+        return ['\n'.join(
+            f'<{match.group(1)}>\n{match.group(2).upper()}\n</{match.group(1)}>'
+            for match in _R_FILE.finditer(content)
+        )]
+
+    return get_response_chunks
+
+
+_R_FILE = re.compile(r'<(\S+)>\n(\w+)\n</\1>')
+
+
+class TestShard(unittest.TestCase):
+
+    def test_shard(self):
+        with create_test_files([
+                 ('a.txt', 'a' * 300),
+                 ('b.txt', 'b' * 300),
+                 ('c.txt', 'c' * 300)
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            prompts = []
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks(prompts))
+
+            main(['-d', temp_dir, '-x', 'txt', '-m', 'Review', '--api', 'grok', 'model-name', '-s', '', '-e', '--shard', '300'])
+
+            # The shard responses' files are extracted
+            for name in ('a', 'b', 'c'):
+                with open(os.path.join(temp_dir, f'{name}.txt'), 'r', encoding='utf-8') as extract_file:
+                    self.assertEqual(extract_file.read(), f'{name.upper() * 300}\n')
+
+        self.assertEqual(stdout.getvalue(), 'Reduced\n')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with(maxsize=4)
+
+        # Two shards and the reduce prompt - the extracted files' content is omitted from the reduce prompt
+        a_path, b_path, c_path = (os.path.join(temp_dir, f'{name}.txt') for name in ('a', 'b', 'c'))
+        a_file, b_file, c_file = (
+            f'<{path}>\n{name * 300}\n</{path}>' for path, name in ((a_path, 'a'), (b_path, 'b'), (c_path, 'c'))
+        )
+        self.assertEqual(len(prompts), 3)
+        self.assertListEqual(sorted(prompts[:2]), [f'{a_file}\n\n{b_file}\n\nReview', f'{c_file}\n\nReview'])
+        self.assertEqual(
+            prompts[2],
+            f'Review\n\n<response>\n[Extracted file: {a_path}]\n[Extracted file: {b_path}]\n</response>\n\n'
+            f'<response>\n[Extracted file: {c_path}]\n</response>\n\n{DEFAULT_REDUCE}'
+        )
+
+
+    def test_shard_reduce(self):
+        with create_test_files([
+                 ('src/a.txt', 'a' * 300),
+                 ('src/b.txt', 'b' * 300),
+                 ('reduce.txt', 'Summarize the reviews')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            prompts = []
+            output_path = os.path.join(temp_dir, 'review.md')
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks(prompts))
+
+            main([
+                '-d', os.path.join(temp_dir, 'src'), '-x', 'txt', '-m', 'Review', '--api', 'grok', 'model-name', '-s', '',
+                '--shard', '150', '--reduce', os.path.join(temp_dir, 'reduce.txt'), '--concurrency', '1', '-o', output_path, '-e'
+            ])
+
+            with open(output_path, 'r', encoding='utf-8') as output_file:
+                self.assertEqual(output_file.read(), 'Reduced\n')
+
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '')
+        mock_pool_manager.assert_called_once_with(maxsize=1)
+        self.assertEqual(len(prompts), 3)
+        self.assertTrue(prompts[2].startswith('Review\n\n<response>\n'))
+        self.assertTrue(prompts[2].endswith('</response>\n\nSummarize the reviews'))
+
+
+    def test_shard_reduce_too_large(self):
+        with create_test_files([
+                 ('a.txt', 'a' * 300),
+                 ('b.txt', 'b' * 300)
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            prompts = []
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks(prompts))
+
+            # The shard responses don't fit in the reduce prompt - the reduce prompt is not passed
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-d', temp_dir, '-x', 'txt', '-m', 'Review', '--api', 'grok', 'model-name', '-s', '', '--shard', '150'])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertRegex(stderr.getvalue(), r'^\nError: Reduce prompt of about \d+ tokens exceeds the shard size of 150 tokens\n$')
+        self.assertEqual(len(prompts), 2)
+
+
+    def test_omit_files(self):
+        self.assertEqual(
+            _omit_files('Intro\n<a.txt>\n<b.txt>\nA\n</b.txt>\n</a.txt>\n<c.txt>\n</c.txt>\nC\n</c.txt>\n<d.txt>\nDone'),
+            'Intro\n[Extracted file: a.txt]\n[Extracted file: c.txt]\n<d.txt>\nDone'
+        )
+
+
+    def test_shard_one(self):
+        with create_test_files([
+                 ('a.txt', 'aaa'),
+                 ('b.txt', 'bbb')
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            prompts = []
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks(prompts))
+
+            # The prompt fits in one shard, so it's passed as is
+            main(['-d', temp_dir, '-x', 'txt', '-m', 'Review', '--api', 'grok', 'model-name', '-s', '', '--shard', '1000'])
+
+            a_path, b_path = os.path.join(temp_dir, 'a.txt'), os.path.join(temp_dir, 'b.txt')
+            self.assertListEqual(prompts, [f'<{a_path}>\naaa\n</{a_path}>\n\n<{b_path}>\nbbb\n</{b_path}>\n\nReview'])
+            self.assertEqual(stdout.getvalue(), f'<{a_path}>\nAAA\n</{a_path}>\n<{b_path}>\nBBB\n</{b_path}>\n')
+            self.assertEqual(stderr.getvalue(), '')
+
+
+    def test_shard_error(self):
+        with create_test_files([
+                 ('a.txt', 'a' * 300),
+                 ('b.txt', 'b' * 300)
+             ]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            prompts = []
+            mock_pool_manager_instance = mock_pool_manager.return_value
+            mock_pool_manager_instance.request.side_effect = mock_grok_request(_get_response_chunks(prompts, fail_file='b.txt'))
+
+            # A failed shard fails the run - the reduce prompt is not passed
+            with self.assertRaises(SystemExit) as cm_exc:
+                main([
+                    '-d', temp_dir, '-x', 'txt', '-m', 'Review', '--api', 'grok', 'model-name', '-s', '',
+                    '--shard', '150', '--retries', '0'
+                ])
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(
+            stderr.getvalue(),
+            'Error: shard 2: xAI API failed with status 500\n\nError: 1 of 2 shards failed\n'
+        )
+        self.assertEqual(len(prompts), 2)
+
+
+    def test_shard_invalid_args(self):
+        for argv, message in (
+            (['-m', 'Hello', '--shard', '1000'], '--shard requires --api'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--api', 'grok', 'model2', '--all', '--shard', '1000'],
+             '--shard cannot be used with --all, --batch, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--shard', '1000', '--record', 'x.json'],
+             '--shard cannot be used with --all, --batch, --chain, --record, or --replay'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--shard', '0'], '--shard and --concurrency must be at least 1'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--shard', '1000', '--concurrency', '0'],
+             '--shard and --concurrency must be at least 1'),
+            (['-m', 'Hello', '--api', 'grok', 'model', '--reduce', 'reduce.txt'], '--reduce requires --shard')
+        ):
+            with self.subTest(argv=argv), \
+                 unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+                 unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as cm_exc:
+                    main(argv)
+
+                self.assertEqual(cm_exc.exception.code, 2)
+                self.assertEqual(stdout.getvalue(), '')
+                self.assertIn(f'ctxkit: error: {message}', stderr.getvalue())
+
+
+    def test_split_prompt_shards(self):
+        prompt = [
+            ('message', 'a' * 30),
+            ('file', 'b' * 30),
+            ('file', 'c' * 30),
+            ('file', 'd' * 90),
+            ('file', 'e' * 30),
+            ('message', 'f' * 30)
+        ]
+        self.assertListEqual(split_prompt_shards(prompt, 40), [
+            [prompt[0], prompt[1], prompt[2], prompt[5]],
+            [prompt[0], prompt[3], prompt[5]],
+            [prompt[0], prompt[4], prompt[5]]
+        ])
+        self.assertListEqual(split_prompt_shards(prompt, 100), [prompt])
+        self.assertListEqual(split_prompt_shards('Hello', 1), ['Hello'])
+        self.assertListEqual(split_prompt_shards([('message', 'Hello')], 1), [[('message', 'Hello')]])
@@ -0,0 +1,165 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import json
+import os
+import unittest
+import unittest.mock
+
+import urllib3
+
+from ctxkit.main import main
+from ctxkit.stats import StreamStats
+
+from .test_main import create_test_files
+
+
+class TestStats(unittest.TestCase):
+
+    def test_stats(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.stats.time.perf_counter', side_effect=[10.0, 10.25, 10.5, 10.6, 10.9, 11.0]), \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+
+            mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response.status = 200
+            mock_grok_response.read_chunked.return_value = [
+                b'data: {"choices": [{"delta": {"content": "Hello"}}]}\n\n',
+                b'data: {"choices": [{"delta": {"content": ", "}}]}\n\n',
+                b'data: {"choices": [{"delta": {"content": "world"}}]}\n\n',
+                b'data: [DONE]\n\n'
+            ]
+            mock_pool_manager.return_value.request.return_value = mock_grok_response
+
+            main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--stats', '--stats-json', stats_path])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats_lines = stats_file.read().splitlines()
+
+        self.assertEqual(stdout.getvalue(), 'Hello, world\n')
+        self.assertEqual(stderr.getvalue(), '''\
+Stats: grok model-name
+  headers:     250.0 ms
+  first token: 500.0 ms
+  total:       1,000.0 ms
+  chunks:      3 (gap p50 100.0 ms, p95 300.0 ms, max 300.0 ms)
+  output:      12 chars (12.0 chars/sec)
+''')
+        self.assertEqual(len(stats_lines), 1)
+        self.assertDictEqual(json.loads(stats_lines[0]), {
+            'provider': 'grok',
+            'model': 'model-name',
+            'headers_ms': 250.0,
+            'first_token_ms': 500.0,
+            'total_ms': 1000.0,
+            'chunks': 3,
+            'chars': 12,
+            'chars_per_sec': 12.0,
+            'gap_p50_ms': 100.0,
+            'gap_p95_ms': 300.0,
+            'gap_max_ms': 300.0
+        })
+
+
+    def test_stats_error(self):
+        with create_test_files([]) as temp_dir, \
+             unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.stats.time.perf_counter', side_effect=[10.0, 10.25, 10.5]), \
+             unittest.mock.patch('os.environ', {'XAI_API_KEY': 'XXXX'}), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+            stats_path = os.path.join(temp_dir, 'stats.jsonl')
+
+            mock_grok_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_grok_response.status = 500
+            mock_grok_response.data = b''
+            mock_pool_manager.return_value.request.side_effect = [mock_grok_response]
+
+            with self.assertRaises(SystemExit) as cm_exc:
+                main(['-m', 'Hello', '--api', 'grok', 'model-name', '-s', '', '--stats-json', stats_path])
+
+            with open(stats_path, 'r', encoding='utf-8') as stats_file:
+                stats_lines = stats_file.read().splitlines()
+
+        self.assertEqual(cm_exc.exception.code, 2)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), '\nError: xAI API failed with status 500\n')
+        self.assertDictEqual(json.loads(stats_lines[0]), {
+            'provider': 'grok',
+            'model': 'model-name',
+            'headers_ms': 250.0,
+            'first_token_ms': None,
+            'total_ms': 500.0,
+            'chunks': 0,
+            'chars': 0,
+            'chars_per_sec': 0.0,
+            'gap_p50_ms': None,
+            'gap_p95_ms': None,
+            'gap_max_ms': None,
+            'error': 'xAI API failed with status 500'
+        })
+
+
+
+    def test_stats_usage(self):
+        with unittest.mock.patch('urllib3.PoolManager') as mock_pool_manager, \
+             unittest.mock.patch('ctxkit.stats.time.perf_counter', side_effect=[10.0, 10.1, 10.25, 10.5, 11.0]), \
+             unittest.mock.patch.dict('os.environ', {}, clear=True), \
+             unittest.mock.patch('sys.stdout', io.StringIO()) as stdout, \
+             unittest.mock.patch('sys.stderr', io.StringIO()) as stderr:
+
+            mock_show_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_show_response.status = 200
+            mock_show_response.json.return_value = {'capabilities': ['completion']}
+            mock_chat_response = unittest.mock.Mock(spec=urllib3.response.HTTPResponse)
+            mock_chat_response.status = 200
+            mock_chat_response.read_chunked.return_value = [
+                b'{"message": {"content": "Hello"}, "done": false}\n',
+                b'{"message": {"content": ""}, "done": true, "prompt_eval_count": 1234, "eval_count": 56}\n'
+            ]
+            mock_pool_manager.return_value.request.side_effect = [mock_show_response, mock_chat_response]
+
+            main(['-m', 'Hello', '--api', 'ollama', 'model-name', '-s', '', '--stats'])
+
+        self.assertEqual(stdout.getvalue(), 'Hello\n')
+        self.assertEqual(stderr.getvalue(), '''\
+Stats: ollama model-name
+  headers:     250.0 ms
+  first token: 500.0 ms
+  total:       1,000.0 ms
+  chunks:      1 (gap p50 n/a, p95 n/a, max n/a)
+  output:      5 chars (5.0 chars/sec)
+  tokens:      1,234 input, 56 output
+''')
+
+
+    def test_stream_stats_usage(self):
+        stats = StreamStats('claude', 'model-name')
+        stats.add_usage({'input_tokens': 10, 'cache_read_tokens': 1000, 'output_tokens': 100})
+        stats.add_usage({'input_tokens': 20, 'cache_read_tokens': 1100, 'cache_write_tokens': 5, 'output_tokens': 50})
+        self.assertDictEqual(stats.usage, {
+            'input_tokens': 30,
+            'cache_read_tokens': 2100,
+            'cache_write_tokens': 5,
+            'output_tokens': 150
+        })
+
+
+    def test_stats_format_error(self):
+        stats = StreamStats('ollama', 'model-name')
+        with unittest.mock.patch('ctxkit.stats.time.perf_counter', side_effect=[1.0, 1.0]):
+            stats.start()
+            stats.finish(Exception('BOOM!'))
+        self.assertEqual(stats.format(), '''\
+Stats: ollama model-name
+  headers:     n/a
+  first token: n/a
+  total:       0.0 ms
+  chunks:      0 (gap p50 n/a, p95 n/a, max n/a)
+  output:      0 chars (n/a)
+  error:       BOOM!''')
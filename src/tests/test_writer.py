@@ -0,0 +1,87 @@
+# Licensed under the MIT License
+# https://github.com/craigahobbs/ctxkit/blob/main/LICENSE
+
+import io
+import threading
+import time
+import unittest
+import unittest.mock
+
+from ctxkit.writer import OutputWriter
+
+
+class TestOutputWriter(unittest.TestCase):
+
+    def test_writer_tty(self):
+        output = unittest.mock.Mock()
+        output.isatty.return_value = True
+        with OutputWriter(output) as writer:
+            writer.write('Hello')
+            writer.write(', world')
+        self.assertListEqual(output.mock_calls, [
+            unittest.mock.call.isatty(),
+            unittest.mock.call.write('Hello'),
+            unittest.mock.call.flush(),
+            unittest.mock.call.write(', world'),
+            unittest.mock.call.flush()
+        ])
+
+
+    def test_writer_coalesce(self):
+        output = unittest.mock.Mock(spec=io.StringIO)
+        output.isatty.return_value = False
+        with OutputWriter(output, flush_interval=60) as writer:
+            for _ in range(100):
+                writer.write('tok ')
+        self.assertListEqual(output.write.mock_calls, [unittest.mock.call('tok ' * 100)])
+        self.assertEqual(output.flush.call_count, 1)
+
+
+    def test_writer_flush_size(self):
+        output = io.StringIO()
+        writes = []
+        output.write = writes.append
+        with OutputWriter(output, flush_interval=60, flush_size=8) as writer:
+            writer.write('1234')
+            writer.write('5678')
+            writer.write('9')
+        self.assertListEqual(writes, ['12345678', '9'])
+
+
+    def test_writer_flush_interval(self):
+        output = io.StringIO()
+        flushed = threading.Event()
+        output.flush = flushed.set
+        with OutputWriter(output, flush_interval=0.001) as writer:
+            writer.write('Hello')
+            self.assertTrue(flushed.wait(5))
+            self.assertEqual(output.getvalue(), 'Hello')
+            writer.write('!')
+        self.assertEqual(output.getvalue(), 'Hello!')
+
+
+    def test_writer_error(self):
+        output = unittest.mock.Mock(spec=io.StringIO)
+        output.isatty.return_value = False
+        output.write.side_effect = BrokenPipeError('broken')
+        writer = OutputWriter(output, flush_interval=0)
+        writer.write('Hello')
+        with self.assertRaises(BrokenPipeError):
+            for _ in range(500):
+                time.sleep(0.01)
+                writer.write('Hello')
+        with self.assertRaises(BrokenPipeError):
+            writer.close()
+        writer.close()
+        self.assertEqual(output.write.call_count, 1)
+
+
+    def test_writer_error_in_flight(self):
+        output = unittest.mock.Mock(spec=io.StringIO)
+        output.isatty.side_effect = ValueError('I/O operation on closed file')
+        output.write.side_effect = BrokenPipeError('broken')
+        with self.assertRaises(ValueError) as cm_exc:
+            with OutputWriter(output) as writer:
+                writer.write('Hello')
+                raise ValueError('BOOM!')
+        self.assertEqual(str(cm_exc.exception), 'BOOM!')